@@ -0,0 +1,217 @@
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+import banco_dados
+import geodados
+import resumos
+import snapshots
+
+# Agregações de volumes da tabela Relatorios_CTEs.
+# As páginas recebem só o resultado agrupado (algumas centenas de linhas) em vez da tabela inteira.
+# Com o snapshot Parquet em dia (snapshots.py), a agregação lê só as colunas e os meses pedidos;
+# senão a consulta vai ao SQLite, no resumo diário (resumos.RESUMO_VOLUMES) quando ele existe.
+
+TABELA_CTES = "Relatorios_CTEs"
+
+
+def _case_regiao(coluna_uf):
+    return f"CASE {coluna_uf} " + " ".join(
+        f"WHEN '{uf}' THEN '{regiao}'" for uf, regiao in geodados.UF_PARA_REGIAO.items()
+    ) + " ELSE 'Desconhecida' END"
+
+
+# Expressões SQL de cada dimensão disponível para agrupamento/filtro
+_CASE_REGIAO = _case_regiao("uf_destinatario")
+
+DIMENSOES = {
+    "uf": "uf_destinatario",
+    "cidade": "cidade_destinatario",
+    "regiao": _CASE_REGIAO,
+    "emissor": "remetente",
+    "dia": "date(data_emissao)",
+}
+
+# Medidas com conversão explícita (a tabela pode estar com colunas TEXT antes da migração)
+MEDIDAS = {
+    "volumes": "SUM(CAST(quantidade_de_volumes AS INTEGER))",
+    "ctes": "COUNT(*)",
+    "peso_kg": 'SUM(CAST("peso_real_(kg)" AS REAL))',
+    "frete": 'SUM(CAST("valor_frete_(r$)" AS REAL))',
+}
+
+# Mesmas dimensões e medidas sobre o resumo diário (chaves vazias equivalem a NULL na tabela bruta)
+DIMENSOES_RESUMO = {
+    "uf": "NULLIF(uf, '')",
+    "cidade": "NULLIF(cidade, '')",
+    "regiao": _case_regiao("NULLIF(uf, '')"),
+    "emissor": "NULLIF(emissor, '')",
+    "dia": "NULLIF(dia, '')",
+}
+
+MEDIDAS_RESUMO = {
+    "volumes": "SUM(volumes)",
+    "ctes": "SUM(ctes)",
+    "peso_kg": "SUM(peso_kg)",
+    "frete": "SUM(frete)",
+}
+
+# Colunas do snapshot usadas por cada dimensão e medida
+COLUNAS_SNAPSHOT = {
+    "uf": ["uf_destinatario"],
+    "cidade": ["cidade_destinatario"],
+    "regiao": ["uf_destinatario"],
+    "emissor": ["remetente"],
+    "dia": ["data_emissao"],
+    "volumes": ["quantidade_de_volumes"],
+    "ctes": [],
+    "peso_kg": ["peso_real_(kg)"],
+    "frete": ["valor_frete_(r$)"],
+}
+
+# Ignora linhas em branco e cabeçalhos repetidos vindos das planilhas
+_FILTRO_LINHAS_VALIDAS = "cte IS NOT NULL AND UPPER(cte) <> 'CTE'"
+
+_FONTES = {
+    "bruta": (TABELA_CTES, DIMENSOES, MEDIDAS, _FILTRO_LINHAS_VALIDAS, "data_emissao"),
+    "resumo": (resumos.RESUMO_VOLUMES, DIMENSOES_RESUMO, MEDIDAS_RESUMO, "1", "NULLIF(dia, '')"),
+}
+
+
+def _filtro_lista(expressao, valores, condicoes, params):
+    valores = list(valores)
+    if not valores:
+        condicoes.append("0")
+        return
+    condicoes.append(f"{expressao} IN ({', '.join('?' * len(valores))})")
+    params.extend(valores)
+
+
+# Monta o WHERE com os filtros opcionais (None = sem filtro)
+def _montar_filtros(fonte="bruta", data_inicio=None, data_fim=None, ufs=None, cidades=None, regioes=None,
+                    emissores=None):
+    _, dimensoes, _, filtro_base, coluna_data = _FONTES[fonte]
+    condicoes, params = [filtro_base], []
+    if data_inicio is not None:
+        condicoes.append(f"{coluna_data} >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        # '< dia seguinte' funciona tanto para 'AAAA-MM-DD' quanto para 'AAAA-MM-DD hh:mm:ss'
+        condicoes.append(f"{coluna_data} < date(?, '+1 day')")
+        params.append(str(data_fim))
+    if ufs is not None:
+        _filtro_lista(dimensoes["uf"], ufs, condicoes, params)
+    if cidades is not None:
+        _filtro_lista(dimensoes["cidade"], cidades, condicoes, params)
+    if regioes is not None:
+        ufs_regiao = [uf for uf, regiao in geodados.UF_PARA_REGIAO.items() if regiao in set(regioes)]
+        _filtro_lista(dimensoes["uf"], ufs_regiao, condicoes, params)
+    if emissores is not None:
+        _filtro_lista(dimensoes["emissor"], emissores, condicoes, params)
+    return " AND ".join(condicoes), params
+
+
+# Mesmo filtro de _montar_filtros como expressão do pyarrow.dataset, para o snapshot
+def _filtros_snapshot(data_inicio=None, data_fim=None, ufs=None, cidades=None, regioes=None, emissores=None):
+    expressao = ds.field("cte").is_valid() & (pc.utf8_upper(ds.field("cte")) != "CTE")
+    if data_inicio is not None:
+        expressao &= ds.field("data_emissao") >= str(data_inicio)
+    if data_fim is not None:
+        dia_seguinte = (pd.Timestamp(str(data_fim)[:10]) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        expressao &= ds.field("data_emissao") < dia_seguinte
+    if regioes is not None:
+        ufs_regiao = [uf for uf, regiao in geodados.UF_PARA_REGIAO.items() if regiao in set(regioes)]
+        ufs = ufs_regiao if ufs is None else [uf for uf in ufs if uf in ufs_regiao]
+    for coluna, valores in (("uf_destinatario", ufs), ("cidade_destinatario", cidades), ("remetente", emissores)):
+        if valores is not None:
+            expressao &= ds.field(coluna).isin(pa.array(list(valores), type=pa.string()))
+    return expressao
+
+
+_lock_snapshot = threading.Lock()
+_cache_snapshot = {}
+
+
+# Agregação sobre o snapshot Parquet; o resultado fica em memória enquanto o snapshot não muda
+def _volumes_snapshot(dimensoes, medidas, info, filtros):
+    chave = (info["banco"], tuple(info["versao"] or ()), info["gerado_em"], tuple(dimensoes), tuple(medidas),
+             tuple((k, v if v is None or isinstance(v, str) else tuple(v)) for k, v in sorted(filtros.items())))
+    with _lock_snapshot:
+        if chave in _cache_snapshot:
+            return _cache_snapshot[chave].copy()
+
+    colunas = sorted({"cte"} | {c for nome in (*dimensoes, *medidas) for c in COLUNAS_SNAPSHOT[nome]})
+    df = snapshots.ler(TABELA_CTES, colunas=colunas, filtros=_filtros_snapshot(**filtros),
+                       mes_inicio=filtros.get("data_inicio"), mes_fim=filtros.get("data_fim"))
+    # Dimensões com a mesma semântica das expressões SQL de DIMENSOES
+    valores = {
+        "uf": lambda: df["uf_destinatario"],
+        "cidade": lambda: df["cidade_destinatario"],
+        "regiao": lambda: df["uf_destinatario"].map(geodados.UF_PARA_REGIAO).fillna("Desconhecida"),
+        "emissor": lambda: df["remetente"],
+        "dia": lambda: pd.to_datetime(df["data_emissao"].str.slice(0, 10), format="%Y-%m-%d",
+                                      errors="coerce").dt.strftime("%Y-%m-%d"),
+    }
+    base = pd.DataFrame({d: valores[d]() for d in dimensoes}, index=df.index)
+    base["volumes"] = df.get("quantidade_de_volumes")
+    base["ctes"] = 1
+    base["peso_kg"] = df.get("peso_real_(kg)")
+    base["frete"] = df.get("valor_frete_(r$)")
+    medidas = list(medidas)
+    if dimensoes:
+        resultado = (base.groupby(list(dimensoes), dropna=False)[medidas].sum(min_count=1).reset_index()
+                     .sort_values(list(dimensoes), na_position="first", ignore_index=True))
+        for d in dimensoes:
+            resultado[d] = resultado[d].astype(object).where(resultado[d].notna(), None)
+    else:
+        resultado = base[medidas].sum(min_count=1).to_frame().T
+    if "ctes" in medidas:
+        resultado["ctes"] = resultado["ctes"].fillna(0)
+
+    with _lock_snapshot:
+        if len(_cache_snapshot) >= 64:
+            _cache_snapshot.clear()
+        _cache_snapshot[chave] = resultado
+    return resultado.copy()
+
+
+# Agrupa Relatorios_CTEs pelas dimensões pedidas e devolve as medidas escolhidas.
+# Ex.: volumes_por(["uf", "cidade"], data_inicio="2025-05-01", regioes=["Sul"])
+def volumes_por(dimensoes, medidas=("volumes",), db_path=banco_dados.DB_PATH, **filtros):
+    for nome in dimensoes:
+        if nome not in DIMENSOES:
+            raise ValueError(f"Dimensão desconhecida: {nome}")
+    for nome in medidas:
+        if nome not in MEDIDAS:
+            raise ValueError(f"Medida desconhecida: {nome}")
+
+    df = None
+    if snapshots.snapshot_em_dia(TABELA_CTES, db_path):
+        try:
+            df = _volumes_snapshot(dimensoes, medidas, snapshots.metadados(TABELA_CTES), filtros)
+        except OSError:
+            df = None  # snapshot sendo trocado por outra exportação; vale o SQLite
+    if df is None:
+        # Snapshot ausente ou desatualizado: agrega no SQLite
+        fonte = "resumo" if resumos.resumo_disponivel(resumos.RESUMO_VOLUMES, db_path) else "bruta"
+        tabela, expr_dimensoes, expr_medidas, _, _ = _FONTES[fonte]
+        where, params = _montar_filtros(fonte, **filtros)
+        colunas = [f"{expr_dimensoes[d]} AS {d}" for d in dimensoes] + [f"{expr_medidas[m]} AS {m}" for m in medidas]
+        query = f"SELECT {', '.join(colunas)} FROM {tabela} WHERE {where}"
+        if dimensoes:
+            posicoes = ", ".join(str(i + 1) for i in range(len(dimensoes)))
+            query += f" GROUP BY {posicoes} ORDER BY {posicoes}"
+        df = banco_dados.consultar(query, params, tabelas=[tabela], db_path=db_path)
+    for m in medidas:
+        if m in ("volumes", "ctes"):
+            df[m] = df[m].fillna(0).astype("int64")
+    return df
+
+
+# Valores distintos de uma dimensão (para preencher filtros)
+def valores_distintos(dimensao, db_path=banco_dados.DB_PATH, **filtros):
+    df = volumes_por([dimensao], medidas=(), db_path=db_path, **filtros)
+    return df[dimensao].dropna().tolist()
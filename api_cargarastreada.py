@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import banco_dados
+
+# Endereço da API (pode apontar para o servidor de teste via variável de ambiente)
+URL_API = os.environ.get("CARGARASTREADA_URL", "http://app.cargarastreada.com.br/glovis/dashboard-api/")
+
+TIMEOUT = (5, 30)           # (conexão, leitura) em segundos
+TENTATIVAS = 3
+TTL_CACHE = 10 * 60         # segundos que uma resposta fica válida
+MAX_REQUISICOES_PARALELAS = 8
+
+# Cache local por emissor e por dia, ao lado do logistica_interna.db.
+# Um dia buscado depois de terminado nunca muda; buscado enquanto ainda corria (parcial),
+# expira em TTL_DIA_ATUAL e é buscado de novo.
+CACHE_DIARIO_PATH = os.path.join(os.path.dirname(banco_dados.DB_PATH), "cache_cargarastreada.db")
+TTL_DIA_ATUAL = 5 * 60
+CAMPO_DATA = "data_emissao"  # campo do registro usado para separar uma resposta por dia
+
+_lock = threading.Lock()
+_cache = {}
+_sessao = None
+
+
+# Sessão keep-alive compartilhada pelo processo, com retentativas para falhas temporárias
+def obter_sessao():
+    global _sessao
+    with _lock:
+        if _sessao is None:
+            retry = Retry(
+                total=TENTATIVAS,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=["GET"],
+            )
+            adaptador = HTTPAdapter(
+                max_retries=retry,
+                pool_connections=MAX_REQUISICOES_PARALELAS,
+                pool_maxsize=MAX_REQUISICOES_PARALELAS,
+            )
+            _sessao = requests.Session()
+            _sessao.mount("http://", adaptador)
+            _sessao.mount("https://", adaptador)
+        return _sessao
+
+
+def limpar_cache():
+    with _lock:
+        _cache.clear()
+
+
+# Busca os registros de um emissor (CNPJ) no intervalo di..df (AAAA-MM-DD).
+# Respostas ficam em cache por TTL_CACHE, então trocar de aba não refaz a chamada.
+def buscar_dados(cnpj, data_inicio, data_fim, ttl=TTL_CACHE):
+    chave = (cnpj, data_inicio, data_fim)
+    agora = time.monotonic()
+    with _lock:
+        em_cache = _cache.get(chave)
+        if em_cache is not None and em_cache[0] > agora:
+            return em_cache[1]
+
+    resposta = obter_sessao().get(
+        URL_API,
+        params={"di": data_inicio, "df": data_fim, "emissor": cnpj},
+        timeout=TIMEOUT,
+    )
+    resposta.raise_for_status()
+    dados = resposta.json()
+
+    if ttl > 0:
+        with _lock:
+            for k in [k for k, (expira, _) in _cache.items() if expira <= agora]:
+                del _cache[k]
+            _cache[chave] = (agora + ttl, dados)
+    return dados
+
+
+def _preparar_cache_diario(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS api_dia (
+            cnpj TEXT NOT NULL,
+            dia TEXT NOT NULL,
+            buscado_em REAL NOT NULL,
+            dados TEXT NOT NULL,
+            PRIMARY KEY (cnpj, dia)
+        )
+    """)
+
+
+def _dias(data_inicio, data_fim):
+    inicio, fim = date.fromisoformat(data_inicio), date.fromisoformat(data_fim)
+    return [inicio + timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+
+# Agrupa dias consecutivos em intervalos [(inicio, fim), ...]
+def _agrupar_intervalos(dias):
+    intervalos = []
+    for dia in dias:
+        if intervalos and dia - intervalos[-1][1] == timedelta(days=1):
+            intervalos[-1][1] = dia
+        else:
+            intervalos.append([dia, dia])
+    return [(inicio, fim) for inicio, fim in intervalos]
+
+
+# Dia (AAAA-MM-DD) do CAMPO_DATA de um registro: aceita 'AAAA-MM-DD[...]' e 'dd/mm/aaaa[...]';
+# None se não reconhecer o formato
+def _dia_registro(registro):
+    texto = str(registro.get(CAMPO_DATA) or "").strip()[:10]
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+# Busca um intervalo na API e separa os registros por dia.
+# Se algum registro não cai num dia do intervalo (sem CAMPO_DATA, formato desconhecido ou
+# fora do período pedido), a separação não é confiável: busca dia a dia, para nunca gravar
+# como vazio um dia que veio de uma resposta com registros.
+def _buscar_intervalo_por_dia(cnpj, inicio, fim):
+    if inicio == fim:
+        return {inicio.isoformat(): buscar_dados(cnpj, inicio.isoformat(), fim.isoformat(), ttl=0)}
+    dias = _dias(inicio.isoformat(), fim.isoformat())
+    dados = buscar_dados(cnpj, inicio.isoformat(), fim.isoformat(), ttl=0)
+    por_dia = {dia.isoformat(): [] for dia in dias}
+    for registro in dados:
+        dia = _dia_registro(registro) if isinstance(registro, dict) else None
+        if dia in por_dia:
+            por_dia[dia].append(registro)
+    if sum(len(registros) for registros in por_dia.values()) != len(dados):
+        return {dia.isoformat(): buscar_dados(cnpj, dia.isoformat(), dia.isoformat(), ttl=0) for dia in dias}
+    return por_dia
+
+
+# O dia só está completo no cache se foi buscado depois da meia-noite seguinte (hora local)
+def _fechado(dia, buscado_em):
+    fim_do_dia = datetime.combine(date.fromisoformat(dia) + timedelta(days=1), datetime.min.time())
+    return buscado_em >= fim_do_dia.timestamp()
+
+
+# Busca di..df de um emissor pedindo à API só os dias que ainda não estão no cache local
+def buscar_dados_incremental(cnpj, data_inicio, data_fim, cache_path=None, agora=None):
+    cache_path = cache_path or CACHE_DIARIO_PATH
+    agora = agora or time.time()
+    dias = _dias(data_inicio, data_fim)
+
+    with banco_dados.conexao_escrita(cache_path) as conn:
+        _preparar_cache_diario(conn)
+        linhas = conn.execute(
+            "SELECT dia, buscado_em, dados FROM api_dia WHERE cnpj = ? AND dia BETWEEN ? AND ?",
+            (cnpj, data_inicio, data_fim),
+        ).fetchall()
+
+    em_cache = {}
+    for dia, buscado_em, dados in linhas:
+        if _fechado(dia, buscado_em) or agora - buscado_em < TTL_DIA_ATUAL:
+            em_cache[dia] = dados
+
+    faltantes = [dia for dia in dias if dia.isoformat() not in em_cache]
+    novos = {}
+    for inicio, fim in _agrupar_intervalos(faltantes):
+        novos.update(_buscar_intervalo_por_dia(cnpj, inicio, fim))
+
+    if novos:
+        with banco_dados.conexao_escrita(cache_path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO api_dia (cnpj, dia, buscado_em, dados) VALUES (?, ?, ?, ?)",
+                [(cnpj, dia, agora, json.dumps(registros)) for dia, registros in novos.items()],
+            )
+
+    registros = []
+    for dia in dias:
+        chave = dia.isoformat()
+        if chave in novos:
+            registros.extend(novos[chave])
+        else:
+            registros.extend(json.loads(em_cache[chave]))
+    return registros
+
+
+# Busca vários emissores ao mesmo tempo.
+# Recebe {nome_fornecedor: cnpj} e devolve ({nome: dados}, {nome: erro}).
+def buscar_varios(emissores, data_inicio, data_fim, funcao_busca=None):
+    funcao_busca = funcao_busca or buscar_dados_incremental
+    resultados, erros = {}, {}
+    if not emissores:
+        return resultados, erros
+    with ThreadPoolExecutor(max_workers=min(MAX_REQUISICOES_PARALELAS, len(emissores))) as executor:
+        futuros = {
+            nome: executor.submit(funcao_busca, cnpj, data_inicio, data_fim)
+            for nome, cnpj in emissores.items()
+        }
+        for nome, futuro in futuros.items():
+            try:
+                resultados[nome] = futuro.result()
+            except Exception as e:
+                erros[nome] = e
+    return resultados, erros
+
+
+# Monta um DataFrame único com a coluna 'fornecedor' a partir de buscar_varios
+def carregar_fornecedores(emissores, data_inicio, data_fim, funcao_busca=None):
+    resultados, erros = buscar_varios(emissores, data_inicio, data_fim, funcao_busca)
+    dfs = []
+    for nome in emissores:
+        dados = resultados.get(nome)
+        if dados:
+            df_temp = pd.DataFrame(dados)
+            df_temp["fornecedor"] = nome
+            dfs.append(df_temp)
+    df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+    return df, erros
@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+import queue
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+# Caminho padrão do banco de dados usado por todas as páginas
+DB_PATH = "logistica_interna.db"
+
+# Ajustes de desempenho aplicados às conexões
+MMAP_SIZE = 256 * 1024 * 1024   # leitura via memória mapeada (256 MB)
+CACHE_SIZE_KB = 64 * 1024       # cache de páginas do SQLite (64 MB)
+CACHED_STATEMENTS = 256         # statements compilados mantidos por conexão
+MAX_CONEXOES_POOL = 8
+MAX_RESULTADOS_CACHE = 128
+
+# Versão de cada tabela, mantida pelas conexões de escrita (ver conexao_escrita):
+# 'versao' muda a cada escrita na tabela; 'reescritas' só quando linhas existentes podem ter
+# mudado (UPDATE, DELETE, criação/remoção/alteração da tabela). Ler a versão é uma busca
+# pela chave primária, em vez de um COUNT(*) na tabela.
+TABELA_VERSOES = "versao_tabelas"
+
+# Ações do authorizer do SQLite que escrevem numa tabela (arg1 = nome da tabela),
+# e as que podem alterar linhas já existentes
+_ACOES_ESCRITA = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE,
+                  sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_DROP_TABLE}
+_ACOES_REESCRITA = _ACOES_ESCRITA - {sqlite3.SQLITE_INSERT}
+
+_lock = threading.Lock()
+_pools = {}
+_wal_configurado = set()
+_cache_resultados = OrderedDict()
+
+
+def _preparar_versoes(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_VERSOES} (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL DEFAULT 0,
+            reescritas INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+# Função para garantir que o banco esteja em modo WAL e tenha a tabela de versões
+# (feito uma vez por processo, pela primeira conexão de escrita; as leituras não escrevem)
+def _garantir_wal(db_path):
+    if db_path in _wal_configurado:
+        return
+    with _lock:
+        if db_path in _wal_configurado:
+            return
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            _preparar_versoes(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        _wal_configurado.add(db_path)
+
+
+# Função para abrir uma conexão somente leitura já configurada
+def _abrir_conexao_leitura(db_path):
+    uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def _pool(db_path):
+    with _lock:
+        if db_path not in _pools:
+            _pools[db_path] = queue.LifoQueue(maxsize=MAX_CONEXOES_POOL)
+        return _pools[db_path]
+
+
+# Empresta uma conexão somente leitura do pool do processo.
+# As conexões são reaproveitadas entre reruns do Streamlit, mantendo
+# os statements já compilados e as páginas do banco em cache.
+@contextmanager
+def conexao_leitura(db_path=DB_PATH):
+    pool = _pool(db_path)
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = _abrir_conexao_leitura(db_path)
+    try:
+        yield conn
+    finally:
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+# Authorizer da conexão de escrita: anota as tabelas em que cada comando preparado escreve
+# (inclusive por triggers). É chamado ao compilar o comando, não a cada linha.
+def _anotar_escritas(escritas, reescritas):
+    def authorizer(acao, arg1, arg2, banco, origem):
+        if acao == sqlite3.SQLITE_ALTER_TABLE:
+            acao, arg1 = sqlite3.SQLITE_UPDATE, arg2
+        if acao in _ACOES_ESCRITA and banco != "temp" and arg1 and arg1 != TABELA_VERSOES \
+                and not arg1.startswith("sqlite_"):
+            escritas.add(arg1)
+            if acao in _ACOES_REESCRITA:
+                reescritas.add(arg1)
+        return sqlite3.SQLITE_OK
+    return authorizer
+
+
+def _avancar_versoes(conn, escritas, reescritas):
+    _preparar_versoes(conn)
+    conn.executemany(
+        f"INSERT INTO {TABELA_VERSOES} (tabela, versao, reescritas) VALUES (?, 1, ?) "
+        "ON CONFLICT(tabela) DO UPDATE SET versao = versao + 1, reescritas = reescritas + excluded.reescritas",
+        [(tabela, int(tabela in reescritas)) for tabela in sorted(escritas)],
+    )
+
+
+# Conexão de leitura dentro de uma transação: todas as consultas do bloco veem o mesmo
+# instantâneo do banco, mesmo com escritas de outras conexões no meio
+@contextmanager
+def leitura_consistente(db_path=DB_PATH):
+    with conexao_leitura(db_path) as conn:
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+
+
+# Abre uma conexão de escrita: confirma ao final (ou desfaz em caso de erro),
+# avança a versão das tabelas alteradas e invalida o cache de resultados do processo.
+@contextmanager
+def conexao_escrita(db_path=DB_PATH):
+    _garantir_wal(db_path)
+    conn = sqlite3.connect(db_path, timeout=30, cached_statements=CACHED_STATEMENTS)
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    schema_antes = conn.execute("PRAGMA schema_version").fetchone()[0]
+    escritas, reescritas = set(), set()
+    conn.set_authorizer(_anotar_escritas(escritas, reescritas))
+    try:
+        yield conn
+        # Na mesma transação dos dados (ou logo depois, se o bloco já confirmou por conta própria)
+        if escritas and (conn.total_changes > 0
+                         or conn.execute("PRAGMA schema_version").fetchone()[0] != schema_antes):
+            conn.set_authorizer(None)
+            _avancar_versoes(conn, escritas, reescritas)
+        conn.commit()
+    finally:
+        # Só invalida o cache se algo de fato mudou (linhas ou estrutura)
+        try:
+            conn.rollback()
+            alterou = conn.total_changes > 0 or conn.execute("PRAGMA schema_version").fetchone()[0] != schema_antes
+        finally:
+            conn.close()
+        if alterou:
+            invalidar_cache(db_path)
+
+
+# Descarta os resultados em cache de um banco (ou de todos)
+def invalidar_cache(db_path=None):
+    with _lock:
+        for chave in list(_cache_resultados):
+            if db_path is None or chave[0] == db_path:
+                del _cache_resultados[chave]
+
+
+# Versão de uma tabela: (versao, reescritas) da tabela de versões, ou None se ela ainda não
+# foi escrita desde que as versões existem. Muda a cada escrita feita por qualquer processo
+# que use conexao_escrita, inclusive UPDATEs que não mudam a quantidade de linhas.
+def versao_tabela(conn, tabela):
+    try:
+        linha = conn.execute(f"SELECT versao, reescritas FROM {TABELA_VERSOES} WHERE tabela = ?", (tabela,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return tuple(linha) if linha else None
+
+
+# Assinatura usada pelos caches: muda quando alguma das tabelas muda de versão
+def assinatura_tabelas(conn, tabelas):
+    return tuple(versao_tabela(conn, t) for t in tabelas)
+
+
+# Tabelas do usuário, sem as internas do SQLite e sem as tabelas-sombra das tabelas
+# virtuais (ex.: <fts>_data, <fts>_idx, <fts>_config do índice FTS5 de busca_ctes)
+def listar_tabelas(db_path=DB_PATH):
+    with conexao_leitura(db_path) as conn:
+        linhas = conn.execute(
+            """
+            SELECT name FROM sqlite_master t
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND name != ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM sqlite_master v
+                  WHERE v.type = 'table' AND v.sql LIKE 'CREATE VIRTUAL TABLE%'
+                    AND substr(t.name, 1, length(v.name) + 1) = v.name || '_'
+              )
+            ORDER BY name
+            """,
+            (TABELA_VERSOES,),
+        ).fetchall()
+    return [linha[0] for linha in linhas]
+
+
+# Executa uma consulta parametrizada e devolve um DataFrame.
+# O resultado fica em cache e só é relido do disco quando a versão de alguma
+# das tabelas informadas muda (ou após uma escrita feita por este processo).
+def consultar(sql, params=(), tabelas=(), db_path=DB_PATH):
+    params = tuple(params)
+    tabelas = tuple(tabelas)
+    chave = (db_path, sql, params)
+    with conexao_leitura(db_path) as conn:
+        assinatura = assinatura_tabelas(conn, tabelas)
+        with _lock:
+            em_cache = _cache_resultados.get(chave)
+            if em_cache is not None and tabelas and em_cache[0] == assinatura:
+                _cache_resultados.move_to_end(chave)
+                return em_cache[1].copy()
+        df = pd.read_sql_query(sql, conn, params=params)
+    if tabelas:
+        with _lock:
+            _cache_resultados[chave] = (assinatura, df)
+            _cache_resultados.move_to_end(chave)
+            while len(_cache_resultados) > MAX_RESULTADOS_CACHE:
+                _cache_resultados.popitem(last=False)
+    return df.copy()
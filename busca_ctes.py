@@ -0,0 +1,183 @@
+import sys
+
+import banco_dados
+
+# Busca de NF/CTe por valor exato, prefixo ou trecho, sempre parametrizada.
+# Exata e prefixo usam os índices de cte/nf (migração 003); a busca por trecho usa,
+# quando instalado, um índice FTS5 trigram mantido por triggers.
+# Uso: python busca_ctes.py  -> cria (ou refaz) o índice FTS5 trigram
+
+TABELA_SITE = "Site Carga Rastreada"
+
+# Tabela -> colunas pesquisáveis
+COLUNAS_BUSCA = {
+    TABELA_SITE: ("cte", "nf"),
+}
+
+EXATA = "Exata"
+PREFIXO = "Começa com"
+TRECHO = "Contém"
+MODOS = [EXATA, PREFIXO, TRECHO]
+
+MAX_DIGITOS = 15           # maior quantidade de dígitos considerada na busca por prefixo numérico
+MAIOR_INTEGER = 2 ** 63 - 1  # maior valor de uma coluna INTEGER do SQLite
+MIN_TRECHO_TRIGRAM = 3     # o trigram só indexa trechos a partir de 3 caracteres
+
+
+def nome_fts(tabela):
+    return "fts_" + "".join(c if c.isalnum() else "_" for c in tabela.lower())
+
+
+def _tipo_coluna(conn, tabela, coluna):
+    for _, nome, tipo, *_ in conn.execute(f'PRAGMA table_info("{tabela}")'):
+        if nome == coluna:
+            return (tipo or "").upper()
+    raise ValueError(f"Coluna desconhecida em '{tabela}': {coluna}")
+
+
+def _tem_tabela(conn, nome):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (nome,)).fetchone() is not None
+
+
+# Prefixo numérico como união de faixas: '153' -> 153, 1530..1539, 15300..15399, ...
+# Cada faixa é um range scan no índice (LIKE não usa índice em coluna INTEGER).
+# Prefixo com mais de MAX_DIGITOS dígitos vira só o valor exato; faixas acima de
+# MAIOR_INTEGER são cortadas (sem faixas = nada a buscar).
+def _faixas_prefixo(digitos):
+    numero = int(digitos)
+    faixas = []
+    for extra in range(max(MAX_DIGITOS - len(digitos), 0) + 1):
+        fator = 10 ** extra
+        if numero * fator > MAIOR_INTEGER:
+            break
+        faixas.append((numero * fator, min((numero + 1) * fator - 1, MAIOR_INTEGER)))
+    return faixas
+
+
+# Limite superior de um prefixo de texto: 'ABC' -> 'ABD' (col >= 'ABC' AND col < 'ABD')
+def _proximo_prefixo(prefixo):
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+
+
+def _escapar_like(valor):
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Condição SQL (e parâmetros) para buscar 'termo' na coluna, para usar no WHERE das páginas.
+# alias: apelido da tabela na consulta (ex.: 's' em 'FROM "Site Carga Rastreada" s')
+def condicao_busca(tabela, coluna, termo, modo=PREFIXO, alias=None, db_path=banco_dados.DB_PATH):
+    if coluna not in COLUNAS_BUSCA.get(tabela, ()):
+        raise ValueError(f"Coluna sem busca configurada em '{tabela}': {coluna}")
+    if modo not in MODOS:
+        raise ValueError(f"Modo de busca desconhecido: {modo}")
+    termo = str(termo).strip()
+    ref = f'{alias}."{coluna}"' if alias else f'"{tabela}"."{coluna}"'
+    rowid = f"{alias}.rowid" if alias else f'"{tabela}".rowid'
+
+    with banco_dados.conexao_leitura(db_path) as conn:
+        numerica = "INT" in _tipo_coluna(conn, tabela, coluna)
+        tem_fts = _tem_tabela(conn, nome_fts(tabela))
+
+    if numerica:
+        # Zeros à esquerda não existem em coluna INTEGER ('000620779' -> 620779)
+        digitos = termo.lstrip("0") or "0"
+        if not digitos.isdigit():
+            return "0", []
+        if modo == EXATA:
+            # Acima do maior INTEGER não há valor igual (e o parâmetro estouraria no SQLite)
+            if int(digitos) > MAIOR_INTEGER:
+                return "0", []
+            return f"{ref} = ?", [int(digitos)]
+        if modo == PREFIXO:
+            faixas = _faixas_prefixo(digitos)
+            if not faixas:
+                return "0", []
+            return "(" + " OR ".join(f"{ref} BETWEEN ? AND ?" for _ in faixas) + ")", [v for f in faixas for v in f]
+        termo = digitos
+    else:
+        if modo == EXATA:
+            return f"{ref} = ?", [termo]
+        if modo == PREFIXO:
+            return f"({ref} >= ? AND {ref} < ?)", [termo, _proximo_prefixo(termo)]
+
+    if tem_fts and len(termo) >= MIN_TRECHO_TRIGRAM:
+        # Frase entre aspas no tokenizer trigram = busca por trecho, resolvida pelo índice
+        frase = '"' + termo.replace('"', '""') + '"'
+        return f'{rowid} IN (SELECT rowid FROM {nome_fts(tabela)} WHERE "{coluna}" MATCH ?)', [frase]
+    return f"CAST({ref} AS TEXT) LIKE ? ESCAPE '\\'", [f"%{_escapar_like(termo)}%"]
+
+
+# Combina a busca de várias colunas ({coluna: termo}) num único trecho de WHERE
+def condicoes_busca(tabela, termos, modo=PREFIXO, alias=None, db_path=banco_dados.DB_PATH):
+    condicoes, params = [], []
+    for coluna, termo in termos.items():
+        if termo is not None and str(termo).strip():
+            condicao, p = condicao_busca(tabela, coluna, termo, modo, alias, db_path)
+            condicoes.append(condicao)
+            params.extend(p)
+    return condicoes, params
+
+
+# --- Índice FTS5 trigram (opcional) ---
+
+def _criar_fts(conn, tabela):
+    fts = nome_fts(tabela)
+    colunas = COLUNAS_BUSCA[tabela]
+    lista = ", ".join(f'"{c}"' for c in colunas)
+    novos = ", ".join(f'NEW."{c}"' for c in colunas)
+    antigos = ", ".join(f'OLD."{c}"' for c in colunas)
+    conn.execute(f"DROP TABLE IF EXISTS {fts}")
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({lista}, content='{tabela}', content_rowid='rowid', tokenize='trigram')"
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_ins AFTER INSERT ON "{tabela}" BEGIN
+            INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.rowid, {novos});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_del AFTER DELETE ON "{tabela}" BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.rowid, {antigos});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{fts}_upd AFTER UPDATE ON "{tabela}" BEGIN
+            INSERT INTO {fts} ({fts}, rowid, {lista}) VALUES ('delete', OLD.rowid, {antigos});
+            INSERT INTO {fts} (rowid, {lista}) VALUES (NEW.rowid, {novos});
+        END
+    """)
+    conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+# Mantém os índices FTS já instalados coerentes com as tabelas de origem:
+# refaz os que perderam as triggers (tabela recriada) e remove os sem tabela de origem.
+def garantir_indices_busca(conn):
+    for tabela, colunas in COLUNAS_BUSCA.items():
+        fts = nome_fts(tabela)
+        if not _tem_tabela(conn, fts):
+            continue
+        existentes = {linha[1] for linha in conn.execute(f'PRAGMA table_info("{tabela}")')}
+        if not set(colunas) <= existentes:
+            conn.execute(f"DROP TABLE IF EXISTS {fts}")
+            continue
+        triggers = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND tbl_name=? AND name LIKE ?",
+            (tabela, f"trg_{fts}_%"),
+        ).fetchone()[0]
+        if triggers < 3:
+            _criar_fts(conn, tabela)
+
+
+def instalar_fts(db_path=banco_dados.DB_PATH):
+    instalados = []
+    with banco_dados.conexao_escrita(db_path) as conn:
+        for tabela in COLUNAS_BUSCA:
+            if _tem_tabela(conn, tabela):
+                _criar_fts(conn, tabela)
+                instalados.append(tabela)
+    return instalados
+
+
+if __name__ == "__main__":
+    tabelas = instalar_fts(sys.argv[1] if len(sys.argv) > 1 else banco_dados.DB_PATH)
+    print("Índice FTS5 trigram criado para: " + (", ".join(tabelas) if tabelas else "nenhuma tabela"))
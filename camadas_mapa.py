@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+
+# Camadas pydeck dos mapas de volumes por cidade.
+# O mapa recebe uma linha por cidade (já agregada) e, conforme o nível de detalhe, agrupa as
+# cidades em hexágonos no servidor: o JSON enviado ao navegador tem no máximo uma linha por
+# cidade, qualquer que seja a quantidade de CTes.
+# O Streamlit não devolve o zoom do navegador, então o nível automático usa o zoom inicial
+# (o que enquadra os pontos); a grade de tela é refeita pelo próprio deck.gl a cada zoom.
+
+COLUNA_VALOR = "quantidade_de_volumes"
+COLUNA_NOME = "cidade_destinatario"
+COLUNA_UF = "uf_destinatario"
+
+MODOS = ["Automático", "Cidades", "Hexágonos", "Grade de tela"]
+
+# Zoom inicial -> raio (m) dos hexágonos; do zoom ZOOM_CIDADES em diante cada cidade é um ponto
+RAIOS_POR_ZOOM = [(4, 120_000), (5, 60_000), (6, 30_000)]
+ZOOM_CIDADES = 7
+RAIO_HEXAGONO_PADRAO = 30_000
+
+# Limites do zoom inicial; com menos de MINIMO_PONTOS_ENQUADRAR cidades usa ZOOM_PADRAO
+ZOOM_MINIMO = 3
+ZOOM_MAXIMO = 10
+ZOOM_PADRAO = 5
+MINIMO_PONTOS_ENQUADRAR = 3
+
+METROS_POR_GRAU = 111_320
+ALTURA_MAXIMA_M = 150_000
+TAMANHO_CELULA_TELA_PX = 40
+
+# Rampa de cores (amarelo -> vermelho) dos hexágonos
+COR_MINIMA = np.array([255, 230, 120])
+COR_MAXIMA = np.array([200, 30, 30])
+
+
+# Zoom e centro que enquadram os pontos, com o zoom limitado a [ZOOM_MINIMO, ZOOM_MAXIMO].
+# Com poucas cidades (compute_view falha com um ponto e dá zoom de rua com dois),
+# centraliza na média com o zoom padrão.
+def enquadrar(df):
+    if df.empty:
+        return pdk.ViewState(latitude=-15.0, longitude=-50.0, zoom=ZOOM_MINIMO, pitch=30)
+    if len(df) < MINIMO_PONTOS_ENQUADRAR:
+        return pdk.ViewState(latitude=df["latitude"].mean(), longitude=df["longitude"].mean(), zoom=ZOOM_PADRAO,
+                             pitch=30)
+    view = pdk.data_utils.compute_view(df[["longitude", "latitude"]].to_numpy().tolist(), view_proportion=1)
+    view.zoom = min(max(view.zoom, ZOOM_MINIMO), ZOOM_MAXIMO)
+    view.pitch = 30
+    return view
+
+
+# Raio dos hexágonos para o zoom (None = mostrar as cidades)
+def raio_para_zoom(zoom):
+    if zoom >= ZOOM_CIDADES:
+        return None
+    for zoom_max, raio in RAIOS_POR_ZOOM:
+        if zoom <= zoom_max:
+            return raio
+    return RAIOS_POR_ZOOM[-1][1]
+
+
+# Agrupa as cidades em hexágonos (lados verticais à esquerda/direita) de raio 'raio_m', tudo
+# com numpy: projeção plana em metros em torno da latitude média, coordenadas axiais do
+# hexágono de cada ponto e arredondamento cúbico. Devolve uma linha por hexágono com o
+# centro, a soma dos valores, quantas cidades caíram nele e a maior delas.
+def agrupar_em_hexagonos(df, raio_m, coluna_valor=COLUNA_VALOR, coluna_nome=COLUNA_NOME):
+    colunas = ["latitude", "longitude", coluna_valor, "cidades", "maior_cidade"]
+    if df.empty:
+        return pd.DataFrame(columns=colunas)
+    lat_ref = np.radians(df["latitude"].mean())
+    x = df["longitude"].to_numpy() * METROS_POR_GRAU * np.cos(lat_ref) / raio_m
+    y = df["latitude"].to_numpy() * METROS_POR_GRAU / raio_m
+
+    q = 2 / 3 * x
+    r = -1 / 3 * x + np.sqrt(3) / 3 * y
+    s = -q - r
+    qa, ra, sa = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(qa - q), np.abs(ra - r), np.abs(sa - s)
+    ajustar_q = (dq > dr) & (dq > ds)
+    ajustar_r = ~ajustar_q & (dr > ds)
+    qa = np.where(ajustar_q, -ra - sa, qa)
+    ra = np.where(ajustar_r, -qa - sa, ra)
+
+    celulas = df.assign(_q=qa.astype("int64"), _r=ra.astype("int64")).sort_values(coluna_valor, ascending=False)
+    grupos = celulas.groupby(["_q", "_r"], sort=False)
+    resultado = grupos.agg(**{
+        coluna_valor: (coluna_valor, "sum"),
+        "cidades": (coluna_valor, "size"),
+        "maior_cidade": (coluna_nome, "first"),
+    }).reset_index()
+    centro_x = 1.5 * resultado["_q"]
+    centro_y = np.sqrt(3) / 2 * resultado["_q"] + np.sqrt(3) * resultado["_r"]
+    resultado["longitude"] = centro_x * raio_m / (METROS_POR_GRAU * np.cos(lat_ref))
+    resultado["latitude"] = centro_y * raio_m / METROS_POR_GRAU
+    return resultado[colunas]
+
+
+def _cores(valores):
+    maximo = valores.max()
+    fracao = (valores / maximo).to_numpy()[:, None] if maximo > 0 else np.zeros((len(valores), 1))
+    return (COR_MINIMA + (COR_MAXIMA - COR_MINIMA) * fracao).round().astype(int).tolist()
+
+
+# Um ponto por cidade; só as colunas usadas na camada e no tooltip vão para o navegador
+def _camada_cidades(df):
+    return pdk.Layer(
+        "ScatterplotLayer",
+        df[[c for c in ["longitude", "latitude", COLUNA_VALOR, COLUNA_NOME, COLUNA_UF] if c in df]],
+        get_position='[longitude, latitude]',
+        get_radius=f'{COLUNA_VALOR} * 100',
+        get_fill_color='[255, 75, 75]',
+        pickable=True,
+        auto_highlight=True,
+    )
+
+
+# Hexágonos já agregados, desenhados como colunas de 6 lados (sem agregação no navegador)
+def _camada_hexagonos(hexagonos, raio_m):
+    maximo = hexagonos[COLUNA_VALOR].max() if not hexagonos.empty else 0
+    return pdk.Layer(
+        "ColumnLayer",
+        hexagonos.assign(cor=_cores(hexagonos[COLUNA_VALOR])),
+        get_position='[longitude, latitude]',
+        get_elevation=COLUNA_VALOR,
+        elevation_scale=ALTURA_MAXIMA_M / maximo if maximo else 1,
+        radius=raio_m,
+        disk_resolution=6,
+        coverage=0.9,
+        extruded=True,
+        get_fill_color='cor',
+        pickable=True,
+        auto_highlight=True,
+    )
+
+
+# Grade de tela: o deck.gl agrupa os pontos (uma linha por cidade, com peso) em células de
+# TAMANHO_CELULA_TELA_PX pixels e refaz o agrupamento a cada zoom
+def _camada_grade_tela(df):
+    return pdk.Layer(
+        "ScreenGridLayer",
+        df[["longitude", "latitude", COLUNA_VALOR]],
+        get_position='[longitude, latitude]',
+        get_weight=COLUNA_VALOR,
+        cell_size_pixels=TAMANHO_CELULA_TELA_PX,
+        opacity=0.6,
+        pickable=False,
+    )
+
+
+# Mapa de volumes por cidade. 'df' tem uma linha por cidade com latitude/longitude
+# (geocodificacao.agregar_por_cidade + adicionar_coordenadas).
+# modo: "Cidades", "Hexágonos", "Grade de tela" ou "Automático" (hexágonos cada vez menores
+# conforme o zoom inicial; cidades a partir de ZOOM_CIDADES).
+def criar_mapa(df, modo="Automático"):
+    if modo not in MODOS:
+        raise ValueError(f"Modo de mapa desconhecido: {modo}")
+    view_state = enquadrar(df)
+    raio = raio_para_zoom(view_state.zoom) if modo == "Automático" else RAIO_HEXAGONO_PADRAO
+    if modo == "Cidades" or (modo == "Automático" and raio is None):
+        camada = _camada_cidades(df)
+        tooltip = {"html": f"<b>{{{COLUNA_NOME}}} - {{{COLUNA_UF}}}</b><br>Volumes: {{{COLUNA_VALOR}}}"}
+    elif modo == "Grade de tela":
+        camada = _camada_grade_tela(df)
+        tooltip = None
+    else:
+        camada = _camada_hexagonos(agrupar_em_hexagonos(df, raio), raio)
+        tooltip = {"html": f"<b>{{maior_cidade}}</b> e região ({{cidades}} cidades)<br>Volumes: {{{COLUNA_VALOR}}}"}
+    if tooltip:
+        tooltip["style"] = {"color": "white"}
+    return pdk.Deck(layers=[camada], initial_view_state=view_state, tooltip=tooltip or False)
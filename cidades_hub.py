@@ -0,0 +1,127 @@
+import sys
+
+import banco_dados
+from geocodificacao import chave_cidade
+
+# Dimensão cidade -> hub/transportadora.
+# Cada grafia de cidade encontrada na tabela de hubs e nas tabelas de CTe vira uma linha,
+# ligada ao hub pela chave normalizada (sem acentos, maiúscula, sem espaços extras).
+# As páginas e os resumos fazem JOIN pela grafia original (cidade = cidade, índice da PK),
+# sem diferenças de acento/caixa e sem precisar normalizar nada em SQL.
+# Uso: python cidades_hub.py  -> reconstrói a dimensão
+
+TABELA_HUB = "Hub_Mercedes_Benz"
+TABELA_DIMENSAO = "dim_cidade_hub"
+
+# Tabelas de fatos -> coluna de cidade cujas grafias entram na dimensão
+TABELAS_CIDADE = {
+    "Site Carga Rastreada": "cidade",
+}
+
+# O relatório do site corta o nome da cidade em 15 caracteres ('CACHOEIRO DE IT')
+TAMANHO_CIDADE_CORTADA = 15
+
+
+def _tem_tabela(conn, nome):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (nome,)).fetchone() is not None
+
+
+def _preparar_tabela(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_DIMENSAO} (
+            cidade TEXT PRIMARY KEY,
+            chave TEXT NOT NULL,
+            cidade_hub TEXT,
+            uf TEXT,
+            hub TEXT,
+            transportadora TEXT
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_DIMENSAO}_chave ON {TABELA_DIMENSAO} (chave)")
+
+
+# chave -> (cidade_hub, uf, hub, transportadora); a primeira linha de cada cidade prevalece
+def _mapa_hubs(conn):
+    mapa = {}
+    linhas = conn.execute(
+        f'SELECT danfe_dest_cidade, dest_uf, hub, transportadora FROM "{TABELA_HUB}" ORDER BY rowid'
+    )
+    for cidade, uf, hub, transportadora in linhas:
+        chave = chave_cidade(cidade)
+        if chave:
+            mapa.setdefault(chave, (cidade, uf, hub, transportadora))
+    return mapa
+
+
+# Chaves cortadas em TAMANHO_CIDADE_CORTADA -> chave completa (só as sem ambiguidade)
+def _mapa_cortado(mapa):
+    cortado = {}
+    for chave in mapa:
+        if len(chave) > TAMANHO_CIDADE_CORTADA:
+            prefixo = chave[:TAMANHO_CIDADE_CORTADA].rstrip()
+            cortado[prefixo] = None if prefixo in cortado else chave
+    return cortado
+
+
+def _resolver(cidade, mapa, cortado):
+    chave = chave_cidade(cidade)
+    if chave not in mapa and cortado.get(chave):
+        chave = cortado[chave]
+    return (cidade, chave) + mapa.get(chave, (None, None, None, None))
+
+
+def _grafias(conn, somente_novas=False):
+    grafias = set()
+    for tabela, coluna in TABELAS_CIDADE.items():
+        if not _tem_tabela(conn, tabela):
+            continue
+        filtro = (
+            f' AND NOT EXISTS (SELECT 1 FROM {TABELA_DIMENSAO} d WHERE d.cidade = f."{coluna}")' if somente_novas else ""
+        )
+        linhas = conn.execute(f'SELECT DISTINCT f."{coluna}" FROM "{tabela}" f WHERE f."{coluna}" IS NOT NULL{filtro}')
+        grafias.update(linha[0] for linha in linhas)
+    return grafias
+
+
+def _gravar(conn, grafias, mapa):
+    cortado = _mapa_cortado(mapa)
+    linhas = [_resolver(cidade, mapa, cortado) for cidade in grafias]
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {TABELA_DIMENSAO} (cidade, chave, cidade_hub, uf, hub, transportadora) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        linhas,
+    )
+    return linhas
+
+
+def reconstruir(conn):
+    _preparar_tabela(conn)
+    conn.execute(f"DELETE FROM {TABELA_DIMENSAO}")
+    if not _tem_tabela(conn, TABELA_HUB):
+        return
+    mapa = _mapa_hubs(conn)
+    grafias = {dados[0] for dados in mapa.values()} | _grafias(conn)
+    _gravar(conn, grafias, mapa)
+
+
+# Mantém a dimensão em dia depois que 'tabela_alterada' foi carregada ou excluída.
+# A tabela de hubs (ou a falta da dimensão) exige reconstrução; nas tabelas de fatos
+# só as grafias novas são resolvidas. Devolve True se alguma cidade ganhou hub.
+def garantir_cidades_hub(conn, tabela_alterada=None):
+    if not _tem_tabela(conn, TABELA_DIMENSAO) or tabela_alterada == TABELA_HUB:
+        reconstruir(conn)
+        return True
+    if not _tem_tabela(conn, TABELA_HUB):
+        return False
+    novas = _grafias(conn, somente_novas=True)
+    if not novas:
+        return False
+    linhas = _gravar(conn, novas, _mapa_hubs(conn))
+    return any(linha[4] is not None for linha in linhas)
+
+
+if __name__ == "__main__":
+    with banco_dados.conexao_escrita(sys.argv[1] if len(sys.argv) > 1 else banco_dados.DB_PATH) as conn:
+        reconstruir(conn)
+        total, com_hub = conn.execute(f"SELECT COUNT(*), COUNT(hub) FROM {TABELA_DIMENSAO}").fetchone()
+    print(f"{TABELA_DIMENSAO}: {total} grafias de cidade, {com_hub} com hub")
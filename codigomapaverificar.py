@@ -1,17 +1,12 @@
 
 import streamlit as st
-import sqlite3
-import pandas as pd
-from geopy.geocoders import Nominatim
 import folium
 from streamlit_folium import st_folium
 import plotly.express as px
-import json
-import requests
-import urllib3  # <== Adicionado
-
-# Desabilita os avisos de SSL
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import agregacoes
+import banco_dados
+import geocodificacao
+import geodados
 
 st.set_page_config(page_title="Mapa de Volumes", layout="wide")
 
@@ -19,61 +14,37 @@ st.title("📦 Mapa e Heatmap de Volumes por Cidade, Estado e Região")
 st.markdown("Este painel interativo mostra a distribuição dos volumes por localidade com base nos dados da tabela `Relatorios_CTEs`.")
 
 # === CONFIGURAÇÕES === #
-db_path = "logistica_interna.db"
-
-uf_para_regiao = {
-    "AC": "Norte", "AP": "Norte", "AM": "Norte", "PA": "Norte",
-    "RO": "Norte", "RR": "Norte", "TO": "Norte",
-    "AL": "Nordeste", "BA": "Nordeste", "CE": "Nordeste", "MA": "Nordeste",
-    "PB": "Nordeste", "PE": "Nordeste", "PI": "Nordeste", "RN": "Nordeste", "SE": "Nordeste",
-    "DF": "Centro-Oeste", "GO": "Centro-Oeste", "MT": "Centro-Oeste", "MS": "Centro-Oeste",
-    "ES": "Sudeste", "MG": "Sudeste", "RJ": "Sudeste", "SP": "Sudeste",
-    "PR": "Sul", "RS": "Sul", "SC": "Sul"
-}
+db_path = banco_dados.DB_PATH
 
-@st.cache_data(show_spinner=False)
-def carregar_dados():
-    conn = sqlite3.connect(db_path)
-    query = """
-    SELECT cidade_destinatario, uf_destinatario, SUM(quantidade_de_volumes) as total_volumes
-    FROM Relatorios_CTEs
-    GROUP BY cidade_destinatario, uf_destinatario
-    """
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    return df
+uf_para_regiao = geodados.UF_PARA_REGIAO
 
+# Volumes por cidade agrupados no banco; o filtro de região também é aplicado na consulta
+@st.cache_data(show_spinner=False)
+def carregar_dados(regioes=None):
+    df = agregacoes.volumes_por(["cidade", "uf", "regiao"], db_path=db_path, regioes=regioes)
+    return df.rename(columns={
+        "cidade": "cidade_destinatario",
+        "uf": "uf_destinatario",
+        "volumes": "total_volumes",
+    })
+
+# Coordenadas vêm do cadastro local de municípios; o Nominatim só é
+# consultado para cidades desconhecidas e o resultado fica gravado no banco.
 @st.cache_data(show_spinner=True)
 def geocode_cidades(df):
-    geolocator = Nominatim(user_agent="logistica_mapper")
-    latitudes, longitudes = [], []
-    for cidade, uf in zip(df['cidade_destinatario'], df['uf_destinatario']):
-        try:
-            loc = geolocator.geocode(f"{cidade}, {uf}, Brasil")
-            if loc:
-                latitudes.append(loc.latitude)
-                longitudes.append(loc.longitude)
-            else:
-                latitudes.append(None)
-                longitudes.append(None)
-        except:
-            latitudes.append(None)
-            longitudes.append(None)
-    df['lat'] = latitudes
-    df['lon'] = longitudes
+    coords = geocodificacao.resolver_coordenadas(df['cidade_destinatario'], df['uf_destinatario'], usar_rede=True)
+    df['lat'] = coords['latitude']
+    df['lon'] = coords['longitude']
     return df.dropna(subset=['lat', 'lon'])
 
-df = carregar_dados()
-df['regiao'] = df['uf_destinatario'].map(uf_para_regiao)
-
 # === SIDEBAR === #
 with st.sidebar:
     st.header("🔎 Filtros")
-    regioes = ["Todas"] + sorted(df['regiao'].dropna().unique().tolist())
+    regioes = ["Todas"] + sorted(agregacoes.valores_distintos("regiao", db_path=db_path))
     regiao_selecionada = st.selectbox("Selecione a Região:", regioes)
 
-# === APLICA FILTRO === #
-df_filtrado = df.copy() if regiao_selecionada == "Todas" else df[df['regiao'] == regiao_selecionada]
+# === APLICA FILTRO (no banco) === #
+df_filtrado = carregar_dados() if regiao_selecionada == "Todas" else carregar_dados([regiao_selecionada])
 
 st.success(f"{len(df_filtrado)} registros encontrados para a região: **{regiao_selecionada}**")
 st.dataframe(df_filtrado, use_container_width=True)
@@ -82,38 +53,19 @@ st.dataframe(df_filtrado, use_container_width=True)
 with st.spinner("🔍 Geocodificando cidades..."):
     df_geo = geocode_cidades(df_filtrado)
 
-# === CARREGA GEOJSON DO BRASIL === #
-geojson_url = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
+# === CARREGA GEOJSON DO BRASIL (arquivo local, simplificado) === #
 try:
-    response = requests.get(geojson_url, verify=False)
-    response.raise_for_status()
-    estados_geojson = response.json()
-except requests.exceptions.RequestException as e:
+    estados_geojson = geodados.carregar_geojson("medio")
+except Exception as e:
     st.error(f"Erro ao carregar o GeoJSON: {e}")
     st.stop()
 
-# === FUNÇÃO PARA AGRUPAR GEOJSON POR REGIÃO === #
-from shapely.geometry import shape, mapping
-from shapely.ops import unary_union
-import geojson
-
-def agrupar_por_regiao(geojson_obj, uf_to_regiao):
-    regiao_geometrias = {}
-    for feature in geojson_obj['features']:
-        uf = feature['properties']['sigla']
-        regiao = uf_to_regiao.get(uf)
-        if regiao:
-            regiao_geometrias.setdefault(regiao, []).append(feature['geometry'])
-
-    features = []
-    for regiao, geoms in regiao_geometrias.items():
-        shapes = [shape(geom) for geom in geoms]
-        multi = unary_union(shapes)
-        features.append(geojson.Feature(geometry=mapping(multi), properties={"sigla": regiao}))
-
-    return geojson.FeatureCollection(features)
-
-regioes_geojson = agrupar_por_regiao(estados_geojson, uf_para_regiao)
+# === GEOJSON POR REGIÃO (união calculada uma vez e gravada em disco) === #
+try:
+    regioes_geojson = geodados.carregar_geojson_regioes("medio", uf_para_regiao)
+except Exception as e:
+    st.error(f"Erro ao gerar o GeoJSON das regiões: {e}")
+    st.stop()
 
 # === ABA DE VISUALIZAÇÕES === #
 tab1, tab2, tab3 = st.tabs(["📍 Mapa por Cidade", "🗺️ Heatmap por UF", "🧭 Heatmap por Região"])
@@ -0,0 +1,204 @@
+import os
+import threading
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+import banco_dados
+
+# Gazetteer com os centróides (sede) dos municípios brasileiros.
+# Códigos IBGE com coordenadas do GeoNames (geonames.org, CC BY 4.0).
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "municipios_ibge.csv")
+
+# Tabela persistente de geocódigos no banco (gazetteer importado + resultados do Nominatim)
+TABELA_GEOCODIGO = "geocodigo"
+
+NOMINATIM_USER_AGENT = "logistica_mapper"
+NOMINATIM_INTERVALO = 1.0   # segundos entre chamadas (política de uso do Nominatim)
+
+_lock = threading.Lock()        # só para ler/gravar _cache_coordenadas
+_lock_rede = threading.Lock()   # uma sessão por vez no Nominatim (o intervalo vale para o processo)
+_cache_coordenadas = {}
+
+
+# Chave normalizada de cidade: sem acentos, maiúscula, sem hífens/apóstrofos e espaços extras
+def chave_cidade(nome):
+    if nome is None or (isinstance(nome, float) and pd.isna(nome)):
+        return ""
+    texto = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode("ascii")
+    texto = texto.upper().replace("-", " ").replace("'", " ")
+    return " ".join(texto.split())
+
+
+# Versão vetorizada de chave_cidade para uma Series inteira
+def chaves_cidade(serie):
+    serie = serie.astype("string").fillna("")
+    return (
+        serie.str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.upper()
+        .str.replace(r"[-']", " ", regex=True)
+        .str.split()
+        .str.join(" ")
+        .fillna("")
+    )
+
+
+@lru_cache(maxsize=1)
+def carregar_gazetteer():
+    df = pd.read_csv(GAZETTEER_PATH, dtype={"codigo_ibge": str})
+    df["chave"] = df["municipio"]
+    return df
+
+
+def _preparar_tabela(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_GEOCODIGO} (
+            chave TEXT NOT NULL,
+            uf TEXT NOT NULL,
+            latitude REAL,
+            longitude REAL,
+            fonte TEXT,
+            atualizado_em TEXT,
+            PRIMARY KEY (chave, uf)
+        )
+    """)
+
+
+# Importa o gazetteer para o banco sem sobrescrever geocódigos já existentes
+def importar_gazetteer(db_path=banco_dados.DB_PATH):
+    gaz = carregar_gazetteer()
+    agora = datetime.now().isoformat(timespec="seconds")
+    with banco_dados.conexao_escrita(db_path) as conn:
+        _preparar_tabela(conn)
+        antes = conn.total_changes
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {TABELA_GEOCODIGO} (chave, uf, latitude, longitude, fonte, atualizado_em) "
+            "VALUES (?, ?, ?, ?, 'ibge', ?)",
+            [(c, u, la, lo, agora) for c, u, la, lo in gaz[["chave", "uf", "latitude", "longitude"]].itertuples(index=False)],
+        )
+        return conn.total_changes - antes
+
+
+# Geocódigos conhecidos: gazetteer embarcado + tabela do banco (que tem prioridade)
+def tabela_coordenadas(db_path=banco_dados.DB_PATH):
+    gaz = carregar_gazetteer()[["chave", "uf", "latitude", "longitude"]]
+    if TABELA_GEOCODIGO not in banco_dados.listar_tabelas(db_path):
+        return gaz
+    do_banco = banco_dados.consultar(
+        f"SELECT chave, uf, latitude, longitude FROM {TABELA_GEOCODIGO}",
+        tabelas=[TABELA_GEOCODIGO],
+        db_path=db_path,
+    )
+    return pd.concat([do_banco, gaz], ignore_index=True).drop_duplicates(["chave", "uf"], keep="first")
+
+
+# Tabela (chave, uf) -> coordenadas usada nos JOINs, montada uma vez e mantida até a tabela
+# de geocódigos mudar. Cidades com nome único no país também ganham uma linha com uf = ''.
+def _coordenadas_por_chave(db_path=banco_dados.DB_PATH):
+    with banco_dados.conexao_leitura(db_path) as conn:
+        assinatura = banco_dados.assinatura_tabelas(conn, [TABELA_GEOCODIGO])
+    with _lock:
+        em_cache = _cache_coordenadas.get(db_path)
+    if em_cache is not None and em_cache[0] == assinatura:
+        return em_cache[1]
+    coords = tabela_coordenadas(db_path)
+    unicos_por_nome = coords[coords["uf"] != ""].drop_duplicates("chave", keep=False).assign(uf="")
+    coords = pd.concat([coords, unicos_por_nome], ignore_index=True).drop_duplicates(["chave", "uf"], keep="first")
+    coords = coords.reset_index(drop=True)
+    with _lock:
+        _cache_coordenadas[db_path] = (assinatura, coords)
+    return coords
+
+
+# Consulta o Nominatim (opcional, limitado a uma chamada por NOMINATIM_INTERVALO)
+# para os pares ainda desconhecidos e grava o resultado, inclusive quando não encontrado.
+# As chamadas usam _lock_rede, não o _lock do cache: quem só lê coordenadas não espera a rede.
+def _geocodificar_na_rede(pares, db_path):
+    try:
+        from geopy.extra.rate_limiter import RateLimiter
+        from geopy.geocoders import Nominatim
+    except ImportError:
+        return
+    geolocator = Nominatim(user_agent=NOMINATIM_USER_AGENT)
+    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=NOMINATIM_INTERVALO, swallow_exceptions=True)
+    agora = datetime.now().isoformat(timespec="seconds")
+    resultados = []
+    with _lock_rede:
+        # outra sessão pode ter resolvido alguns pares enquanto esta esperava a vez
+        coords = _coordenadas_por_chave(db_path)
+        conhecidos = set(zip(coords["chave"], coords["uf"]))
+        for chave, uf in pares:
+            if (chave, uf) in conhecidos:
+                continue
+            loc = geocode(f"{chave}, {uf}, Brasil" if uf else f"{chave}, Brasil")
+            resultados.append((chave, uf, loc.latitude if loc else None, loc.longitude if loc else None, agora))
+    if not resultados:
+        return
+    with banco_dados.conexao_escrita(db_path) as conn:
+        _preparar_tabela(conn)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {TABELA_GEOCODIGO} (chave, uf, latitude, longitude, fonte, atualizado_em) "
+            "VALUES (?, ?, ?, ?, 'nominatim', ?)",
+            resultados,
+        )
+
+
+# Resolve latitude/longitude para pares (cidade, uf).
+# Devolve um DataFrame com as colunas 'latitude' e 'longitude' alinhado ao índice de entrada.
+# Sem UF, a cidade só é resolvida se o nome for único no país.
+def resolver_coordenadas(cidades, ufs=None, usar_rede=False, db_path=banco_dados.DB_PATH):
+    pares = pd.DataFrame({
+        "chave": chaves_cidade(pd.Series(cidades)).to_numpy(),
+        "uf": (pd.Series(ufs).astype("string").str.strip().str.upper().fillna("").to_numpy()
+               if ufs is not None else ""),
+    }, index=pd.Series(cidades).index)
+
+    coords = _coordenadas_por_chave(db_path)
+    resultado = pares.merge(coords, on=["chave", "uf"], how="left")
+    resultado.index = pares.index
+
+    if usar_rede:
+        conhecidos = set(zip(coords["chave"], coords["uf"]))
+        faltantes = {
+            (c, u) for c, u in zip(pares["chave"], pares["uf"])
+            if c and (c, u) not in conhecidos
+        }
+        if faltantes:
+            _geocodificar_na_rede(sorted(faltantes), db_path)
+            return resolver_coordenadas(cidades, ufs, usar_rede=False, db_path=db_path)
+
+    return resultado[["latitude", "longitude"]]
+
+
+# Soma as colunas de valores por cidade (chave normalizada + UF): grafias diferentes da mesma
+# cidade ('São Paulo', 'SAO PAULO') viram uma linha só, com a grafia de maior valor.
+# O mapa recebe assim uma linha por cidade.
+def agregar_por_cidade(df, coluna_cidade, coluna_uf=None, colunas_valor=()):
+    colunas_valor = list(colunas_valor)
+    chaves = [chaves_cidade(df[coluna_cidade]).rename("_chave")]
+    if coluna_uf is not None:
+        chaves.append(df[coluna_uf].astype("string").str.strip().str.upper().fillna("").rename("_uf"))
+    ordenado = df.sort_values(colunas_valor[0], ascending=False) if colunas_valor else df
+    grupos = ordenado.groupby([c.loc[ordenado.index] for c in chaves], sort=False)
+    primeiras = {coluna: "first" for coluna in ordenado.columns if coluna not in colunas_valor}
+    resultado = grupos.agg({**primeiras, **{coluna: "sum" for coluna in colunas_valor}})
+    return resultado[list(df.columns)].reset_index(drop=True)
+
+
+# Devolve uma cópia de df com 'latitude' e 'longitude' (JOIN pela chave normalizada da cidade
+# e pela UF), só com as linhas localizadas. O deslocamento é somado à coluna inteira.
+def adicionar_coordenadas(df, coluna_cidade, coluna_uf=None, lat_offset=0.0, lon_offset=0.0, usar_rede=False,
+                          db_path=banco_dados.DB_PATH):
+    coords = resolver_coordenadas(df[coluna_cidade], df[coluna_uf] if coluna_uf is not None else None,
+                                  usar_rede=usar_rede, db_path=db_path)
+    resultado = df.assign(latitude=coords["latitude"] + lat_offset, longitude=coords["longitude"] + lon_offset)
+    return resultado.dropna(subset=["latitude", "longitude"])
+
+
+if __name__ == "__main__":
+    total = importar_gazetteer()
+    print(f"{total} municípios importados para a tabela {TABELA_GEOCODIGO}.")
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import urllib.request
+from functools import lru_cache
+
+# GeoJSON dos estados do Brasil, guardado em dados/ e carregado uma vez por processo.
+# O original é baixado uma única vez (se ainda não estiver em dados/) e depois só lido do disco.
+# Uso: python geodados.py            -> obtém o original (se faltar) e gera os níveis simplificados
+#      python geodados.py --baixar   -> baixa de novo o original de URL_ESTADOS e refaz todos os níveis
+
+URL_ESTADOS = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
+DADOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+ESTADOS_PATH = os.path.join(DADOS_DIR, "brazil-states.geojson")
+
+# Tolerância de simplificação (em graus) e casas decimais mantidas por nível
+NIVEIS = {
+    "original": (0, None),
+    "alto": (0.005, 4),
+    "medio": (0.02, 3),
+    "baixo": (0.08, 2),
+}
+NIVEL_PADRAO = "medio"
+
+# Regiões geradas a partir dos estados ficam em dados/cache/, identificadas pelo hash
+# do GeoJSON de origem e do mapeamento UF -> região
+CACHE_DIR = os.path.join(DADOS_DIR, "cache")
+
+UF_PARA_REGIAO = {
+    "AC": "Norte", "AP": "Norte", "AM": "Norte", "PA": "Norte",
+    "RO": "Norte", "RR": "Norte", "TO": "Norte",
+    "AL": "Nordeste", "BA": "Nordeste", "CE": "Nordeste", "MA": "Nordeste",
+    "PB": "Nordeste", "PE": "Nordeste", "PI": "Nordeste", "RN": "Nordeste", "SE": "Nordeste",
+    "DF": "Centro-Oeste", "GO": "Centro-Oeste", "MT": "Centro-Oeste", "MS": "Centro-Oeste",
+    "ES": "Sudeste", "MG": "Sudeste", "RJ": "Sudeste", "SP": "Sudeste",
+    "PR": "Sul", "RS": "Sul", "SC": "Sul"
+}
+
+_lock = threading.Lock()
+
+
+def caminho_nivel(nivel):
+    if nivel == "original":
+        return ESTADOS_PATH
+    return os.path.join(DADOS_DIR, f"brazil-states_{nivel}.geojson")
+
+
+def _salvar(geojson, caminho):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(geojson, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(temporario, caminho)
+
+
+def _baixar():
+    with urllib.request.urlopen(URL_ESTADOS, timeout=60) as response:
+        _salvar(json.load(response), ESTADOS_PATH)
+
+
+# Baixa de novo o GeoJSON original de URL_ESTADOS e descarta os níveis gerados (atualização via CLI)
+def baixar_original():
+    _baixar()
+    for nivel in NIVEIS:
+        if nivel != "original" and os.path.exists(caminho_nivel(nivel)):
+            os.remove(caminho_nivel(nivel))
+    carregar_geojson.cache_clear()
+    _hash_arquivo.cache_clear()
+    _regioes_em_cache.cache_clear()
+
+
+# Original em dados/; na primeira vez (arquivo ausente) é baixado e fica gravado
+def _obter_original():
+    if not os.path.exists(ESTADOS_PATH):
+        _baixar()
+    with open(ESTADOS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _arredondar(coordenadas, casas):
+    if isinstance(coordenadas[0], (int, float)):
+        return [round(c, casas) for c in coordenadas]
+    return [_arredondar(c, casas) for c in coordenadas]
+
+
+# Simplifica cada feição com shapely (preservando a topologia da própria feição)
+def simplificar_geojson(geojson, tolerancia, casas=None):
+    from shapely.geometry import mapping, shape
+
+    features = []
+    for feature in geojson["features"]:
+        geometria = shape(feature["geometry"]).simplify(tolerancia, preserve_topology=True)
+        geometria = json.loads(json.dumps(mapping(geometria)))
+        if casas is not None:
+            geometria["coordinates"] = _arredondar(geometria["coordinates"], casas)
+        features.append({"type": "Feature", "properties": feature["properties"], "geometry": geometria})
+    return {"type": "FeatureCollection", "features": features}
+
+
+# Carrega o GeoJSON dos estados no nível pedido ('original', 'alto', 'medio', 'baixo').
+# Os níveis simplificados que faltarem são gerados do original local e gravados em dados/.
+@lru_cache(maxsize=None)
+def carregar_geojson(nivel=NIVEL_PADRAO):
+    if nivel not in NIVEIS:
+        raise ValueError(f"Nível de simplificação desconhecido: {nivel}")
+    caminho = caminho_nivel(nivel)
+    with _lock:
+        if not os.path.exists(caminho):
+            original = _obter_original()
+            if nivel != "original":
+                tolerancia, casas = NIVEIS[nivel]
+                _salvar(simplificar_geojson(original, tolerancia, casas), caminho)
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Une os polígonos dos estados por região (operação cara: use carregar_geojson_regioes)
+def agrupar_por_regiao(geojson_obj, uf_to_regiao):
+    from shapely.geometry import mapping, shape
+    from shapely.ops import unary_union
+
+    regiao_geometrias = {}
+    for feature in geojson_obj["features"]:
+        uf = feature["properties"]["sigla"]
+        regiao = uf_to_regiao.get(uf)
+        if regiao:
+            regiao_geometrias.setdefault(regiao, []).append(shape(feature["geometry"]))
+
+    features = []
+    for regiao, shapes in regiao_geometrias.items():
+        geometria = json.loads(json.dumps(mapping(unary_union(shapes))))
+        features.append({"type": "Feature", "geometry": geometria, "properties": {"sigla": regiao}})
+    return {"type": "FeatureCollection", "features": features}
+
+
+@lru_cache(maxsize=None)
+def _hash_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _regioes_em_cache(nivel, itens_mapeamento):
+    carregar_geojson("original")
+    uf_to_regiao = dict(itens_mapeamento)
+    chave = hashlib.sha256(
+        (_hash_arquivo(ESTADOS_PATH) + nivel + json.dumps(uf_to_regiao, sort_keys=True)).encode("utf-8")
+    ).hexdigest()[:16]
+    caminho = os.path.join(CACHE_DIR, f"regioes_{nivel}_{chave}.geojson")
+    with _lock:
+        if not os.path.exists(caminho):
+            # A união é feita na resolução original e só depois simplificada, evitando frestas entre estados
+            regioes = agrupar_por_regiao(carregar_geojson("original"), uf_to_regiao)
+            tolerancia, casas = NIVEIS[nivel]
+            if tolerancia:
+                regioes = simplificar_geojson(regioes, tolerancia, casas)
+            _salvar(regioes, caminho)
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# GeoJSON das regiões (propriedade 'sigla' = nome da região), calculado uma única vez e gravado em disco
+def carregar_geojson_regioes(nivel=NIVEL_PADRAO, uf_para_regiao=None):
+    if nivel not in NIVEIS:
+        raise ValueError(f"Nível de simplificação desconhecido: {nivel}")
+    mapeamento = UF_PARA_REGIAO if uf_para_regiao is None else uf_para_regiao
+    return _regioes_em_cache(nivel, tuple(sorted(mapeamento.items())))
+
+
+def gerar_niveis():
+    for nivel in NIVEIS:
+        carregar_geojson(nivel)
+        carregar_geojson_regioes(nivel)
+        yield nivel, os.path.getsize(caminho_nivel(nivel))
+
+
+if __name__ == "__main__":
+    if "--baixar" in sys.argv[1:]:
+        baixar_original()
+    for nivel, tamanho in gerar_niveis():
+        print(f"{nivel:>8}: {caminho_nivel(nivel)} ({tamanho / 1024:.0f} KB)")
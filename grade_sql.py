@@ -0,0 +1,114 @@
+import banco_dados
+
+# Ponte entre o AgGrid (st_aggrid) e o SQLite: o estado da grade (ordenação e filtros
+# de coluna, devolvido em grid_state) vira ORDER BY / WHERE parametrizados e só o bloco
+# de linhas da página atual é enviado ao navegador.
+
+TAMANHOS_BLOCO = [20, 50, 100, 200]
+
+# Coluna que a consulta base expõe com a chave da linha (ex.: s.rowid AS _linha);
+# é o desempate padrão da ordenação e não vai para a grade
+COLUNA_LINHA = "_linha"
+
+# Filtros de texto e número do AgGrid (modelos da versão community)
+_FILTROS = {
+    "contains": ("{col} LIKE ? ESCAPE '\\'", lambda f: f"%{_escapar_like(f)}%"),
+    "notContains": ("({col} IS NULL OR {col} NOT LIKE ? ESCAPE '\\')", lambda f: f"%{_escapar_like(f)}%"),
+    "startsWith": ("{col} LIKE ? ESCAPE '\\'", lambda f: f"{_escapar_like(f)}%"),
+    "endsWith": ("{col} LIKE ? ESCAPE '\\'", lambda f: f"%{_escapar_like(f)}"),
+    "equals": ("{col} = ?", lambda f: f),
+    "notEqual": ("({col} IS NULL OR {col} <> ?)", lambda f: f),
+    "lessThan": ("{col} < ?", lambda f: f),
+    "lessThanOrEqual": ("{col} <= ?", lambda f: f),
+    "greaterThan": ("{col} > ?", lambda f: f),
+    "greaterThanOrEqual": ("{col} >= ?", lambda f: f),
+    "blank": ("({col} IS NULL OR {col} = '')", None),
+    "notBlank": ("({col} IS NOT NULL AND {col} <> '')", None),
+}
+
+
+def _escapar_like(valor):
+    return str(valor).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _condicao(coluna, modelo, params):
+    # Filtro composto: {"operator": "AND"|"OR", "conditions": [...]}
+    if "conditions" in modelo:
+        juncao = " OR " if str(modelo.get("operator", "AND")).upper() == "OR" else " AND "
+        partes = [_condicao(coluna, m, params) for m in modelo["conditions"]]
+        return "(" + juncao.join(partes) + ")"
+    tipo = modelo.get("type")
+    if tipo == "inRange":
+        params.extend([modelo.get("filter"), modelo.get("filterTo")])
+        return f"{coluna} BETWEEN ? AND ?"
+    if tipo not in _FILTROS:
+        raise ValueError(f"Tipo de filtro não suportado: {tipo}")
+    condicao, preparar = _FILTROS[tipo]
+    if preparar is not None:
+        params.append(preparar(modelo.get("filter")))
+    return condicao.format(col=coluna)
+
+
+# filterModel do AgGrid -> (lista de condições SQL, parâmetros).
+# Só colunas conhecidas (presentes em 'colunas') são aceitas.
+def traduzir_filtros(filter_model, colunas):
+    condicoes, params = [], []
+    for coluna, modelo in (filter_model or {}).items():
+        if coluna not in colunas:
+            raise ValueError(f"Coluna desconhecida no filtro: {coluna}")
+        condicoes.append(_condicao(f'"{coluna}"', modelo, params))
+    return condicoes, params
+
+
+# sortModel do AgGrid -> cláusula ORDER BY. As colunas de 'desempate' (padrão: COLUNA_LINHA)
+# vêm sempre depois das escolhidas na grade, para que LIMIT/OFFSET devolvam blocos estáveis
+# mesmo com valores repetidos ou sem ordenação.
+def traduzir_ordenacao(sort_model, colunas, desempate=(COLUNA_LINHA,)):
+    partes, usadas = [], set()
+    for item in sort_model or []:
+        coluna = item.get("colId")
+        if coluna not in colunas:
+            raise ValueError(f"Coluna desconhecida na ordenação: {coluna}")
+        partes.append(f'"{coluna}" {"DESC" if item.get("sort") == "desc" else "ASC"}')
+        usadas.add(coluna)
+    partes += [f'"{coluna}"' for coluna in desempate if coluna not in usadas]
+    return " ORDER BY " + ", ".join(partes) if partes else ""
+
+
+# Só as partes do grid_state que mudam a consulta (ordenação e filtros)
+def estado_consulta(grid_state):
+    grid_state = grid_state or {}
+    return {
+        "sort": grid_state.get("sort") or {},
+        "filter": grid_state.get("filter") or {},
+    }
+
+
+# Aplica o estado da grade por fora de 'sql_base' (um SELECT com colunas nomeadas)
+def _montar(sql_base, params_base, colunas, estado, desempate=(COLUNA_LINHA,)):
+    estado = estado_consulta(estado)
+    condicoes, params_filtro = traduzir_filtros(estado["filter"].get("filterModel"), colunas)
+    where = " WHERE " + " AND ".join(condicoes) if condicoes else ""
+    ordem = traduzir_ordenacao(estado["sort"].get("sortModel"), colunas, desempate)
+    return f"SELECT * FROM ({sql_base}){where}", list(params_base) + params_filtro, ordem
+
+
+# Total de linhas que atendem aos filtros da grade (em cache até as tabelas mudarem)
+def contar(sql_base, params_base, colunas, estado, tabelas=(), db_path=banco_dados.DB_PATH):
+    sql, params, _ = _montar(sql_base, params_base, colunas, estado)
+    return int(banco_dados.consultar(f"SELECT COUNT(*) AS n FROM ({sql})", params, tabelas=tabelas, db_path=db_path)["n"].iloc[0])
+
+
+# Só o bloco de linhas da página pedida (numerada a partir de 1), já filtrado e ordenado no banco.
+# desempate: colunas que identificam a linha; o padrão exige COLUNA_LINHA na consulta base,
+# que é retirada do resultado.
+def consultar_bloco(sql_base, params_base, colunas, estado, pagina=1, tamanho=TAMANHOS_BLOCO[0],
+                    tabelas=(), db_path=banco_dados.DB_PATH, desempate=(COLUNA_LINHA,)):
+    sql, params, ordem = _montar(sql_base, params_base, colunas, estado, desempate)
+    df = banco_dados.consultar(
+        f"{sql}{ordem} LIMIT ? OFFSET ?",
+        params + [int(tamanho), (max(int(pagina), 1) - 1) * int(tamanho)],
+        tabelas=tabelas,
+        db_path=db_path,
+    )
+    return df.drop(columns=[COLUNA_LINHA], errors="ignore")
@@ -0,0 +1,291 @@
+import sqlite3
+from datetime import date, datetime, time
+
+import openpyxl
+import pandas as pd
+
+import banco_dados
+import busca_ctes
+import cidades_hub
+import resumos
+
+# Carga de planilhas Excel no banco em lotes, sem montar a planilha inteira em memória.
+# A planilha é lida linha a linha (openpyxl read_only) e gravada em lotes de TAMANHO_LOTE
+# numa única transação; a página só recebe uma amostra para exibir.
+
+TAMANHO_LOTE = 5000
+LINHAS_PREVIEW = 200
+
+# Ajustes aplicados à conexão de escrita durante a carga
+CACHE_SIZE_CARGA_KB = 256 * 1024   # 256 MB de cache de páginas
+
+# Chave natural de cada tabela, usada na carga sem duplicação (modo "upsert")
+CHAVES_NATURAIS = {
+    "Site Carga Rastreada": ("cte", "nf"),
+    "Relatorios_CTEs": ("cte", "serie"),
+}
+
+MODO_INSERIR = "inserir"
+MODO_UPSERT = "upsert"
+TABELA_STAGING = "_carga_staging"
+
+
+# Mesmo padrão de nomes usado pelo Painel de Controle
+def normalizar_coluna(nome):
+    return str(nome).strip().replace(" ", "_").lower()
+
+
+def _cabecalho(linha):
+    # Colunas sem título recebem o mesmo nome que o pandas daria ('Unnamed: n')
+    return [normalizar_coluna(c if c is not None else f"Unnamed: {i}") for i, c in enumerate(linha)]
+
+
+# Datas viram texto ('AAAA-MM-DD hh:mm:ss'), como no carregamento anterior via pandas
+def _coagir_valor(valor):
+    if isinstance(valor, datetime):
+        return str(pd.Timestamp(valor))
+    if isinstance(valor, (date, time)):
+        return valor.isoformat()
+    return valor
+
+
+def _abrir_planilha(arquivo):
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    livro = openpyxl.load_workbook(arquivo, read_only=True, data_only=True)
+    return livro, livro.active
+
+
+# Quantidade de linhas de dados informada pela planilha (pode ser None em arquivos sem dimensão)
+def contar_linhas(arquivo):
+    livro, planilha = _abrir_planilha(arquivo)
+    try:
+        return planilha.max_row - 1 if planilha.max_row else None
+    finally:
+        livro.close()
+
+
+# Colunas da planilha (primeira linha); lista vazia se a planilha não tem cabeçalho
+def ler_cabecalho(arquivo):
+    livro, planilha = _abrir_planilha(arquivo)
+    try:
+        linha = next(planilha.iter_rows(values_only=True), ())
+        return _cabecalho(linha) if any(v is not None for v in linha) else []
+    finally:
+        livro.close()
+
+
+# Lê a planilha em lotes e devolve (colunas, [linhas já convertidas]) para cada lote
+def iterar_lotes(arquivo, tamanho_lote=TAMANHO_LOTE):
+    livro, planilha = _abrir_planilha(arquivo)
+    try:
+        linhas = planilha.iter_rows(values_only=True)
+        colunas = _cabecalho(next(linhas, ()))
+        lote = []
+        for linha in linhas:
+            if all(v is None for v in linha):
+                continue
+            valores = [_coagir_valor(v) for v in linha[:len(colunas)]]
+            valores += [None] * (len(colunas) - len(valores))
+            lote.append(valores)
+            if len(lote) >= tamanho_lote:
+                yield colunas, lote
+                lote = []
+        if lote:
+            yield colunas, lote
+    finally:
+        livro.close()
+
+
+# Primeiras linhas da planilha como DataFrame, para exibir antes da carga
+def ler_preview(arquivo, linhas=LINHAS_PREVIEW):
+    for colunas, lote in iterar_lotes(arquivo, tamanho_lote=linhas):
+        return pd.DataFrame(lote, columns=colunas)
+    return pd.DataFrame()
+
+
+def _colunas_tabela(conn, tabela):
+    return [linha[1] for linha in conn.execute(f'PRAGMA table_info("{tabela}")')]
+
+
+# Cria a tabela com os tipos que o pandas inferiria no to_sql, a partir do primeiro lote
+# (CREATE TABLE dentro da transação da carga: se a carga falhar, a tabela não fica criada)
+def _criar_tabela(conn, tabela, colunas, amostra):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabela,)).fetchone():
+        raise ValueError(f"A tabela '{tabela}' já existe.")
+    conn.execute(pd.io.sql.get_schema(pd.DataFrame(amostra, columns=colunas), tabela, con=conn))
+
+
+def _nome_indice_unico(tabela, chaves):
+    return "ux_" + "_".join(normalizar_coluna(p) for p in (tabela, *chaves))
+
+
+# Índice único na chave natural (exigido pelo ON CONFLICT).
+# Falha com ValueError se a tabela já tiver linhas repetidas nessa chave.
+def garantir_chave_unica(conn, tabela, chaves):
+    colunas = ", ".join(f'"{c}"' for c in chaves)
+    try:
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{_nome_indice_unico(tabela, chaves)}" ON "{tabela}" ({colunas})')
+    except sqlite3.IntegrityError:
+        raise ValueError(
+            f"A tabela '{tabela}' tem linhas repetidas na chave ({', '.join(chaves)}); "
+            "rode 'python migracoes.py' para removê-las (as divergentes ficam em "
+            f"'{_nome_backup_duplicadas(tabela)}')."
+        )
+
+
+def _nome_backup_duplicadas(tabela):
+    return f"{tabela}_duplicadas"
+
+
+# Deixa a tabela com uma linha por chave natural, sem perder dados:
+# - cópias exatas (todas as colunas iguais) são removidas;
+# - nos grupos com valores diferentes fica a carregada por último (maior rowid) e as outras
+#   são copiadas, com o rowid original e a data, para "<tabela>_duplicadas" antes de sair.
+# Devolve (cópias exatas removidas, linhas conflitantes guardadas no backup).
+def remover_duplicadas(conn, tabela, chaves):
+    colunas = ", ".join(f'"{c}"' for c in _colunas_tabela(conn, tabela))
+    chave_sql = ", ".join(f'"{c}"' for c in chaves)
+    chave_preenchida = " AND ".join(f'"{c}" IS NOT NULL' for c in chaves)
+    exatas = conn.execute(f"""
+        DELETE FROM "{tabela}"
+        WHERE {chave_preenchida}
+          AND rowid NOT IN (SELECT MAX(rowid) FROM "{tabela}" GROUP BY {colunas})
+    """).rowcount
+
+    descartar = f"""
+        SELECT rowid FROM "{tabela}"
+        WHERE {chave_preenchida}
+          AND rowid NOT IN (SELECT MAX(rowid) FROM "{tabela}" GROUP BY {chave_sql})
+    """
+    if conn.execute(f"SELECT EXISTS ({descartar})").fetchone()[0] == 0:
+        return exatas, 0
+    backup = _nome_backup_duplicadas(tabela)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS "{backup}" AS
+        SELECT rowid AS rowid_original, {colunas}, '' AS guardada_em FROM "{tabela}" WHERE 0
+    """)
+    conflitantes = conn.execute(f"""
+        INSERT INTO "{backup}" (rowid_original, {colunas}, guardada_em)
+        SELECT rowid, {colunas}, ? FROM "{tabela}" WHERE rowid IN ({descartar})
+    """, (datetime.now().isoformat(timespec="seconds"),)).rowcount
+    conn.execute(f'DELETE FROM "{tabela}" WHERE rowid IN ({descartar})')
+    return exatas, conflitantes
+
+
+# Aplica o staging na tabela com INSERT ... ON CONFLICT DO UPDATE.
+# Linhas sem chave são ignoradas ('sem_chave'); linhas repetidas na própria planilha valem pela
+# última ocorrência e as anteriores são descartadas ('repetidas').
+def _upsert_staging(conn, tabela, colunas, chaves):
+    chave_sql = ", ".join(f'"{c}"' for c in chaves)
+    colunas_sql = ", ".join(f'"{c}"' for c in colunas)
+    chave_preenchida = " AND ".join(f'"{c}" IS NOT NULL' for c in chaves)
+    junta_chave = " AND ".join(f't."{c}" = s."{c}"' for c in chaves)
+    iguais = " AND ".join(f't."{c}" IS s."{c}"' for c in colunas)
+    atualizaveis = [c for c in colunas if c not in chaves]
+
+    sem_chave = conn.execute(f"DELETE FROM {TABELA_STAGING} WHERE NOT ({chave_preenchida})").rowcount
+    repetidas = conn.execute(f"""
+        DELETE FROM {TABELA_STAGING}
+        WHERE rowid NOT IN (SELECT MAX(rowid) FROM {TABELA_STAGING} GROUP BY {chave_sql})
+    """).rowcount
+    existentes, inalteradas = conn.execute(f"""
+        SELECT COUNT(t.rowid), COALESCE(SUM({iguais}), 0)
+        FROM {TABELA_STAGING} s LEFT JOIN "{tabela}" t ON {junta_chave}
+    """).fetchone()
+    validas = conn.execute(f"SELECT COUNT(*) FROM {TABELA_STAGING}").fetchone()[0]
+
+    if atualizaveis:
+        atualizacao = (
+            "DO UPDATE SET " + ", ".join(f'"{c}" = excluded."{c}"' for c in atualizaveis)
+            + " WHERE " + " OR ".join(f'"{tabela}"."{c}" IS NOT excluded."{c}"' for c in atualizaveis)
+        )
+    else:
+        atualizacao = "DO NOTHING"
+    # 'WHERE true' evita a ambiguidade do parser entre ON (junção) e ON CONFLICT
+    conn.execute(f"""
+        INSERT INTO "{tabela}" ({colunas_sql})
+        SELECT {colunas_sql} FROM {TABELA_STAGING} WHERE true
+        ON CONFLICT ({chave_sql}) {atualizacao}
+    """)
+    return {
+        "inseridas": validas - existentes,
+        "atualizadas": existentes - inalteradas,
+        "inalteradas": inalteradas,
+        "sem_chave": sem_chave,
+        "repetidas": repetidas,
+    }
+
+
+# Grava a planilha na tabela em lotes.
+# criar=True cria a tabela a partir do primeiro lote (erro se já existir); planilha só com o
+# cabeçalho cria a tabela vazia e planilha sem cabeçalho é recusada.
+# Caso contrário as colunas da planilha precisam existir na tabela.
+# modo=MODO_UPSERT grava pela chave natural (CHAVES_NATURAIS ou 'chaves'): os lotes vão para
+# uma tabela temporária e depois entram com INSERT ... ON CONFLICT DO UPDATE, então reenviar
+# a mesma planilha não duplica linhas.
+# progresso(linhas_lidas, total_estimado) é chamado após cada lote.
+# Devolve a contagem {'inseridas', 'atualizadas', 'inalteradas', 'sem_chave', 'repetidas'}.
+def carregar_excel(arquivo, tabela, criar=False, modo=MODO_INSERIR, chaves=None, tamanho_lote=TAMANHO_LOTE,
+                   progresso=None, db_path=banco_dados.DB_PATH):
+    if modo == MODO_UPSERT:
+        chaves = tuple(chaves or CHAVES_NATURAIS.get(tabela, ()))
+        if not chaves:
+            raise ValueError(f"Nenhuma chave natural definida para a tabela '{tabela}'.")
+    total = contar_linhas(arquivo)
+    lidas = 0
+    colunas = []
+    with banco_dados.conexao_escrita(db_path) as conn:
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_CARGA_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("BEGIN IMMEDIATE")
+        for colunas, lote in iterar_lotes(arquivo, tamanho_lote):
+            if lidas == 0:
+                if criar:
+                    _criar_tabela(conn, tabela, colunas, lote)
+                faltando = (set(colunas) | set(chaves or ())) - set(_colunas_tabela(conn, tabela))
+                if faltando:
+                    raise ValueError(f"Colunas ausentes na tabela '{tabela}': {', '.join(sorted(faltando))}")
+                colunas_sql = ", ".join(f'"{c}"' for c in colunas)
+                destino = f'"{tabela}"'
+                if modo == MODO_UPSERT:
+                    faltando_na_planilha = set(chaves) - set(colunas)
+                    if faltando_na_planilha:
+                        raise ValueError(f"A planilha não tem as colunas da chave: {', '.join(sorted(faltando_na_planilha))}")
+                    garantir_chave_unica(conn, tabela, chaves)
+                    # Staging com as mesmas afinidades de tipo da tabela de destino
+                    conn.execute(f"DROP TABLE IF EXISTS temp.{TABELA_STAGING}")
+                    conn.execute(f'CREATE TEMP TABLE {TABELA_STAGING} AS SELECT {colunas_sql} FROM "{tabela}" WHERE 0')
+                    destino = TABELA_STAGING
+                insert = f'INSERT INTO {destino} ({colunas_sql}) VALUES ({", ".join("?" * len(colunas))})'
+            conn.executemany(insert, lote)
+            lidas += len(lote)
+            if progresso:
+                progresso(lidas, total)
+
+        if criar and lidas == 0:
+            cabecalho = ler_cabecalho(arquivo)
+            if not cabecalho:
+                raise ValueError("A planilha está vazia (sem cabeçalho): nenhuma tabela foi criada.")
+            _criar_tabela(conn, tabela, cabecalho, [])
+
+        if modo == MODO_UPSERT and colunas:
+            contagem = _upsert_staging(conn, tabela, colunas, chaves)
+            conn.execute(f"DROP TABLE temp.{TABELA_STAGING}")
+        else:
+            contagem = {"inseridas": lidas, "atualizadas": 0, "inalteradas": 0, "sem_chave": 0, "repetidas": 0}
+        atualizar_derivados(conn, tabela)
+    return contagem
+
+
+# Depois de carregar ou excluir 'tabela' (fora das triggers): dimensão cidade -> hub,
+# resumos diários e índice de busca em dia. A dimensão só é tocada quando a tabela de hubs
+# ou uma tabela com cidades muda; se alguma cidade ganhou hub, o resumo por hub é refeito.
+def atualizar_derivados(conn, tabela):
+    alterada = tabela
+    if tabela == cidades_hub.TABELA_HUB:
+        cidades_hub.garantir_cidades_hub(conn, tabela)
+    elif tabela in cidades_hub.TABELAS_CIDADE and cidades_hub.garantir_cidades_hub(conn, tabela):
+        alterada = cidades_hub.TABELA_DIMENSAO
+    resumos.garantir_resumos(conn, tabela_alterada=alterada)
+    busca_ctes.garantir_indices_busca(conn)
@@ -0,0 +1,302 @@
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import banco_dados
+import cidades_hub
+
+# Estado do Kanban de pedidos After-Sales no SQLite.
+# kanban_card guarda a etapa atual de cada par CTe/NF e kanban_movimentos registra,
+# só por inserção, cada mudança de etapa (quem, de onde, para onde e quando).
+# Mover um cartão é um UPDATE de uma linha condicionado à etapa de origem: se outro
+# usuário já o moveu, o movimento é recusado em vez de sobrescrever o dele.
+
+TABELA_SITE = "Site Carga Rastreada"
+TABELA_CARDS = "kanban_card"
+TABELA_MOVIMENTOS = "kanban_movimentos"
+
+# Estado antigo do quadro (um JSON reescrito a cada movimento), importado uma única vez
+ARQUIVO_ESTADO_ANTIGO = "kanban_state.json"
+
+ETAPAS = ["Em Coleta", "Em Triagem", "Aguardando Coleta", "Em Rota de Entrega", "Entrega Concluída"]
+ETAPA_INICIAL = ETAPAS[0]
+PROXIMA_ETAPA = dict(zip(ETAPAS, ETAPAS[1:]))
+
+# Colunas do Site em que a busca do quadro procura o texto digitado
+COLUNAS_BUSCA_CARD = ["emissor", "cidade", "dealer"]
+
+_lock = threading.Lock()
+_versao_sincronizada = {}
+
+
+def _agora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _tem_tabela(conn, nome):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (nome,)).fetchone() is not None
+
+
+def preparar_tabelas(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_CARDS} (
+            cte INTEGER NOT NULL,
+            nf INTEGER NOT NULL,
+            etapa TEXT NOT NULL,
+            atualizado_em TEXT NOT NULL,
+            PRIMARY KEY (cte, nf)
+        )
+    """)
+    # Carga do quadro: uma busca por etapa, já na ordem de exibição
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_CARDS}_etapa ON {TABELA_CARDS} (etapa, cte, nf)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_MOVIMENTOS} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cte INTEGER NOT NULL,
+            nf INTEGER NOT NULL,
+            de TEXT,
+            para TEXT NOT NULL,
+            usuario TEXT,
+            movido_em TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABELA_MOVIMENTOS}_card ON {TABELA_MOVIMENTOS} (cte, nf, id)")
+
+
+# Traz para o quadro (na etapa inicial) os pares CTe/NF que ainda não têm cartão
+def incluir_novos_cards(conn):
+    if not _tem_tabela(conn, TABELA_SITE):
+        return 0
+    return conn.execute(f"""
+        INSERT OR IGNORE INTO {TABELA_CARDS} (cte, nf, etapa, atualizado_em)
+        SELECT DISTINCT cte, nf, ?, ? FROM "{TABELA_SITE}" WHERE cte IS NOT NULL AND nf IS NOT NULL
+    """, (ETAPA_INICIAL, _agora())).rowcount
+
+
+# Importa as etapas salvas no kanban_state.json (sem sobrescrever cartões já existentes)
+def importar_estado_antigo(conn, caminho=ARQUIVO_ESTADO_ANTIGO):
+    if not os.path.exists(caminho):
+        return 0
+    with open(caminho, "r") as f:
+        estado = json.load(f)
+    agora = _agora()
+    linhas = [
+        (card.get("cte"), card.get("nf"), etapa, agora)
+        for etapa, cards in estado.items() if etapa in ETAPAS
+        for card in cards
+    ]
+    return conn.executemany(
+        f"INSERT OR IGNORE INTO {TABELA_CARDS} (cte, nf, etapa, atualizado_em) VALUES (?, ?, ?, ?)",
+        [linha for linha in linhas if linha[0] is not None and linha[1] is not None],
+    ).rowcount
+
+
+# Garante as tabelas e inclui os CTes novos; só lê o Site quando ele mudou desde a última vez
+def sincronizar(db_path=banco_dados.DB_PATH):
+    with banco_dados.conexao_leitura(db_path) as conn:
+        versao = banco_dados.versao_tabela(conn, TABELA_SITE)
+        pronto = _tem_tabela(conn, TABELA_CARDS) and _tem_tabela(conn, TABELA_MOVIMENTOS)
+    with _lock:
+        if pronto and _versao_sincronizada.get(db_path) == versao:
+            return 0
+    with banco_dados.conexao_escrita(db_path) as conn:
+        preparar_tabelas(conn)
+        if not pronto:
+            importar_estado_antigo(conn)
+        incluidos = incluir_novos_cards(conn)
+    with _lock:
+        _versao_sincronizada[db_path] = versao
+    return incluidos
+
+
+def _escapar_like(valor):
+    return str(valor).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# Filtro da busca do quadro: trecho do CTe/NF ou de emissor/cidade/dealer
+def _filtro_busca(busca, existentes):
+    if not busca or not str(busca).strip():
+        return "", []
+    padrao = f"%{_escapar_like(str(busca).strip())}%"
+    campos = ["CAST(c.cte AS TEXT)", "CAST(c.nf AS TEXT)"] + [f's."{c}"' for c in COLUNAS_BUSCA_CARD if c in existentes]
+    return " AND (" + " OR ".join(f"{campo} LIKE ? ESCAPE '\\'" for campo in campos) + ")", [padrao] * len(campos)
+
+
+def _colunas_site(db_path):
+    with banco_dados.conexao_leitura(db_path) as conn:
+        return {linha[1] for linha in conn.execute(f'PRAGMA table_info("{TABELA_SITE}")')}
+
+
+_LIGACAO_SITE = f"""
+    LEFT JOIN "{TABELA_SITE}" s
+        ON s.rowid = (SELECT MIN(x.rowid) FROM "{TABELA_SITE}" x WHERE x.cte = c.cte AND x.nf = c.nf)
+"""
+_JUNCAO_SITE = f"FROM {TABELA_CARDS} c {_LIGACAO_SITE}"
+
+# cada movimento insere no log, o que muda a versão e invalida o cache
+_TABELAS_QUADRO = [TABELA_CARDS, TABELA_MOVIMENTOS, TABELA_SITE]
+
+
+# Cartões de uma etapa com os dados do CTe (primeira linha do par CTe/NF no Site),
+# na ordem do índice (etapa, cte, nf); 'limite' traz só os primeiros, para o quadro
+# renderizar apenas os cartões visíveis.
+def cards_etapa(etapa, limite=None, busca=None, db_path=banco_dados.DB_PATH):
+    filtro, params = _filtro_busca(busca, _colunas_site(db_path))
+    sql = f"SELECT c.cte, c.nf, c.atualizado_em, s.* {_JUNCAO_SITE} WHERE c.etapa = ?{filtro} ORDER BY c.cte, c.nf"
+    params = [etapa] + params
+    if limite is not None:
+        sql += " LIMIT ?"
+        params.append(int(limite))
+    df = banco_dados.consultar(sql, params, tabelas=_TABELAS_QUADRO, db_path=db_path)
+    # cte/nf do cartão prevalecem sobre as do Site (que podem faltar se a linha foi removida)
+    return df.loc[:, ~df.columns.duplicated()]
+
+
+def contar_etapa(etapa, busca=None, db_path=banco_dados.DB_PATH):
+    filtro, params = _filtro_busca(busca, _colunas_site(db_path))
+    juncao = _JUNCAO_SITE if filtro else f" FROM {TABELA_CARDS} c "
+    df = banco_dados.consultar(
+        f"SELECT COUNT(*) AS n {juncao} WHERE c.etapa = ?{filtro}",
+        [etapa] + params,
+        tabelas=_TABELAS_QUADRO,
+        db_path=db_path,
+    )
+    return int(df["n"].iloc[0])
+
+
+# Um cartão (etapa atual + todas as colunas do CTe), para o painel de detalhes
+def card(cte, nf, db_path=banco_dados.DB_PATH):
+    df = banco_dados.consultar(
+        f"SELECT c.etapa, c.cte, c.nf, c.atualizado_em, s.* {_JUNCAO_SITE} WHERE c.cte = ? AND c.nf = ?",
+        (cte, nf),
+        tabelas=_TABELAS_QUADRO,
+        db_path=db_path,
+    )
+    df = df.loc[:, ~df.columns.duplicated()]
+    return df.iloc[0].to_dict() if not df.empty else None
+
+
+def contagem_por_etapa(db_path=banco_dados.DB_PATH):
+    df = banco_dados.consultar(
+        f"SELECT etapa, COUNT(*) AS cards FROM {TABELA_CARDS} GROUP BY etapa",
+        tabelas=[TABELA_CARDS, TABELA_MOVIMENTOS],
+        db_path=db_path,
+    )
+    return {etapa: int(df.loc[df["etapa"] == etapa, "cards"].sum()) for etapa in ETAPAS}
+
+
+# Move o cartão de 'origem' para 'destino'. Devolve False se ele não estava mais em 'origem'
+# (movido por outro usuário nesse meio tempo).
+def mover(cte, nf, origem, destino, usuario=None, db_path=banco_dados.DB_PATH):
+    if destino not in ETAPAS:
+        raise ValueError(f"Etapa desconhecida: {destino}")
+    agora = _agora()
+    with banco_dados.conexao_escrita(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        movido = conn.execute(
+            f"UPDATE {TABELA_CARDS} SET etapa = ?, atualizado_em = ? WHERE cte = ? AND nf = ? AND etapa = ?",
+            (destino, agora, cte, nf, origem),
+        ).rowcount == 1
+        if movido:
+            conn.execute(
+                f"INSERT INTO {TABELA_MOVIMENTOS} (cte, nf, de, para, usuario, movido_em) VALUES (?, ?, ?, ?, ?, ?)",
+                (cte, nf, origem, destino, usuario, agora),
+            )
+    return movido
+
+
+# --- Movimentação em lote ---
+
+# Números de NF colados (separados por espaço, vírgula, quebra de linha...) -> lista de inteiros
+def ler_lista_nfs(texto):
+    return sorted({int(numero) for numero in re.findall(r"\d+", texto or "")})
+
+
+# Seleção dos cartões da etapa 'origem' pelos filtros do lote; listas vão como um único
+# parâmetro JSON (json_each), sem limite de quantidade de NFs coladas.
+def _selecao_lote(origem, hubs=None, emissores=None, data_inicio=None, data_fim=None, nfs=None):
+    juncoes, condicoes, params = "", ["c.etapa = ?"], [origem]
+    if hubs or emissores or data_inicio or data_fim:
+        juncoes += _LIGACAO_SITE
+    if hubs:
+        juncoes += f" LEFT JOIN {cidades_hub.TABELA_DIMENSAO} h ON h.cidade = s.cidade"
+        condicoes.append("h.hub IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(hubs)))
+    if emissores:
+        condicoes.append("s.emissor IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(list(emissores)))
+    if data_inicio:
+        condicoes.append("s.emissao_cte >= ?")
+        params.append(str(data_inicio))
+    if data_fim:
+        condicoes.append("s.emissao_cte <= ?")
+        params.append(str(data_fim))
+    if nfs:
+        condicoes.append("c.nf IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps([int(nf) for nf in nfs]))
+    return f"SELECT c.cte, c.nf FROM {TABELA_CARDS} c {juncoes} WHERE {' AND '.join(condicoes)}", params
+
+
+# Quantos cartões um movimento por filtro levaria (prévia antes de confirmar)
+def contar_lote(origem, hubs=None, emissores=None, data_inicio=None, data_fim=None, nfs=None,
+                db_path=banco_dados.DB_PATH):
+    sql, params = _selecao_lote(origem, hubs, emissores, data_inicio, data_fim, nfs)
+    df = banco_dados.consultar(f"SELECT COUNT(*) AS n FROM ({sql})", params, tabelas=_TABELAS_QUADRO, db_path=db_path)
+    return int(df["n"].iloc[0])
+
+
+# Move de uma vez os pares (cte, nf) listados em temp._lote: log + UPDATE na mesma transação.
+# Só entram os cartões que ainda estão em 'origem'.
+def _mover_lote(conn, origem, destino, usuario):
+    agora = _agora()
+    conn.execute(f"""
+        INSERT INTO {TABELA_MOVIMENTOS} (cte, nf, de, para, usuario, movido_em)
+        SELECT c.cte, c.nf, ?, ?, ?, ?
+        FROM temp._lote l JOIN {TABELA_CARDS} c ON c.cte = l.cte AND c.nf = l.nf
+        WHERE c.etapa = ?
+    """, (origem, destino, usuario, agora, origem))
+    movidos = conn.execute(f"""
+        UPDATE {TABELA_CARDS} SET etapa = ?, atualizado_em = ?
+        WHERE etapa = ? AND (cte, nf) IN (SELECT cte, nf FROM temp._lote)
+    """, (destino, agora, origem)).rowcount
+    conn.execute("DROP TABLE temp._lote")
+    return movidos
+
+
+def _validar_destino(origem, destino):
+    if destino not in ETAPAS:
+        raise ValueError(f"Etapa desconhecida: {destino}")
+    if destino == origem:
+        raise ValueError("A etapa de destino é a mesma de origem.")
+
+
+# Move vários cartões [(cte, nf), ...] numa única transação; devolve quantos foram movidos
+def mover_em_lote(cards, origem, destino, usuario=None, db_path=banco_dados.DB_PATH):
+    _validar_destino(origem, destino)
+    with banco_dados.conexao_escrita(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("CREATE TEMP TABLE _lote (cte INTEGER, nf INTEGER, PRIMARY KEY (cte, nf))")
+        conn.executemany("INSERT OR IGNORE INTO temp._lote VALUES (?, ?)", [(int(c), int(n)) for c, n in cards])
+        return _mover_lote(conn, origem, destino, usuario)
+
+
+# Move todos os cartões de 'origem' que atendem aos filtros (hub, emissor, emissão, NFs)
+def mover_por_filtro(origem, destino, hubs=None, emissores=None, data_inicio=None, data_fim=None, nfs=None,
+                     usuario=None, db_path=banco_dados.DB_PATH):
+    _validar_destino(origem, destino)
+    sql, params = _selecao_lote(origem, hubs, emissores, data_inicio, data_fim, nfs)
+    with banco_dados.conexao_escrita(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(f"CREATE TEMP TABLE _lote AS {sql}", params)
+        return _mover_lote(conn, origem, destino, usuario)
+
+
+def historico(cte, nf, db_path=banco_dados.DB_PATH):
+    return banco_dados.consultar(
+        f"SELECT de, para, usuario, movido_em FROM {TABELA_MOVIMENTOS} WHERE cte = ? AND nf = ? ORDER BY id",
+        (cte, nf),
+        tabelas=[TABELA_MOVIMENTOS],
+        db_path=db_path,
+    )
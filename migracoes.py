@@ -0,0 +1,271 @@
+import sys
+from datetime import datetime
+
+import banco_dados
+import busca_ctes
+import cidades_hub
+import ingestao
+import kanban
+import resumos
+
+# Migrações versionadas do banco logistica_interna.db.
+# Uso: python migracoes.py            -> aplica as migrações pendentes
+#      python migracoes.py --status   -> lista as migrações e se já foram aplicadas
+
+
+def _tabela_existe(conn, tabela):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabela,)).fetchone() is not None
+
+
+def _colunas(conn, tabela):
+    return [linha[1] for linha in conn.execute(f'PRAGMA table_info("{tabela}")')]
+
+
+# Converte texto em número; vazio vira NULL
+def _numero(coluna, tipo):
+    return f'CAST(NULLIF(TRIM("{coluna}"), \'\') AS {tipo})'
+
+
+# Inteiro sem perda: a afinidade INTEGER da coluna converte só o texto que é número inteiro;
+# o resto (ex.: 'NF-123') fica como texto em vez de virar 0 ou ser truncado pelo CAST
+def _inteiro(expressao):
+    return f"NULLIF(TRIM({expressao}), '')"
+
+
+# Converte para data ISO (AAAA-MM-DD) quando possível, mantendo o texto original caso contrário
+def _data_iso(expressao):
+    return f"COALESCE(date({expressao}), NULLIF(NULLIF({expressao}, 'NaT'), ''))"
+
+
+# --- 001: Relatorios_CTEs com colunas numéricas e data ISO ---
+def _m001_relatorios_ctes_tipado(conn):
+    if not _tabela_existe(conn, "Relatorios_CTEs"):
+        return
+    conn.execute("""
+        CREATE TABLE "Relatorios_CTEs_nova" (
+            "cte" TEXT,
+            "serie" TEXT,
+            "relacao_de_notas_fiscais" TEXT,
+            "valor_total_das_notas" REAL,
+            "modalidade" TEXT,
+            "remetente" TEXT,
+            "cod._remetente" TEXT,
+            "cnpj_remetente" TEXT,
+            "cidade_remetente" TEXT,
+            "uf_remetente" TEXT,
+            "destinatario" TEXT,
+            "dn" TEXT,
+            "cnpj_destinatario" TEXT,
+            "cidade_destinatario" TEXT,
+            "uf_destinatario" TEXT,
+            "quantidade_de_volumes" INTEGER,
+            "peso_real_(kg)" REAL,
+            "peso_cubado" REAL,
+            "valor_frete_(r$)" REAL,
+            "n._fatura" TEXT,
+            "cte_origem" TEXT,
+            "data_emissao" TEXT,
+            "qtd._notas" INTEGER
+        )
+    """)
+    # Linhas em branco e cabeçalhos repetidos das planilhas importadas são descartados
+    conn.execute(f"""
+        INSERT INTO "Relatorios_CTEs_nova"
+        SELECT
+            "cte", "serie", "relacao_de_notas_fiscais",
+            {_numero("valor_total_das_notas", "REAL")},
+            "modalidade", "remetente", "cod._remetente", "cnpj_remetente",
+            "cidade_remetente", "uf_remetente", "destinatario", "dn", "cnpj_destinatario",
+            "cidade_destinatario", "uf_destinatario",
+            {_numero("quantidade_de_volumes", "INTEGER")},
+            {_numero("peso_real_(kg)", "REAL")},
+            {_numero("peso_cubado", "REAL")},
+            {_numero("valor_frete_(r$)", "REAL")},
+            "n._fatura", "cte_origem",
+            {_data_iso('"data_emissao"')},
+            {_numero("qtd._notas", "INTEGER")}
+        FROM "Relatorios_CTEs"
+        WHERE "cte" IS NOT NULL AND UPPER("cte") <> 'CTE'
+    """)
+    conn.execute('DROP TABLE "Relatorios_CTEs"')
+    conn.execute('ALTER TABLE "Relatorios_CTEs_nova" RENAME TO "Relatorios_CTEs"')
+
+
+# --- 002: Site Carga Rastreada sem colunas duplicadas ---
+# Unifica dt.entrega/dt_entrega, prev.entrega/prev_entrega, qtd.vols/qtd_vols e cte/numero_cte
+# mantendo os nomes usados pelas páginas.
+def _m002_site_carga_unificada(conn):
+    tabela = "Site Carga Rastreada"
+    if not _tabela_existe(conn, tabela):
+        return
+    colunas = set(_colunas(conn, tabela))
+
+    def unificar(principal, alternativa):
+        if alternativa in colunas:
+            return f'COALESCE(NULLIF(NULLIF("{principal}", \'NaT\'), \'\'), "{alternativa}")'
+        return f'"{principal}"'
+
+    conn.execute(f"""
+        CREATE TABLE "Site Carga Rastreada_nova" (
+            "cte" INTEGER,
+            "nf" INTEGER,
+            "emissao_cte" TEXT,
+            "emissor" TEXT,
+            "qtd.vols" INTEGER,
+            "dn" INTEGER,
+            "dealer" TEXT,
+            "cidade" TEXT,
+            "saida_cd" TEXT,
+            "prazo" INTEGER,
+            "prev.entrega" TEXT,
+            "dt.entrega" TEXT,
+            "transportador" TEXT,
+            "modal" TEXT
+        )
+    """)
+    conn.execute(f"""
+        INSERT INTO "Site Carga Rastreada_nova"
+        SELECT
+            {_inteiro(unificar("cte", "numero_cte"))},
+            {_inteiro('"nf"')},
+            {_data_iso('"emissao_cte"')},
+            "emissor",
+            {_inteiro(unificar("qtd.vols", "qtd_vols"))},
+            {_inteiro('"dn"')},
+            "dealer",
+            "cidade",
+            {_data_iso('"saida_cd"')},
+            {_inteiro('"prazo"')},
+            {_data_iso(unificar("prev.entrega", "prev_entrega"))},
+            {_data_iso(unificar("dt.entrega", "dt_entrega"))},
+            "transportador",
+            "modal"
+        FROM "{tabela}"
+    """)
+    conn.execute(f'DROP TABLE "{tabela}"')
+    conn.execute(f'ALTER TABLE "Site Carga Rastreada_nova" RENAME TO "{tabela}"')
+
+
+# --- 003: índices para os padrões de consulta das páginas ---
+INDICES = [
+    # Filtro por intervalo de datas (After-Sales, teste, Kanban)
+    ('idx_site_emissao_cte', "Site Carga Rastreada", '"emissao_cte"'),
+    # Junção cidade -> hub
+    ('idx_site_cidade', "Site Carga Rastreada", '"cidade"'),
+    ('idx_hub_cidade', "Hub_Mercedes_Benz", '"danfe_dest_cidade"'),
+    # Busca por CTe / NF
+    ('idx_site_cte', "Site Carga Rastreada", '"cte"'),
+    ('idx_site_nf', "Site Carga Rastreada", '"nf"'),
+    ('idx_ctes_cte', "Relatorios_CTEs", '"cte"'),
+    # Agregações por período e por destino (LI, mapas)
+    ('idx_ctes_data_emissao', "Relatorios_CTEs", '"data_emissao"'),
+    ('idx_ctes_destino', "Relatorios_CTEs", '"uf_destinatario", "cidade_destinatario"'),
+]
+
+
+def _m003_indices(conn):
+    for nome, tabela, colunas in INDICES:
+        if _tabela_existe(conn, tabela):
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{nome}" ON "{tabela}" ({colunas})')
+    conn.execute("ANALYZE")
+
+
+# O resumo de entregas busca o hub na dimensão cidade -> hub, que precisa existir antes
+def _m004_resumos_diarios(conn):
+    cidades_hub.garantir_cidades_hub(conn)
+    resumos.garantir_resumos(conn, reconstruir=True)
+
+
+# Remove CTes repetidos por recargas de planilhas e cria o índice único da chave natural,
+# usado pela carga com upsert do Painel de Controle. Só cópias exatas são descartadas; as
+# linhas divergentes da mesma chave ficam guardadas em "<tabela>_duplicadas".
+def _m005_chaves_naturais(conn):
+    for tabela, chaves in ingestao.CHAVES_NATURAIS.items():
+        if _tabela_existe(conn, tabela) and set(chaves) <= set(_colunas(conn, tabela)):
+            ingestao.remover_duplicadas(conn, tabela, chaves)
+            ingestao.garantir_chave_unica(conn, tabela, chaves)
+
+
+# Dimensão cidade -> hub/transportadora por chave normalizada; o resumo de entregas
+# passa a buscar o hub nela (triggers recriadas)
+def _m006_dimensao_cidade_hub(conn):
+    cidades_hub.reconstruir(conn)
+    resumos.garantir_resumos(conn, reconstruir=True)
+
+
+# Estado do Kanban no banco (cartões + log de movimentos) no lugar do kanban_state.json
+def _m007_kanban(conn):
+    kanban.preparar_tabelas(conn)
+    kanban.importar_estado_antigo(conn)
+    kanban.incluir_novos_cards(conn)
+
+
+MIGRACOES = [
+    (1, "Relatorios_CTEs com colunas numéricas e data ISO", _m001_relatorios_ctes_tipado),
+    (2, "Site Carga Rastreada sem colunas duplicadas", _m002_site_carga_unificada),
+    (3, "Índices para data, cidade e CTe/NF", _m003_indices),
+    (4, "Resumos diários mantidos por triggers", _m004_resumos_diarios),
+    (5, "CTes sem duplicidade e índice único na chave natural", _m005_chaves_naturais),
+    (6, "Dimensão cidade -> hub/transportadora com chave normalizada", _m006_dimensao_cidade_hub),
+    (7, "Kanban em tabelas (cartões e log de movimentos)", _m007_kanban),
+]
+
+
+def _preparar_controle(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migracoes (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT,
+            aplicada_em TEXT
+        )
+    """)
+    conn.commit()
+
+
+def versoes_aplicadas(conn):
+    _preparar_controle(conn)
+    return {linha[0] for linha in conn.execute("SELECT versao FROM schema_migracoes")}
+
+
+# Aplica, em ordem, as migrações ainda não registradas (cada uma na sua transação)
+def aplicar_migracoes(db_path=banco_dados.DB_PATH):
+    aplicadas_agora = []
+    with banco_dados.conexao_escrita(db_path) as conn:
+        ja_aplicadas = versoes_aplicadas(conn)
+        for versao, descricao, funcao in MIGRACOES:
+            if versao in ja_aplicadas:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                funcao(conn)
+                conn.execute(
+                    "INSERT INTO schema_migracoes (versao, descricao, aplicada_em) VALUES (?, ?, ?)",
+                    (versao, descricao, datetime.now().isoformat(timespec="seconds")),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            aplicadas_agora.append((versao, descricao))
+        if aplicadas_agora:
+            # Migrações que recriam tabelas removem as triggers do índice FTS (busca_ctes)
+            busca_ctes.garantir_indices_busca(conn)
+    return aplicadas_agora
+
+
+def status_migracoes(db_path=banco_dados.DB_PATH):
+    with banco_dados.conexao_escrita(db_path) as conn:
+        ja_aplicadas = versoes_aplicadas(conn)
+    return [(versao, descricao, versao in ja_aplicadas) for versao, descricao, _ in MIGRACOES]
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv[1:]:
+        for versao, descricao, aplicada in status_migracoes():
+            print(f"{versao:03d} [{'x' if aplicada else ' '}] {descricao}")
+    else:
+        aplicadas = aplicar_migracoes()
+        if not aplicadas:
+            print("Nenhuma migração pendente.")
+        for versao, descricao in aplicadas:
+            print(f"Migração {versao:03d} aplicada: {descricao}")
@@ -0,0 +1,462 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+import banco_dados
+
+# Indicadores de desempenho do Milk Run (previsto x realizado de coleta e entrega).
+# A tabela guarda data e hora em colunas TEXT separadas (dd/mm/aaaa + HH:MM); elas são
+# convertidas uma única vez para datetime64, de forma vetorizada, e o resultado fica em
+# cache até a tabela mudar (linhas novas são só acrescentadas). Todas as consultas da
+# página trabalham sobre esse DataFrame e sobre os índices de janelas guardados com ele.
+
+TABELA_MILK_RUN = "Milk_Run"
+
+# Evento -> (coluna de data, coluna de hora)
+EVENTOS = {
+    "prev_ini_col": ("dtprvini_col", "hrprvini_col"),
+    "real_ini_col": ("dtreaini_col", "hrreaini_col"),
+    "prev_fim_col": ("dtprvfim_col", "hrprvfim_col"),
+    "real_fim_col": ("dtreafim_col", "hrreafim_col"),
+    "prev_ini_ent": ("dtprvini_ent", "hrprvini_ent"),
+    "real_ini_ent": ("dtreaini_ent", "hrreaini_ent"),
+    "prev_fim_ent": ("dtprvfim_ent", "hrprvfim_ent"),
+    "real_fim_ent": ("dtreafim_ent", "hrreafim_ent"),
+}
+
+# Permanências informadas como duração HH:MM
+DURACOES = {
+    "permanencia_coleta_min": "permanen_coleta",
+    "permanencia_entrega_min": "permanen_entrega",
+}
+
+DIMENSOES = ["rota", "placa", "tipo_veic", "remetente", "origem", "destinatario", "turno"]
+
+STATUS_CANCELADO = "CANCELADO"
+
+# Chegada com até TOLERANCIA_MIN minutos depois do previsto ainda conta como pontual
+TOLERANCIA_MIN = 15
+
+# Faixas de atraso (minutos) para a distribuição; negativo = adiantado
+FAIXAS_ATRASO = [-np.inf, -30, -15, 0, 15, 30, 60, 120, np.inf]
+ROTULOS_FAIXAS = ["> 30 min adiantado", "15-30 min adiantado", "até 15 min adiantado", "até 15 min atrasado",
+                  "15-30 min atrasado", "30-60 min atrasado", "1-2 h atrasado", "> 2 h atrasado"]
+
+# Evento -> (início previsto, fim previsto, início realizado, coluna de atraso)
+JANELAS = {
+    "coleta": ("prev_ini_col", "prev_fim_col", "real_ini_col", "atraso_coleta_min"),
+    "entrega": ("prev_ini_ent", "prev_fim_ent", "real_ini_ent", "atraso_entrega_min"),
+}
+
+# Quantas horas para trás "agora" olha por janelas ainda sem chegada
+HORIZONTE_ATRASO_H = 12
+
+# Janelas (dias) da aderência móvel por rota
+JANELAS_ADERENCIA = (7, 30)
+
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def _texto(serie):
+    return serie.astype("string").str.strip()
+
+
+# Converte só os valores distintos da coluna (poucos dias e horários distintos em meses de
+# viagens) e espalha o resultado pelas linhas com os códigos do factorize.
+# O código -1 (valor ausente) pega o último elemento, 'ausente'.
+def _por_valores_distintos(serie, converter, ausente):
+    codigos, distintos = pd.factorize(serie)
+    convertidos = np.asarray(converter(_texto(pd.Series(distintos, dtype="object"))))
+    return np.append(convertidos, np.array([ausente], dtype=convertidos.dtype))[codigos]
+
+
+# dd/mm/aaaa (ou ISO) -> datetime64
+def _converter_datas(distintos):
+    distintos = distintos.str.slice(0, 10)
+    br = pd.to_datetime(distintos, format="%d/%m/%Y", errors="coerce")
+    return br.fillna(pd.to_datetime(distintos, format="%Y-%m-%d", errors="coerce")).astype("datetime64[ns]")
+
+
+# HH:MM (segundos ignorados) -> duração; também serve para permanências
+def _converter_duracoes(distintos):
+    partes = distintos.str.extract(r"^(\d+):(\d{2})")
+    return pd.to_timedelta(partes[0].astype("float") * 60 + partes[1].astype("float"), unit="min")
+
+
+def _duracoes(serie):
+    return _por_valores_distintos(serie, _converter_duracoes, np.timedelta64("NaT", "ns"))
+
+
+# Data + hora em colunas separadas -> datetime64; sem data ou hora vira NaT
+def _datahora(data, hora):
+    dias = _por_valores_distintos(data, _converter_datas, np.datetime64("NaT", "ns"))
+    return pd.Series(dias + _duracoes(hora), index=data.index)
+
+
+# Duração 'HH:MM' -> minutos (float, NaN quando vazia/inválida)
+def _minutos(serie):
+    return pd.Series(_duracoes(serie) / np.timedelta64(1, "m"), index=serie.index)
+
+
+# Texto -> category (sem espaços nas pontas; vazio vira nulo)
+def _categoria(serie):
+    valores = _por_valores_distintos(serie, lambda d: d.replace("", pd.NA).astype("object"), None)
+    return pd.Series(valores, index=serie.index, dtype="category")
+
+
+def _diferenca_min(fim, inicio):
+    return (fim - inicio) / pd.Timedelta(minutes=1)
+
+
+# 1.0 pontual, 0.0 atrasado, NaN quando ainda não realizado (fica fora das médias)
+def _pontual(atraso_min):
+    return (atraso_min <= TOLERANCIA_MIN).astype("float").where(atraso_min.notna())
+
+
+def _preparar(bruto):
+    df = pd.DataFrame(index=bruto.index)
+    for coluna in DIMENSOES:
+        df[coluna] = _categoria(bruto[coluna]) if coluna in bruto else pd.Series(pd.NA, index=bruto.index, dtype="category")
+    df["status"] = _categoria(bruto["status"]) if "status" in bruto else pd.Series(pd.NA, index=bruto.index, dtype="category")
+    df["cancelado"] = df["status"].astype("object").str.upper().eq(STATUS_CANCELADO).fillna(False).astype(bool)
+    for evento, (coluna_data, coluna_hora) in EVENTOS.items():
+        df[evento] = _datahora(bruto[coluna_data], bruto[coluna_hora])
+    for destino, origem in DURACOES.items():
+        df[destino] = _minutos(bruto[origem])
+
+    # Dia da viagem: início previsto da coleta
+    df["data"] = df["prev_ini_col"].dt.normalize()
+
+    # Atraso na chegada (real - previsto), em minutos
+    df["atraso_coleta_min"] = _diferenca_min(df["real_ini_col"], df["prev_ini_col"])
+    df["atraso_entrega_min"] = _diferenca_min(df["real_ini_ent"], df["prev_ini_ent"])
+    df["pontual_coleta"] = _pontual(df["atraso_coleta_min"])
+    df["pontual_entrega"] = _pontual(df["atraso_entrega_min"])
+
+    # Permanência: a informada; sem ela, a diferença entre fim e início realizados
+    df["permanencia_coleta_min"] = df["permanencia_coleta_min"].fillna(
+        _diferenca_min(df["real_fim_col"], df["real_ini_col"]))
+    df["permanencia_entrega_min"] = df["permanencia_entrega_min"].fillna(
+        _diferenca_min(df["real_fim_ent"], df["real_ini_ent"]))
+    return df
+
+
+# --- Cache incremental ---
+# A tabela normalmente só recebe linhas novas (cargas do Painel). Quando a versão muda sem
+# nenhuma reescrita (UPDATE/DELETE/recriação, ver banco_dados.versao_tabela) e todas as
+# linhas novas têm rowid maior que o último lido, só elas são convertidas e somadas ao cache:
+# viagens, índices de janelas e contagens diárias de aderência. Qualquer outra mudança
+# refaz tudo.
+
+def _ler(conn, depois_de=None):
+    sql = f'SELECT rowid AS id, * FROM "{TABELA_MILK_RUN}"'
+    params = ()
+    if depois_de is not None:
+        sql += " WHERE rowid > ?"
+        params = (depois_de,)
+    return pd.read_sql_query(sql, conn, params=params, index_col="id")
+
+
+# Junta viagens novas às do cache mantendo as categorias (union_categoricals)
+def _anexar(df, novos):
+    juntos = pd.concat([df, novos])
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            juntos[coluna] = pd.Series(
+                pd.api.types.union_categoricals([df[coluna], novos[coluna]], ignore_order=True),
+                index=juntos.index,
+            )
+    return juntos
+
+
+def _montar_estado(versao, df, indices, diario):
+    return {
+        "versao": versao,
+        "ultimo_rowid": int(df.index.max()) if len(df) else 0,
+        "viagens": df,
+        "indices": indices,
+        "diario": diario,
+    }
+
+
+def _estado_completo(conn, versao):
+    df = _preparar(_ler(conn))
+    return _montar_estado(versao, df, {evento: _construir_indice(df, evento) for evento in JANELAS},
+                          {evento: _aderencia_diaria(df, evento) for evento in JANELAS})
+
+
+def _estado_incremental(estado, versao, bruto_novo):
+    novos = _preparar(bruto_novo)
+    inicio = len(estado["viagens"])
+    df = _anexar(estado["viagens"], novos)
+    return _montar_estado(
+        versao, df,
+        {evento: _inserir_no_indice(estado["indices"][evento], novos, evento, inicio) for evento in JANELAS},
+        {evento: _somar_diario(estado["diario"][evento], _aderencia_diaria(novos, evento)) for evento in JANELAS},
+    )
+
+
+# Linhas novas, se a mudança desde o cache foi só de inserções depois do último rowid lido
+# (None quando é preciso recarregar tudo)
+def _acrescimos(conn, estado, versao):
+    antiga = estado["versao"]
+    if antiga is None or versao is None or versao[1] != antiga[1]:
+        return None
+    total = conn.execute(f'SELECT COUNT(*) FROM "{TABELA_MILK_RUN}"').fetchone()[0]
+    novos = _ler(conn, depois_de=estado["ultimo_rowid"])
+    if len(novos) == 0 or total != len(estado["viagens"]) + len(novos):
+        return None
+    return novos
+
+
+def _estado(db_path=banco_dados.DB_PATH):
+    with banco_dados.conexao_leitura(db_path) as conn:
+        with _lock:
+            estado = _cache.get(db_path)
+        if estado is not None and estado["versao"] == banco_dados.versao_tabela(conn, TABELA_MILK_RUN):
+            return estado
+        # versão e linhas lidas no mesmo instantâneo do banco
+        conn.execute("BEGIN")
+        try:
+            versao = banco_dados.versao_tabela(conn, TABELA_MILK_RUN)
+            if estado is None or estado["versao"] != versao:
+                novos = _acrescimos(conn, estado, versao) if estado is not None else None
+                estado = _estado_incremental(estado, versao, novos) if novos is not None else _estado_completo(conn, versao)
+        finally:
+            conn.rollback()
+    with _lock:
+        _cache[db_path] = estado
+    return estado
+
+
+# Viagens já convertidas (em cache até a tabela Milk_Run mudar). Não alterar o DataFrame devolvido.
+def _viagens(db_path=banco_dados.DB_PATH):
+    return _estado(db_path)["viagens"]
+
+
+# Viagens filtradas por dia (data_inicio/data_fim) e por valores das dimensões ({"rota": [...], ...})
+def viagens(data_inicio=None, data_fim=None, filtros=None, incluir_cancelados=False, db_path=banco_dados.DB_PATH):
+    df = _viagens(db_path)
+    mascara = pd.Series(True, index=df.index)
+    if not incluir_cancelados:
+        mascara &= ~df["cancelado"]
+    if data_inicio is not None:
+        mascara &= df["data"] >= pd.Timestamp(data_inicio)
+    if data_fim is not None:
+        mascara &= df["data"] <= pd.Timestamp(data_fim)
+    for coluna, valores in (filtros or {}).items():
+        if coluna not in DIMENSOES:
+            raise ValueError(f"Dimensão desconhecida: {coluna}")
+        if valores:
+            mascara &= df[coluna].isin(valores)
+    return df[mascara]
+
+
+# Pontualidade, atraso e permanência por grupo (ex.: ["rota"], ["placa"], ["tipo_veic"], ["rota", "turno"])
+def indicadores(agrupar_por=("rota",), data_inicio=None, data_fim=None, filtros=None, incluir_cancelados=False,
+                db_path=banco_dados.DB_PATH):
+    agrupar_por = list(agrupar_por)
+    for coluna in agrupar_por:
+        if coluna not in DIMENSOES:
+            raise ValueError(f"Dimensão desconhecida: {coluna}")
+    df = viagens(data_inicio, data_fim, filtros, incluir_cancelados, db_path)
+    grupos = df.groupby(agrupar_por, observed=True, dropna=False)
+    resultado = grupos.agg(
+        viagens=("data", "size"),
+        coletas_realizadas=("atraso_coleta_min", "count"),
+        pontualidade_coleta=("pontual_coleta", "mean"),
+        pontualidade_entrega=("pontual_entrega", "mean"),
+        atraso_medio_coleta_min=("atraso_coleta_min", "mean"),
+        atraso_medio_entrega_min=("atraso_entrega_min", "mean"),
+        permanencia_media_coleta_min=("permanencia_coleta_min", "mean"),
+        permanencia_media_entrega_min=("permanencia_entrega_min", "mean"),
+    )
+    # Percentis calculados por grupo de uma vez (sem função Python por grupo)
+    percentis = grupos[["atraso_coleta_min", "atraso_entrega_min"]].quantile([0.5, 0.9]).unstack()
+    percentis.columns = [f"{coluna.replace('_min', '')}_p{int(q * 100)}_min" for coluna, q in percentis.columns]
+    resultado = resultado.join(percentis)
+    for coluna in ("pontualidade_coleta", "pontualidade_entrega"):
+        resultado[coluna] = resultado[coluna] * 100
+    return resultado.reset_index().sort_values("viagens", ascending=False, ignore_index=True)
+
+
+# Totais do período (uma linha), para os cartões de métricas da página
+def resumo_geral(data_inicio=None, data_fim=None, filtros=None, db_path=banco_dados.DB_PATH):
+    df = viagens(data_inicio, data_fim, filtros, incluir_cancelados=True, db_path=db_path)
+    validas = df[~df["cancelado"]]
+    return {
+        "viagens": len(validas),
+        "canceladas": int(df["cancelado"].sum()),
+        "pontualidade_coleta": validas["pontual_coleta"].mean() * 100,
+        "pontualidade_entrega": validas["pontual_entrega"].mean() * 100,
+        "atraso_medio_coleta_min": validas["atraso_coleta_min"].mean(),
+        "permanencia_media_coleta_min": validas["permanencia_coleta_min"].mean(),
+        "permanencia_media_entrega_min": validas["permanencia_entrega_min"].mean(),
+    }
+
+
+# Quantidade de viagens por faixa de atraso ('coleta' ou 'entrega'), opcionalmente por grupo
+def distribuicao_atrasos(evento="coleta", agrupar_por=None, data_inicio=None, data_fim=None, filtros=None,
+                         db_path=banco_dados.DB_PATH):
+    if evento not in ("coleta", "entrega"):
+        raise ValueError(f"Evento desconhecido: {evento}")
+    df = viagens(data_inicio, data_fim, filtros, db_path=db_path)
+    faixa = pd.cut(df[f"atraso_{evento}_min"], FAIXAS_ATRASO, labels=ROTULOS_FAIXAS, right=True)
+    chaves = [df[c] for c in (agrupar_por or [])] + [faixa.rename("faixa")]
+    return df.groupby(chaves, observed=False).size().rename("viagens").reset_index()
+
+
+# --- Janelas previstas: índice de intervalos, atrasos e sobreposições ---
+
+def _validar_evento(evento):
+    if evento not in JANELAS:
+        raise ValueError(f"Evento desconhecido: {evento}")
+
+
+# Início e fim (int64 ns) das janelas previstas; janela sem fim vale só o instante de início
+def _limites(df, evento):
+    coluna_inicio, coluna_fim, _, _ = JANELAS[evento]
+    inicio = df[coluna_inicio]
+    fim = df[coluna_fim].where(df[coluna_fim] >= inicio, inicio)
+    return inicio.to_numpy("datetime64[ns]").view("int64"), fim.to_numpy("datetime64[ns]").view("int64"), inicio.notna().to_numpy()
+
+
+# Índice de intervalos: janelas ordenadas pelo início, com o maior fim acumulado.
+# Janelas que cruzam [a, b] têm início <= b (prefixo, busca binária) e estão a partir da
+# primeira posição cujo fim acumulado >= a (outra busca binária); só esse trecho é varrido.
+def _construir_indice(df, evento, deslocamento=0):
+    inicio, fim, validas = _limites(df, evento)
+    posicoes = np.flatnonzero(validas)
+    ordem = np.argsort(inicio[posicoes], kind="stable")
+    posicoes = posicoes[ordem]
+    return {
+        "posicao": posicoes + deslocamento,
+        "inicio": inicio[posicoes],
+        "fim": fim[posicoes],
+        "fim_max": np.maximum.accumulate(fim[posicoes]) if len(posicoes) else fim[posicoes],
+    }
+
+
+# Acrescenta janelas novas (linhas a partir de 'deslocamento') no índice já ordenado
+def _inserir_no_indice(indice, novos, evento, deslocamento):
+    novo = _construir_indice(novos, evento, deslocamento)
+    lugares = np.searchsorted(indice["inicio"], novo["inicio"], side="right")
+    resultado = {chave: np.insert(indice[chave], lugares, novo[chave]) for chave in ("posicao", "inicio", "fim")}
+    resultado["fim_max"] = np.maximum.accumulate(resultado["fim"]) if len(resultado["fim"]) else resultado["fim"]
+    return resultado
+
+
+def _no_intervalo(indice, a, b):
+    a, b = pd.Timestamp(a).value, pd.Timestamp(b).value
+    ate = np.searchsorted(indice["inicio"], b, side="right")
+    desde = np.searchsorted(indice["fim_max"], a, side="left")
+    if desde >= ate:
+        return indice["posicao"][:0]
+    trecho = slice(desde, ate)
+    return indice["posicao"][trecho][indice["fim"][trecho] >= a]
+
+
+# Viagens (não canceladas) cuja janela prevista de coleta/entrega cruza [inicio, fim]
+def janelas_em(inicio, fim, evento="coleta", filtros=None, db_path=banco_dados.DB_PATH):
+    _validar_evento(evento)
+    estado = _estado(db_path)
+    df = estado["viagens"]
+    selecao = df.iloc[np.sort(_no_intervalo(estado["indices"][evento], inicio, fim))]
+    selecao = selecao[~selecao["cancelado"]]
+    for coluna, valores in (filtros or {}).items():
+        if valores:
+            selecao = selecao[selecao[coluna].isin(valores)]
+    return selecao
+
+
+# Viagens atrasadas com janela em [inicio, fim]: chegaram depois da tolerância ou, até
+# 'instante', ainda não chegaram e já passaram da tolerância.
+# Sem inicio/fim: as janelas das últimas HORIZONTE_ATRASO_H horas até agora (ou 'instante').
+def atrasados(inicio=None, fim=None, evento="coleta", instante=None, filtros=None, db_path=banco_dados.DB_PATH):
+    _validar_evento(evento)
+    instante = pd.Timestamp.now() if instante is None else pd.Timestamp(instante)
+    fim = instante if fim is None else pd.Timestamp(fim)
+    inicio = fim - pd.Timedelta(hours=HORIZONTE_ATRASO_H) if inicio is None else pd.Timestamp(inicio)
+    coluna_inicio, _, coluna_real, coluna_atraso = JANELAS[evento]
+    df = janelas_em(inicio, fim, evento, filtros, db_path)
+    limite = df[coluna_inicio] + pd.Timedelta(minutes=TOLERANCIA_MIN)
+    chegou_atrasado = df[coluna_atraso] > TOLERANCIA_MIN
+    sem_chegada = (df[coluna_real].isna() | (df[coluna_real] > instante)) & (limite < instante)
+    resultado = df[chegou_atrasado | sem_chegada].copy()
+    resultado["situacao"] = np.where(chegou_atrasado[resultado.index], "Chegou atrasado", "Ainda não chegou")
+    resultado["atraso_atual_min"] = resultado[coluna_atraso].fillna(
+        (instante - resultado[coluna_inicio]) / pd.Timedelta(minutes=1))
+    return resultado.sort_values("atraso_atual_min", ascending=False)
+
+
+# Janelas que se sobrepõem para o mesmo veículo (placa) dentro de [inicio, fim].
+# A sobreposição considera todas as viagens do veículo; 'filtros' só limita o que é devolvido.
+def sobreposicoes(inicio, fim, evento="coleta", por="placa", filtros=None, db_path=banco_dados.DB_PATH):
+    _validar_evento(evento)
+    if por not in DIMENSOES:
+        raise ValueError(f"Dimensão desconhecida: {por}")
+    coluna_inicio, coluna_fim, _, _ = JANELAS[evento]
+    df = janelas_em(inicio, fim, evento, db_path=db_path)
+    df = df[df[por].notna()].sort_values([por, coluna_inicio])
+    fim_janela = df[coluna_fim].where(df[coluna_fim] >= df[coluna_inicio], df[coluna_inicio])
+    # maior fim entre as janelas anteriores do mesmo veículo
+    fim_anterior = fim_janela.groupby(df[por], observed=True).transform(lambda s: s.cummax().shift())
+    sobrepoe = df[coluna_inicio] < fim_anterior
+    # marca também a janela com que cada uma se sobrepõe (a anterior na ordem)
+    marcadas = sobrepoe | sobrepoe.groupby(df[por], observed=True).shift(-1, fill_value=False)
+    df = df[marcadas]
+    for coluna, valores in (filtros or {}).items():
+        if valores:
+            df = df[df[coluna].isin(valores)]
+    return df
+
+
+# Contagens diárias por rota: viagens com chegada registrada e quantas foram pontuais
+def _aderencia_diaria(df, evento):
+    _, _, _, coluna_atraso = JANELAS[evento]
+    validas = df[~df["cancelado"] & df[coluna_atraso].notna() & df["data"].notna() & df["rota"].notna()]
+    pontual = (validas[coluna_atraso] <= TOLERANCIA_MIN).astype("int64")
+    grupos = pd.DataFrame({"rota": validas["rota"].astype("object"), "data": validas["data"],
+                           "viagens": 1, "pontuais": pontual})
+    return grupos.groupby(["rota", "data"]).sum()
+
+
+def _somar_diario(diario, novos):
+    return pd.concat([diario, novos]).groupby(level=["rota", "data"]).sum()
+
+
+# Aderência móvel (% de chegadas pontuais) em janelas de 7 e 30 dias, por rota e dia.
+# Calculada sobre as contagens diárias (rotas x dias), mantidas incrementalmente no cache.
+def aderencia_movel(evento="coleta", rotas=None, data_inicio=None, data_fim=None, janelas=JANELAS_ADERENCIA,
+                    db_path=banco_dados.DB_PATH):
+    _validar_evento(evento)
+    diario = _estado(db_path)["diario"][evento]
+    if rotas:
+        diario = diario[diario.index.get_level_values("rota").isin(rotas)]
+    if diario.empty:
+        return pd.DataFrame(columns=["rota", "data"] + [f"aderencia_{d}d" for d in janelas])
+    viagens = diario["viagens"].unstack("rota", fill_value=0)
+    pontuais = diario["pontuais"].unstack("rota", fill_value=0)
+    calendario = pd.date_range(viagens.index.min(), viagens.index.max(), freq="D", name="data")
+    viagens = viagens.reindex(calendario, fill_value=0)
+    pontuais = pontuais.reindex(calendario, fill_value=0)
+
+    # quadros dias x rotas achatados linha a linha (dia por fora, rota por dentro)
+    indice = pd.MultiIndex.from_product([calendario, viagens.columns], names=["data", "rota"])
+    colunas = {}
+    for dias in janelas:
+        total = viagens.rolling(dias, min_periods=1).sum()
+        no_prazo = pontuais.rolling(dias, min_periods=1).sum()
+        colunas[f"viagens_{dias}d"] = total.to_numpy().ravel()
+        colunas[f"aderencia_{dias}d"] = (no_prazo / total.where(total > 0) * 100).to_numpy().ravel()
+    resultado = pd.DataFrame(colunas, index=indice).reset_index()
+    # dias em que a rota ainda não tinha nenhuma viagem na janela mais longa ficam de fora
+    resultado = resultado[resultado[f"viagens_{max(janelas)}d"] > 0]
+    if data_inicio is not None:
+        resultado = resultado[resultado["data"] >= pd.Timestamp(data_inicio)]
+    if data_fim is not None:
+        resultado = resultado[resultado["data"] <= pd.Timestamp(data_fim)]
+    return resultado[["rota", "data"] + list(colunas)].reset_index(drop=True)
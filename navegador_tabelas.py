@@ -0,0 +1,98 @@
+import sqlite3
+
+import banco_dados
+
+# Navegação paginada de tabelas do banco: filtro, ordenação e paginação feitos no SQLite.
+# Só a página visível sai do banco; a contagem de linhas fica em cache até a tabela mudar
+# (a validade do cache é conferida pela versão da tabela, sem recontar as linhas).
+
+TAMANHOS_PAGINA = [50, 100, 250, 500]
+
+_ESCAPE = "\\"
+
+
+def _escapar_like(valor):
+    return str(valor).replace(_ESCAPE, _ESCAPE * 2).replace("%", _ESCAPE + "%").replace("_", _ESCAPE + "_")
+
+
+# Operadores de filtro disponíveis -> (condição SQL, função que prepara o valor)
+OPERADORES = {
+    "contém": ("{col} LIKE ? ESCAPE '\\'", lambda v: f"%{_escapar_like(v)}%"),
+    "começa com": ("{col} LIKE ? ESCAPE '\\'", lambda v: f"{_escapar_like(v)}%"),
+    "=": ("{col} = ?", lambda v: v),
+    "≠": ("{col} <> ?", lambda v: v),
+    ">": ("{col} > ?", lambda v: v),
+    ">=": ("{col} >= ?", lambda v: v),
+    "<": ("{col} < ?", lambda v: v),
+    "<=": ("{col} <= ?", lambda v: v),
+    "vazio": ("({col} IS NULL OR {col} = '')", None),
+    "preenchido": ("({col} IS NOT NULL AND {col} <> '')", None),
+}
+
+
+def colunas_tabela(tabela, db_path=banco_dados.DB_PATH):
+    with banco_dados.conexao_leitura(db_path) as conn:
+        return [linha[1] for linha in conn.execute(f'PRAGMA table_info("{tabela}")')]
+
+
+# Desempate da ordenação: o rowid, ou a chave primária nas tabelas WITHOUT ROWID
+def _chave_linha(tabela, db_path):
+    with banco_dados.conexao_leitura(db_path) as conn:
+        try:
+            conn.execute(f'SELECT rowid FROM "{tabela}" LIMIT 0')
+            return ["rowid"]
+        except sqlite3.OperationalError:
+            chave = sorted((pk, nome) for _, nome, _, _, _, pk in conn.execute(f'PRAGMA table_info("{tabela}")') if pk)
+            return [f'"{nome}"' for _, nome in chave]
+
+
+# Monta o WHERE a partir de filtros [(coluna, operador, valor), ...].
+# Colunas e operadores são validados; valores sempre vão como parâmetro.
+def _montar_where(tabela, filtros, db_path):
+    existentes = set(colunas_tabela(tabela, db_path))
+    condicoes, params = [], []
+    for coluna, operador, valor in filtros or ():
+        if coluna not in existentes:
+            raise ValueError(f"Coluna desconhecida em '{tabela}': {coluna}")
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador de filtro desconhecido: {operador}")
+        condicao, preparar = OPERADORES[operador]
+        condicoes.append(condicao.format(col=f'"{coluna}"'))
+        if preparar is not None:
+            params.append(preparar(valor))
+    return (" WHERE " + " AND ".join(condicoes) if condicoes else ""), params
+
+
+# Quantidade de linhas que atendem aos filtros. Fica em cache até a tabela mudar: o COUNT(*)
+# só roda de novo depois de uma escrita na tabela (ver banco_dados.versao_tabela).
+def contar(tabela, filtros=None, db_path=banco_dados.DB_PATH):
+    where, params = _montar_where(tabela, filtros, db_path)
+    df = banco_dados.consultar(f'SELECT COUNT(*) AS n FROM "{tabela}"{where}', params, tabelas=[tabela], db_path=db_path)
+    return int(df["n"].iloc[0])
+
+
+# Uma página (numerada a partir de 1) da tabela, já filtrada e ordenada no banco.
+# A ordenação usa o rowid (ou a chave primária) como desempate para que as páginas não se sobreponham.
+def pagina(tabela, numero=1, tamanho=100, filtros=None, ordenar_por=None, decrescente=False, colunas=None,
+           db_path=banco_dados.DB_PATH):
+    existentes = colunas_tabela(tabela, db_path)
+    for coluna in [c for c in (colunas or []) + [ordenar_por] if c]:
+        if coluna not in existentes:
+            raise ValueError(f"Coluna desconhecida em '{tabela}': {coluna}")
+    where, params = _montar_where(tabela, filtros, db_path)
+    selecao = ", ".join(f'"{c}"' for c in colunas) if colunas else "*"
+    direcao = "DESC" if decrescente else "ASC"
+    ordenacao = [f'"{ordenar_por}"'] if ordenar_por else []
+    ordenacao += [c for c in _chave_linha(tabela, db_path) if c not in ordenacao]
+    ordem = " ORDER BY " + ", ".join(f"{c} {direcao}" for c in ordenacao) if ordenacao else ""
+    query = f'SELECT {selecao} FROM "{tabela}"{where}{ordem} LIMIT ? OFFSET ?'
+    return banco_dados.consultar(
+        query,
+        params + [int(tamanho), (max(int(numero), 1) - 1) * int(tamanho)],
+        tabelas=[tabela],
+        db_path=db_path,
+    )
+
+
+def total_paginas(total_linhas, tamanho):
+    return max((total_linhas + tamanho - 1) // tamanho, 1)
@@ -1,27 +1,32 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-from datetime import datetime
+import banco_dados
+import status_entrega
+import busca_ctes
+import cidades_hub
+import resumos
 
 # Configuração da página
 st.set_page_config(page_title="Visualizar Tabela", layout="wide")
 st.title("📊 Visualizar Tabela do Banco de Dados SQLite")
 
 # Caminho do banco de dados
-db_path = "logistica_interna.db"
-
-# Conexão com o banco
-conn = sqlite3.connect(db_path)
+db_path = banco_dados.DB_PATH
 
 # Listar todas as tabelas
-tabelas = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
+tabelas = pd.DataFrame({"name": banco_dados.listar_tabelas(db_path)})
 
 if not tabelas.empty:
     tabela_site = "Site Carga Rastreada"
-    tabela_hub = "Hub_Mercedes_Benz"
+    tabela_hub = cidades_hub.TABELA_HUB
+    tabela_cidade_hub = cidades_hub.TABELA_DIMENSAO
 
     if tabela_site in tabelas["name"].values and tabela_hub in tabelas["name"].values:
-        datas_disponiveis = pd.read_sql(f'SELECT DISTINCT emissao_cte FROM "{tabela_site}" ORDER BY emissao_cte', conn)
+        # A dimensão cidade -> hub é mantida pelas migrações e pela ingestão; a página só lê
+        if tabela_cidade_hub not in tabelas["name"].values:
+            st.warning(f"A tabela {tabela_cidade_hub} ainda não existe: rode 'python migracoes.py'.")
+            st.stop()
+        datas_disponiveis = banco_dados.consultar(f'SELECT DISTINCT emissao_cte FROM "{tabela_site}" ORDER BY emissao_cte', tabelas=[tabela_site], db_path=db_path)
         datas_disponiveis['emissao_cte'] = pd.to_datetime(datas_disponiveis['emissao_cte'])
 
         data_inicio, data_fim = st.date_input(
@@ -36,8 +41,9 @@ if not tabelas.empty:
 
         nf_input = st.text_input("Digite o número da NF para buscar", "")
         cte_input = st.text_input("Digite o número do CTE para buscar", "")
+        modo_busca = st.radio("Tipo de busca de NF/CTE", busca_ctes.MODOS, index=1, horizontal=True)
 
-        hubs_disponiveis = pd.read_sql(f'SELECT DISTINCT hub FROM "{tabela_hub}"', conn)
+        hubs_disponiveis = banco_dados.consultar(f'SELECT DISTINCT hub FROM "{tabela_hub}"', tabelas=[tabela_hub], db_path=db_path)
         hub_selecionado = st.multiselect("Filtrar por Hub", hubs_disponiveis['hub'].tolist(), default=hubs_disponiveis['hub'].tolist())
 
         query = f'''
@@ -46,17 +52,21 @@ if not tabelas.empty:
                 h.hub, 
                 h.transportadora
             FROM "{tabela_site}" s
-            LEFT JOIN "{tabela_hub}" h 
-                ON s.cidade = h.danfe_dest_cidade
-            WHERE s.emissao_cte BETWEEN "{data_inicio_str}" AND "{data_fim_str}"
+            LEFT JOIN "{tabela_cidade_hub}" h
+                ON h.cidade = s.cidade
+            WHERE s.emissao_cte BETWEEN ? AND ?
         '''
+        params = [data_inicio_str, data_fim_str]
 
-        if nf_input:
-            query += f' AND s.nf LIKE "%{nf_input}%"'
-        if cte_input:
-            query += f' AND s.cte LIKE "%{cte_input}%"'
+        # Busca de NF/CTe pelos índices (exata, prefixo ou trecho), sempre parametrizada
+        condicoes_busca, params_busca = busca_ctes.condicoes_busca(
+            tabela_site, {"nf": nf_input, "cte": cte_input}, modo_busca, alias="s", db_path=db_path
+        )
+        for condicao in condicoes_busca:
+            query += f" AND {condicao}"
+        params += params_busca
 
-        df_tabela = pd.read_sql(query, conn)
+        df_tabela = banco_dados.consultar(query, params, tabelas=[tabela_site, tabela_cidade_hub], db_path=db_path)
 
         df_tabela['emissao_cte'] = pd.to_datetime(df_tabela['emissao_cte'], errors='coerce')
         df_tabela['prev.entrega'] = pd.to_datetime(df_tabela['prev.entrega'], errors='coerce')
@@ -65,29 +75,11 @@ if not tabelas.empty:
         df_tabela = df_tabela[df_tabela['hub'].isin(hub_selecionado)]
 
         if 'prev.entrega' in df_tabela.columns and 'dt.entrega' in df_tabela.columns:
-            df_tabela['diferença_dias'] = (df_tabela['prev.entrega'] - df_tabela['dt.entrega']).dt.days
-
-            def calcular_status(row):
-                if pd.isna(row['prev.entrega']):
-                    return "Em Trânsito 🚚"
-                elif pd.isna(row['dt.entrega']):
-                    if datetime.now().date() > row['prev.entrega'].date():
-                        return "Em Trânsito (ATRASADO) 🚚❌"
-                    else:
-                        return "Em Trânsito 🚚"
-                elif row['diferença_dias'] < 0:
-                    return "Atrasado❌"
-                elif row['diferença_dias'] > 0:
-                    return "Antecipado ✅"
-                else:
-                    return "No Prazo ✅"
-
-            df_tabela['status_pedido'] = df_tabela.apply(calcular_status, axis=1)
-
-            # Adicionar transportadora do usuário
-            df_hub = pd.read_sql(f'SELECT danfe_dest_cidade, transportadora FROM "{tabela_hub}"', conn)
-            cidade_transportadora_dict = dict(zip(df_hub['danfe_dest_cidade'], df_hub['transportadora']))
-            df_tabela['transportadora_usuario'] = df_tabela['cidade'].map(cidade_transportadora_dict)
+            hoje = status_entrega.data_referencia()
+            df_tabela = status_entrega.aplicar_status(df_tabela, hoje=hoje)
+
+            # Transportadora do usuário: já vem da dimensão cidade -> hub na consulta
+            df_tabela['transportadora_usuario'] = df_tabela['transportadora']
 
             # Filtro por Emissor ANTES do filtro por status
             emissores_disponiveis = df_tabela['emissor'].dropna().unique().tolist()
@@ -95,26 +87,32 @@ if not tabelas.empty:
             df_tabela = df_tabela[df_tabela['emissor'].isin(emissor_selecionado)]
 
             # Filtro por Status do Pedido
-            status_options = ["Em Trânsito 🚚", "Em Trânsito (ATRASADO) 🚚❌", "No Prazo ✅", "Antecipado ✅", "Atrasado❌"]
+            status_options = status_entrega.STATUS_OPCOES
             status_selecionado = st.multiselect("Filtrar por Status do Pedido", status_options, default=status_options)
             df_tabela = df_tabela[df_tabela['status_pedido'].isin(status_selecionado)]
 
-            def calcular_dias_restantes(row):
-                if "Atrasado❌" in row['status_pedido']:
-                    return -(datetime.now().date() - row['prev.entrega'].date()).days
-                elif "Em Trânsito" in row['status_pedido']:
-                    return (row['prev.entrega'].date() - datetime.now().date()).days
-                return row['diferença_dias']
-
-            df_tabela['diferença_dias'] = df_tabela.apply(calcular_dias_restantes, axis=1)
-            df_tabela['diferença_dias'] = df_tabela['diferença_dias'].astype('Int64')
-
-            total_pedidos = len(df_tabela)
-            em_transito = len(df_tabela[df_tabela['status_pedido'].str.contains("Em Trânsito")])
-            no_prazo = len(df_tabela[df_tabela['status_pedido'] == "No Prazo ✅"])
-            antecipado = len(df_tabela[df_tabela['status_pedido'] == "Antecipado ✅"])
-            atrasado = len(df_tabela[df_tabela['status_pedido'] == "Atrasado❌"])
-            em_transito_atrasado = len(df_tabela[df_tabela['status_pedido'] == "Em Trânsito (ATRASADO) 🚚❌"])
+            df_tabela['diferença_dias'] = status_entrega.calcular_dias_restantes(
+                df_tabela['prev.entrega'], df_tabela['status_pedido'], df_tabela['diferença_dias'], hoje=hoje
+            )
+
+            # Pedidos e volumes por status: sem busca de NF/CTe, vêm do resumo diário mantido por
+            # triggers (dia x hub x emissor x status); com busca, das linhas já filtradas acima
+            if not nf_input.strip() and not cte_input.strip() and resumos.resumo_disponivel(resumos.RESUMO_ENTREGAS, db_path):
+                resumo = resumos.entregas_por(["hub", "emissor", "status"], data_inicio_str, data_fim_str, hoje=hoje, db_path=db_path)
+                resumo = resumo[resumo['hub'].isin(hub_selecionado) & resumo['emissor'].isin(emissor_selecionado)
+                                & resumo['status'].isin(status_selecionado)]
+                por_status = resumo.groupby('status', observed=False)[['pedidos', 'volumes']].sum()
+            else:
+                por_status = df_tabela.groupby(df_tabela['status_pedido'].astype(status_entrega.STATUS_DTYPE), observed=False).agg(
+                    pedidos=('status_pedido', 'size'), volumes=('qtd.vols', 'sum'))
+            pedidos_status, volumes_status = por_status['pedidos'], por_status['volumes']
+
+            total_pedidos = pedidos_status.sum()
+            em_transito = pedidos_status[[status_entrega.EM_TRANSITO, status_entrega.EM_TRANSITO_ATRASADO]].sum()
+            no_prazo = pedidos_status[status_entrega.NO_PRAZO]
+            antecipado = pedidos_status[status_entrega.ANTECIPADO]
+            atrasado = pedidos_status[status_entrega.ATRASADO]
+            em_transito_atrasado = pedidos_status[status_entrega.EM_TRANSITO_ATRASADO]
 
             pct_em_transito = (em_transito / total_pedidos) * 100 if total_pedidos > 0 else 0
             pct_no_prazo = (no_prazo / total_pedidos) * 100 if total_pedidos > 0 else 0
@@ -122,10 +120,10 @@ if not tabelas.empty:
             pct_atrasado = (atrasado / total_pedidos) * 100 if total_pedidos > 0 else 0
             pct_em_transito_atrasado = (em_transito_atrasado / total_pedidos) * 100 if total_pedidos > 0 else 0
 
-            total_volumes = df_tabela['qtd.vols'].sum()
-            qtd_vols_em_transito = df_tabela[df_tabela['status_pedido'].str.contains("Em Trânsito")]['qtd.vols'].sum()
-            qtd_vols_no_prazo_antecipado = df_tabela[df_tabela['status_pedido'].isin(["No Prazo ✅", "Antecipado ✅"])]['qtd.vols'].sum()
-            qtd_vols_atrasado = df_tabela[df_tabela['status_pedido'] == "Atrasado❌"]['qtd.vols'].sum()
+            total_volumes = volumes_status.sum()
+            qtd_vols_em_transito = volumes_status[[status_entrega.EM_TRANSITO, status_entrega.EM_TRANSITO_ATRASADO]].sum()
+            qtd_vols_no_prazo_antecipado = volumes_status[[status_entrega.NO_PRAZO, status_entrega.ANTECIPADO]].sum()
+            qtd_vols_atrasado = volumes_status[status_entrega.ATRASADO]
 
             pct_vols_em_transito = (qtd_vols_em_transito / total_volumes) * 100 if total_volumes > 0 else 0
             pct_vols_no_prazo_antecipado = (qtd_vols_no_prazo_antecipado / total_volumes) * 100 if total_volumes > 0 else 0
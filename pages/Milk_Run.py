@@ -0,0 +1,100 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import banco_dados
+import milk_run
+
+# Configuração da página
+st.set_page_config(page_title="Milk Run", layout="wide")
+st.title("🚛 Desempenho do Milk Run")
+
+db_path = banco_dados.DB_PATH
+
+if milk_run.TABELA_MILK_RUN not in banco_dados.listar_tabelas(db_path):
+    st.warning(f"A tabela '{milk_run.TABELA_MILK_RUN}' não existe no banco. Carregue-a pelo Painel de Controle.")
+    st.stop()
+
+# Viagens já convertidas (datas/horas em datetime64), em cache até a tabela mudar
+todas = milk_run.viagens(incluir_cancelados=True, db_path=db_path)
+if todas["data"].isna().all():
+    st.info("Nenhuma viagem com data prevista de coleta.")
+    st.stop()
+
+data_min, data_max = todas["data"].min().date(), todas["data"].max().date()
+datas = st.date_input("Período (início previsto da coleta)", value=(data_min, data_max),
+                      min_value=data_min, max_value=data_max)
+data_inicio, data_fim = (datas[0], datas[1]) if len(datas) == 2 else (datas[0], datas[0])
+
+col_rota, col_placa, col_tipo = st.columns(3)
+filtros = {
+    "rota": col_rota.multiselect("Rota", sorted(todas["rota"].dropna().unique())),
+    "placa": col_placa.multiselect("Placa", sorted(todas["placa"].dropna().unique())),
+    "tipo_veic": col_tipo.multiselect("Tipo de veículo", sorted(todas["tipo_veic"].dropna().unique())),
+}
+
+resumo = milk_run.resumo_geral(data_inicio, data_fim, filtros, db_path=db_path)
+
+
+def _formatar(valor, sufixo=""):
+    return "-" if pd.isna(valor) else f"{valor:.1f}{sufixo}"
+
+
+m1, m2, m3, m4, m5, m6 = st.columns(6)
+m1.metric("Viagens", resumo["viagens"])
+m2.metric("Canceladas", resumo["canceladas"])
+m3.metric("Pontualidade coleta", _formatar(resumo["pontualidade_coleta"], "%"))
+m4.metric("Pontualidade entrega", _formatar(resumo["pontualidade_entrega"], "%"))
+m5.metric("Atraso médio coleta", _formatar(resumo["atraso_medio_coleta_min"], " min"))
+m6.metric("Permanência média coleta", _formatar(resumo["permanencia_media_coleta_min"], " min"))
+st.caption(f"Pontual = chegada até {milk_run.TOLERANCIA_MIN} min depois do horário previsto. Viagens canceladas ficam fora dos indicadores.")
+
+# Indicadores por rota, placa ou tipo de veículo
+dimensoes = {"Rota": "rota", "Placa": "placa", "Tipo de veículo": "tipo_veic", "Turno": "turno", "Origem": "origem"}
+agrupar = st.selectbox("Agrupar por", list(dimensoes))
+tabela = milk_run.indicadores([dimensoes[agrupar]], data_inicio, data_fim, filtros, db_path=db_path)
+st.dataframe(tabela.round(1), use_container_width=True, hide_index=True)
+
+# Distribuição dos atrasos
+evento = st.radio("Distribuição de atrasos na chegada", ["coleta", "entrega"], horizontal=True)
+distribuicao = milk_run.distribuicao_atrasos(evento, data_inicio=data_inicio, data_fim=data_fim, filtros=filtros,
+                                             db_path=db_path)
+fig = px.bar(distribuicao, x="faixa", y="viagens", text="viagens",
+             labels={"faixa": "Atraso", "viagens": "Viagens"}, title=f"Atrasos na {evento}")
+st.plotly_chart(fig, use_container_width=True)
+
+# Acompanhamento das janelas previstas: atrasos e sobreposições num instante
+st.subheader("⏱️ Janelas previstas")
+agora = pd.Timestamp.now().floor("min")
+# Sem viagens recentes (dados antigos), usa o fim do período escolhido como referência
+referencia = agora if pd.Timestamp(data_fim) >= agora.normalize() else pd.Timestamp(data_fim) + pd.Timedelta(hours=23, minutes=59)
+col_dia, col_hora, col_horizonte, col_evento = st.columns(4)
+dia_ref = col_dia.date_input("Dia de referência", value=referencia.date())
+hora_ref = col_hora.time_input("Hora de referência", value=referencia.time())
+horizonte = col_horizonte.number_input("Horas para trás", min_value=1, max_value=72, value=milk_run.HORIZONTE_ATRASO_H)
+evento_janela = col_evento.radio("Evento", list(milk_run.JANELAS), horizontal=True, key="evento_janela")
+instante = pd.Timestamp.combine(dia_ref, hora_ref)
+inicio_janela = instante - pd.Timedelta(hours=horizonte)
+
+atrasadas = milk_run.atrasados(inicio_janela, instante, evento_janela, instante=instante, filtros=filtros, db_path=db_path)
+coluna_prevista = milk_run.JANELAS[evento_janela][0]
+st.markdown(f"**Atrasadas** ({len(atrasadas)}) — janelas de {inicio_janela:%d/%m %H:%M} a {instante:%d/%m %H:%M}")
+st.dataframe(atrasadas[["rota", "placa", "tipo_veic", "turno", coluna_prevista, "situacao", "atraso_atual_min"]].round(0),
+             use_container_width=True, hide_index=True)
+
+sobrepostas = milk_run.sobreposicoes(inicio_janela, instante, evento_janela, filtros=filtros, db_path=db_path)
+coluna_fim = milk_run.JANELAS[evento_janela][1]
+st.markdown(f"**Mesma placa em janelas sobrepostas** ({len(sobrepostas)})")
+st.dataframe(sobrepostas[["placa", "rota", coluna_prevista, coluna_fim, "origem", "destinatario"]],
+             use_container_width=True, hide_index=True)
+
+# Aderência móvel por rota (7 e 30 dias)
+st.subheader("📈 Aderência móvel por rota")
+rotas_aderencia = filtros["rota"] or list(
+    milk_run.indicadores(["rota"], data_inicio, data_fim, filtros, db_path=db_path)
+    .sort_values("viagens", ascending=False)["rota"].head(5))
+janela_dias = st.radio("Janela", milk_run.JANELAS_ADERENCIA, format_func=lambda d: f"{d} dias", horizontal=True)
+aderencia = milk_run.aderencia_movel(evento_janela, rotas_aderencia, data_inicio, data_fim, db_path=db_path)
+fig = px.line(aderencia, x="data", y=f"aderencia_{janela_dias}d", color="rota",
+              labels={"data": "Dia", f"aderencia_{janela_dias}d": "Aderência (%)", "rota": "Rota"},
+              title=f"Chegadas pontuais na {evento_janela} nos últimos {janela_dias} dias")
+st.plotly_chart(fig, use_container_width=True)
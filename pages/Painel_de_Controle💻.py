@@ -1,15 +1,24 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
+import banco_dados
+import ingestao
+import navegador_tabelas
+import snapshots
 
 st.set_page_config(page_title="Gerenciador de Tabelas", layout="wide")
 st.title("📊 Gerenciador de Tabelas com Excel + SQLite")
 
 # Caminho do banco de dados
-db_path = "logistica_interna.db"
+db_path = banco_dados.DB_PATH
 
-# Conexão com o banco
-conn = sqlite3.connect(db_path)
+# Barra de progresso para a carga em lotes (ingestao.carregar_excel)
+def barra_progresso():
+    barra = st.progress(0.0, text="Gravando...")
+
+    def atualizar(gravadas, total):
+        fracao = min(gravadas / total, 1.0) if total else 0.0
+        barra.progress(fracao, text=f"Gravando... {gravadas} linhas")
+    return atualizar
 
 # Upload do arquivo
 uploaded_file = st.file_uploader("📁 Envie seu arquivo Excel", type=["xlsx"])
@@ -19,15 +28,13 @@ operacao = st.radio("Escolha uma operação:", ["Criar nova tabela", "Atualizar
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file, engine='openpyxl')
-
-        # Converter colunas do tipo Timestamp para string
-        for col in df.columns:
-            if pd.api.types.is_datetime64_any_dtype(df[col]):
-                df[col] = df[col].astype(str)
+        # Só uma amostra é lida para exibição; a carga completa é feita em lotes
+        df_preview = ingestao.ler_preview(uploaded_file)
+        total_linhas = ingestao.contar_linhas(uploaded_file)
 
         st.success("✅ Arquivo carregado com sucesso!")
-        st.dataframe(df)
+        st.caption(f"Prévia: {len(df_preview)} de {total_linhas} linhas")
+        st.dataframe(df_preview)
 
         if operacao == "Criar nova tabela":
             nome_tabela = st.text_input("Digite o nome da nova tabela:")
@@ -35,41 +42,51 @@ if uploaded_file:
             if st.button("Criar Tabela"):
                 if nome_tabela:
                     try:
-                        df.columns = [col.strip().replace(" ", "_").lower() for col in df.columns]  # padronizar nomes
-                        df.to_sql(nome_tabela, conn, if_exists="fail", index=False)
-                        st.success(f"✅ Tabela '{nome_tabela}' criada com sucesso!")
+                        contagem = ingestao.carregar_excel(
+                            uploaded_file, nome_tabela, criar=True, progresso=barra_progresso(), db_path=db_path
+                        )
+                        st.success(f"✅ Tabela '{nome_tabela}' criada com sucesso! ({contagem['inseridas']} linhas)")
                     except Exception as e:
                         st.error(f"❌ Erro ao criar a tabela: {e}")
                 else:
                     st.warning("⚠️ Digite um nome para a tabela!")
 
         elif operacao == "Atualizar tabela existente":
-            tabelas_existentes = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)["name"].tolist()
+            tabelas_existentes = banco_dados.listar_tabelas(db_path)
             tabela_escolhida = st.selectbox("Escolha a tabela para atualizar:", tabelas_existentes)
 
+            # Tabelas com chave natural conhecida são atualizadas sem duplicar linhas
+            chaves = ingestao.CHAVES_NATURAIS.get(tabela_escolhida)
+            modos = {"Atualizar pela chave (sem duplicar)": ingestao.MODO_UPSERT, "Inserir todas as linhas": ingestao.MODO_INSERIR}
+            if chaves:
+                modo = modos[st.radio(f"Modo de carga (chave: {', '.join(chaves)}):", list(modos))]
+            else:
+                modo = ingestao.MODO_INSERIR
+
             if st.button("Atualizar Tabela"):
                 try:
-                    df.columns = [col.strip().replace(" ", "_").lower() for col in df.columns]  # padronizar nomes
-                    placeholders = ", ".join(["?"] * len(df.columns))
-                    colunas_sql = ", ".join([f'"{col}"' for col in df.columns])
-                    insert_query = f'INSERT INTO "{tabela_escolhida}" ({colunas_sql}) VALUES ({placeholders})'
-
-                    cursor = conn.cursor()
-                    cursor.executemany(insert_query, df.values.tolist())
-                    conn.commit()
-                    st.success(f"✅ Dados inseridos na tabela '{tabela_escolhida}' com sucesso!")
+                    contagem = ingestao.carregar_excel(
+                        uploaded_file, tabela_escolhida, modo=modo, progresso=barra_progresso(), db_path=db_path
+                    )
+                    st.success(f"✅ Tabela '{tabela_escolhida}' atualizada com sucesso!")
+                    col1, col2, col3, col4, col5 = st.columns(5)
+                    col1.metric("Inseridas", contagem["inseridas"])
+                    col2.metric("Atualizadas", contagem["atualizadas"])
+                    col3.metric("Sem alteração", contagem["inalteradas"])
+                    col4.metric("Ignoradas (sem chave)", contagem["sem_chave"])
+                    col5.metric("Repetidas na planilha", contagem["repetidas"])
                 except Exception as e:
                     st.error(f"❌ Erro ao atualizar a tabela: {e}")
 
         elif operacao == "Excluir tabela":
-            tabelas_existentes = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)["name"].tolist()
+            tabelas_existentes = banco_dados.listar_tabelas(db_path)
             tabela_escolhida = st.selectbox("Escolha a tabela para excluir:", tabelas_existentes)
 
             if st.button("Excluir Tabela SQL"):
                 try:
-                    cursor = conn.cursor()
-                    cursor.execute(f'DROP TABLE IF EXISTS "{tabela_escolhida}"')
-                    conn.commit()
+                    with banco_dados.conexao_escrita(db_path) as conn:
+                        conn.execute(f'DROP TABLE IF EXISTS "{tabela_escolhida}"')
+                        ingestao.atualizar_derivados(conn, tabela_escolhida)
                     st.success(f"✅ Tabela '{tabela_escolhida}' excluída com sucesso!")
                 except Exception as e:
                     st.error(f"❌ Erro ao excluir a tabela: {e}")
@@ -80,27 +97,72 @@ if uploaded_file:
 # Visualizar tabelas existentes
 st.subheader("📚 Visualizar Tabelas Existentes no Banco de Dados")
 
-tabelas = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
+tabelas = pd.DataFrame({"name": banco_dados.listar_tabelas(db_path)})
 
 if not tabelas.empty:
     tabela_selecionada = st.selectbox("Escolha uma tabela para visualizar os dados:", tabelas["name"])
     if tabela_selecionada:
-        df_tabela = pd.read_sql(f'SELECT * FROM "{tabela_selecionada}"', conn)
-        st.write(f"📄 Dados da tabela: `{tabela_selecionada}`")
-        st.dataframe(df_tabela)
+        # Filtro, ordenação e paginação feitos no banco: só a página visível é carregada
+        colunas_tabela = navegador_tabelas.colunas_tabela(tabela_selecionada, db_path)
+        filtro_col1, filtro_col2, filtro_col3 = st.columns([2, 1, 2])
+        coluna_filtro = filtro_col1.selectbox("Filtrar coluna:", ["(nenhuma)"] + colunas_tabela)
+        operador_filtro = filtro_col2.selectbox("Operador:", list(navegador_tabelas.OPERADORES))
+        valor_filtro = filtro_col3.text_input("Valor:")
+        filtros = []
+        if coluna_filtro != "(nenhuma)" and (valor_filtro or operador_filtro in ("vazio", "preenchido")):
+            filtros.append((coluna_filtro, operador_filtro, valor_filtro))
+
+        ordem_col1, ordem_col2, ordem_col3 = st.columns([2, 1, 1])
+        ordenar_por = ordem_col1.selectbox("Ordenar por:", ["(ordem de carga)"] + colunas_tabela)
+        decrescente = ordem_col2.checkbox("Decrescente")
+        tamanho_pagina = ordem_col3.selectbox("Linhas por página:", navegador_tabelas.TAMANHOS_PAGINA, index=1)
+
+        try:
+            total_filtrado = navegador_tabelas.contar(tabela_selecionada, filtros, db_path)
+            paginas = navegador_tabelas.total_paginas(total_filtrado, tamanho_pagina)
+            numero_pagina = st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1)
+            df_tabela = navegador_tabelas.pagina(
+                tabela_selecionada, numero_pagina, tamanho_pagina, filtros,
+                ordenar_por=None if ordenar_por == "(ordem de carga)" else ordenar_por,
+                decrescente=decrescente, db_path=db_path,
+            )
+            inicio = (numero_pagina - 1) * tamanho_pagina
+            st.write(f"📄 Dados da tabela: `{tabela_selecionada}` — linhas {inicio + 1 if len(df_tabela) else 0}–{inicio + len(df_tabela)} de {total_filtrado}")
+            st.dataframe(df_tabela)
+        except Exception as e:
+            st.error(f"❌ Erro ao consultar a tabela: {e}")
 
         # Adicionar botão para excluir a tabela selecionada
         if st.button("🗑️ Excluir Tabela SQL"):
             try:
-                cursor = conn.cursor()
-                cursor.execute(f'DROP TABLE IF EXISTS "{tabela_selecionada}"')
-                conn.commit()
+                with banco_dados.conexao_escrita(db_path) as conn:
+                    conn.execute(f'DROP TABLE IF EXISTS "{tabela_selecionada}"')
+                    ingestao.atualizar_derivados(conn, tabela_selecionada)
                 st.success(f"✅ Tabela '{tabela_selecionada}' excluída com sucesso!")
             except Exception as e:
                 st.error(f"❌ Erro ao excluir a tabela: {e}")
 else:
     st.info("Nenhuma tabela encontrada no banco de dados.")
 
-# Fechar a conexão
-conn.close()
+# Snapshots Parquet (leitura colunar por mês de emissão, ver snapshots.py)
+st.subheader("🗄️ Snapshots Parquet")
+
+status_snapshots = pd.DataFrame([
+    {
+        "Tabela": tabela,
+        "Gerado em": (snapshots.metadados(tabela) or {}).get("gerado_em"),
+        "Em dia": snapshots.snapshot_em_dia(tabela, db_path),
+    }
+    for tabela in snapshots.TABELAS
+    if tabela in banco_dados.listar_tabelas(db_path)
+])
+st.dataframe(status_snapshots, hide_index=True)
+
+if st.button("🔄 Gerar snapshots"):
+    try:
+        with st.spinner("Gerando snapshots..."):
+            for tabela, linhas in snapshots.exportar_todas(db_path=db_path):
+                st.write(f"✅ {tabela}: {linhas} linhas")
+    except Exception as e:
+        st.error(f"❌ Erro ao gerar os snapshots: {e}")
 
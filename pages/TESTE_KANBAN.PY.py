@@ -1,92 +1,67 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-import json
-from itertools import combinations
-from streamlit_modal import Modal
+import banco_dados
+import cidades_hub
+import kanban
+import plano_carga
 
 # Configuração da página
 st.set_page_config(page_title="Kanban - Site Carga Rastreada", layout="wide")
 st.title("🚚 Planejamento de pedidos After-Sales")
 
-PASSWORD = "123"
-
-# Conectar ao banco de dados SQLite
-conn = sqlite3.connect("logistica_interna.db")
-cursor = conn.cursor()
-
-# Criar tabela garantindo que 'cte' não seja duplicado
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS `Site Carga Rastreada` (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    cte TEXT UNIQUE,  -- Evita inserções duplicadas
-    nf TEXT,
-    emissor TEXT,
-    status TEXT
-);
-""")
-conn.commit()
-
-# Verificar se a tabela tem colunas definidas antes de prosseguir
-cursor.execute("PRAGMA table_info(`Site Carga Rastreada`);")
-table_info = cursor.fetchall()
+# A tabela é criada pela ingestão e mantida pelas migrações; aqui só é lida
+with banco_dados.conexao_leitura() as conn:
+    table_info = conn.execute("PRAGMA table_info(`Site Carga Rastreada`);").fetchall()
 if not table_info:
-    st.error("Erro: A tabela não contém colunas. Verifique o banco de dados.")
+    st.error("Erro: a tabela Site Carga Rastreada não existe. Importe os dados pelo Painel de Controle.")
     st.stop()
 
 columns = [col[1] for col in table_info]
 
-# Carregar dados da tabela
-try:
-    df = pd.read_sql("SELECT * FROM `Site Carga Rastreada`", conn)
-    df.columns = df.columns.str.strip()  # Remove espaços extras
-    df.fillna("Não informado", inplace=True)  # Evita valores nulos
-
-    # Agrupar dados por CTe e organizar informações de NF separadamente
-    df_grouped = df.groupby(["cte", "nf"]).agg({
-        **{col: "first" for col in df.columns if col not in ["cte", "nf"]}
-    }).reset_index()
-
-except Exception as e:
-    st.error(f"Erro ao carregar a tabela: {e}")
-    df_grouped = pd.DataFrame()
-
-# Função para carregar estado salvo do Kanban
-def load_kanban():
-    try:
-        with open("kanban_state.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {
-            "Em Coleta": df_grouped.to_dict(orient="records"),
-            "Em Triagem": [],
-            "Aguardando Coleta": [],
-            "Em Rota de Entrega": [],
-            "Entrega Concluída": []
-        }
-
-# Função para salvar estado do Kanban
-def save_kanban():
-    with open("kanban_state.json", "w") as f:
-        json.dump(st.session_state.kanban, f)
-
-# Inicializar estado
-if "kanban" not in st.session_state:
-    st.session_state.kanban = load_kanban()
-
-# Função para mover cards entre colunas
+# Estado do quadro no banco (kanban_card + log de movimentos); CTes novos entram na primeira etapa
+kanban.sincronizar()
+
+CARDS_POR_PAGINA = 20
+
+# Resumo mostrado no cartão; a linha completa fica no painel de detalhes
+colunas_card = [c for c in ["emissor", "cidade", "dealer", "qtd.vols", "prev.entrega"] if c in columns]
+
+# Quantos cartões cada etapa mostra (cresce com "Carregar mais") e o cartão aberto no painel
+if "kanban_limite" not in st.session_state:
+    st.session_state.kanban_limite = {etapa: CARDS_POR_PAGINA for etapa in kanban.ETAPAS}
+if "kanban_detalhe" not in st.session_state:
+    st.session_state.kanban_detalhe = None
+
+def carregar_mais(etapa):
+    st.session_state.kanban_limite[etapa] += CARDS_POR_PAGINA
+
+def reiniciar_limite(etapa):
+    st.session_state.kanban_limite[etapa] = CARDS_POR_PAGINA
+
+# Move os cartões marcados da etapa de uma vez (uma transação, um rerun) e limpa a seleção
+def mover_selecionados(etapa, selecionados):
+    destino = kanban.PROXIMA_ETAPA[etapa]
+    movidos = kanban.mover_em_lote(selecionados, etapa, destino, usuario_atual())
+    for cte, nf in selecionados:
+        st.session_state.pop(f"sel_{etapa}_{cte}_{nf}", None)
+    st.session_state.kanban_aviso = f"✅ {movidos} cartões movidos de '{etapa}' para '{destino}'."
+
+# Operador informado na barra lateral, gravado no log de movimentos (None se em branco)
+def usuario_atual():
+    return st.session_state.get("kanban_usuario", "").strip() or None
+
+def abrir_detalhe(cte, nf):
+    st.session_state.kanban_detalhe = (cte, nf)
+
+def fechar_detalhe():
+    st.session_state.kanban_detalhe = None
+
+# Função para mover cards entre colunas (UPDATE de uma linha; recusado se outro usuário já moveu)
 def move_card(origem, destino, card):
-    if card in st.session_state.kanban[origem]:
-        st.session_state.kanban[origem].remove(card)
-        st.session_state.kanban[destino].append(card)
-        save_kanban()
+    if kanban.mover(card.get("cte"), card.get("nf"), origem, destino, usuario_atual()):
         st.rerun()
-
-def move_card_com_senha(origem, destino, card, senha):
-    if senha == PASSWORD:
-        move_card(origem, destino, card)
     else:
-        st.error("❌ Senha incorreta! Permissão negada.")
+        st.warning(f"⚠️ O CTe {card.get('cte')} - NF {card.get('nf')} já foi movido por outro usuário.")
 
 # Estilos CSS para cartões
 st.markdown("""
@@ -101,9 +76,101 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Painel de detalhes único (na barra lateral), no lugar de um modal por cartão
+with st.sidebar:
+    st.text_input("👤 Seu nome (registrado nas movimentações)", key="kanban_usuario")
+    if usuario_atual() is None:
+        st.warning("Informe seu nome para mover cartões.")
+    detalhe = st.session_state.kanban_detalhe
+    if detalhe is not None:
+        card = kanban.card(*detalhe)
+        if card is None:
+            st.session_state.kanban_detalhe = None
+        else:
+            st.markdown(f"### 📋 CTe {card['cte']} - NF {card['nf']}")
+            for key, value in card.items():
+                st.write(f"**{key}:** {'Não informado' if pd.isna(value) else value}")
+            historico = kanban.historico(card["cte"], card["nf"])
+            if not historico.empty:
+                st.markdown("#### Movimentações")
+                st.dataframe(historico, hide_index=True)
+            st.button("Fechar detalhes", on_click=fechar_detalhe)
+
+if "kanban_aviso" in st.session_state:
+    st.success(st.session_state.pop("kanban_aviso"))
+
+# Movimentação em lote por filtro: hub, emissor, data de emissão ou lista de NFs colada
+with st.expander("📦 Movimentação em lote"):
+    lote_col1, lote_col2 = st.columns(2)
+    origem_lote = lote_col1.selectbox("Etapa de origem", kanban.ETAPAS[:-1], key="lote_origem")
+    destinos = [etapa for etapa in kanban.ETAPAS if etapa != origem_lote]
+    destino_lote = lote_col2.selectbox("Etapa de destino", destinos, index=destinos.index(kanban.PROXIMA_ETAPA[origem_lote]),
+                                       key="lote_destino")
+
+    hubs_lote = []
+    if cidades_hub.TABELA_DIMENSAO in banco_dados.listar_tabelas():
+        hubs = banco_dados.consultar(
+            f"SELECT DISTINCT hub FROM {cidades_hub.TABELA_DIMENSAO} WHERE hub IS NOT NULL ORDER BY hub",
+            tabelas=[cidades_hub.TABELA_DIMENSAO],
+        )["hub"].tolist()
+        hubs_lote = lote_col1.multiselect("Hub", hubs, key="lote_hubs")
+    emissores = banco_dados.consultar(
+        "SELECT DISTINCT emissor FROM `Site Carga Rastreada` WHERE emissor IS NOT NULL ORDER BY emissor",
+        tabelas=["Site Carga Rastreada"],
+    )["emissor"].tolist()
+    emissores_lote = lote_col2.multiselect("Emissor", emissores, key="lote_emissores")
+
+    data_inicio_lote = data_fim_lote = None
+    if lote_col1.checkbox("Filtrar por data de emissão", key="lote_usar_datas"):
+        datas = lote_col1.date_input("Emissão do CTe", value=(), key="lote_datas")
+        if len(datas) == 2:
+            data_inicio_lote, data_fim_lote = (d.strftime("%Y-%m-%d") for d in datas)
+    nfs_lote = kanban.ler_lista_nfs(lote_col2.text_area("NFs (cole a lista: uma por linha ou separadas por vírgula)",
+                                                        key="lote_nfs"))
+
+    filtros_lote = dict(hubs=hubs_lote, emissores=emissores_lote, data_inicio=data_inicio_lote,
+                        data_fim=data_fim_lote, nfs=nfs_lote)
+    if not any(filtros_lote.values()):
+        st.info("Informe ao menos um filtro para selecionar os cartões.")
+    else:
+        qtd_lote = kanban.contar_lote(origem_lote, **filtros_lote)
+        st.write(f"**{qtd_lote}** cartões em '{origem_lote}' atendem aos filtros.")
+        if st.button(f"🚚 Mover {qtd_lote} cartões para '{destino_lote}'", disabled=qtd_lote == 0 or usuario_atual() is None,
+                     key="lote_mover"):
+            movidos = kanban.mover_por_filtro(origem_lote, destino_lote, usuario=usuario_atual(), **filtros_lote)
+            st.session_state.kanban_aviso = f"✅ {movidos} cartões movidos de '{origem_lote}' para '{destino_lote}'."
+            st.rerun()
+
+# Consolidação de cargas: pedidos do After Sales agrupados por hub e dia de faturamento em caminhões
+if plano_carga.TABELA_AFTER_SALES in banco_dados.listar_tabelas():
+    with st.expander("🚛 Consolidação de cargas (After Sales)"):
+        pedidos_as = plano_carga.pedidos()
+        if pedidos_as.empty:
+            st.info("Nenhum pedido na tabela After Sales.")
+        else:
+            carga_col1, carga_col2, carga_col3 = st.columns(3)
+            dias_fat = pedidos_as["data_fat"].dropna()
+            ultimo_dia = dias_fat.max().date() if not dias_fat.empty else None
+            datas_carga = carga_col1.date_input("Faturamento", value=(ultimo_dia, ultimo_dia) if ultimo_dia else (),
+                                                key="carga_datas")
+            hubs_carga = carga_col2.multiselect("Hub", sorted(pedidos_as["hub"].unique()), key="carga_hubs")
+            veiculos = list(plano_carga.VEICULOS)
+            veiculo = carga_col3.selectbox("Veículo", veiculos, index=veiculos.index(plano_carga.VEICULO_PADRAO),
+                                           key="carga_veiculo")
+            ajustar = carga_col3.checkbox("Trocar por veículo menor quando a carga couber", value=True, key="carga_ajustar")
+            exato = carga_col3.checkbox(f"Solução exata (grupos com até {plano_carga.LIMITE_PEDIDOS_EXATO} pedidos)",
+                                        key="carga_exato")
+
+            inicio_carga, fim_carga = (datas_carga[0], datas_carga[1]) if len(datas_carga) == 2 else (None, None)
+            selecionados_carga = plano_carga.pedidos(inicio_carga, fim_carga, hubs_carga)
+            planos = plano_carga.planejar(selecionados_carga, veiculo, exato=exato, ajustar_veiculo=ajustar)
+            st.write(f"**{len(selecionados_carga)}** pedidos em **{len(planos)}** caminhões.")
+            st.dataframe(plano_carga.resumo_planos(planos), use_container_width=True, hide_index=True)
+            st.dataframe(planos.drop(columns=["ids"]).round(1), use_container_width=True, hide_index=True)
+
 # Layout Kanban
 col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 1])
-status_list = ["Em Coleta", "Em Triagem", "Aguardando Coleta", "Em Rota de Entrega", "Entrega Concluída"]
+status_list = kanban.ETAPAS
 color_class = {
     "Em Coleta": "card-coleta",
     "Em Triagem": "card-triagem",
@@ -111,46 +178,53 @@ color_class = {
     "Em Rota de Entrega": "card-rota",
     "Entrega Concluída": "card-concluido"
 }
-status_progression = {
-    "Em Coleta": "Em Triagem",
-    "Em Triagem": "Aguardando Coleta",
-    "Aguardando Coleta": "Em Rota de Entrega",
-    "Em Rota de Entrega": "Entrega Concluída"
-}
+status_progression = kanban.PROXIMA_ETAPA
 
+# Cada etapa só busca e desenha os cartões visíveis (uma consulta indexada por etapa)
 for col, status in zip([col1, col2, col3, col4, col5], status_list):
     with col:
         st.subheader(status)
-        cards = st.session_state.kanban.get(status, [])
+        busca = st.text_input("🔎 Buscar (CTe, NF, emissor, cidade)", key=f"busca_{status}",
+                              on_change=reiniciar_limite, args=(status,))
+        total = kanban.contar_etapa(status, busca)
+        limite = st.session_state.kanban_limite[status]
+        df_cards = kanban.cards_etapa(status, limite=limite, busca=busca)
+        df_cards.columns = df_cards.columns.str.strip()  # Remove espaços extras
+        cards = df_cards.fillna("Não informado").to_dict(orient="records")  # Evita valores nulos
         if not cards:
             st.info("Nenhum cartão aqui.")
             continue
+        st.caption(f"{len(cards)} de {total} cartões")
+        selecionados = []
 
         for card in cards:
             card_html = f"<div class='kanban-card {color_class[status]}'>"
             card_html += f"<strong>CTe:</strong> {card.get('cte', 'Não informado')}<br>"
             card_html += f"<strong>NF:</strong> {card.get('nf', 'Não informado')}<br>"
-            for col_name in columns:
-                if col_name not in ["cte", "nf"]:
-                    card_html += f"<strong>{col_name}:</strong> {card.get(col_name, 'Não informado')}<br>"
+            for col_name in colunas_card:
+                card_html += f"<strong>{col_name}:</strong> {card.get(col_name, 'Não informado')}<br>"
             card_html += "</div>"
             st.markdown(card_html, unsafe_allow_html=True)
 
+            botao_mover, botao_detalhe = st.columns(2)
             # Botão de progressão para a próxima etapa
             if status in status_progression:
                 next_status = status_progression[status]
-                if st.button(f"🔄 Mover para '{next_status}' [{card.get('cte')}] - NF {card.get('nf')}", key=f"{status}_{card.get('cte')}_to_{next_status}"):
+                if botao_mover.button(f"🔄 {next_status}", key=f"{status}_{card.get('cte')}_{card.get('nf')}_to_{next_status}",
+                                      disabled=usuario_atual() is None):
                     move_card(status, next_status, card)
 
-            # Modal de detalhes com NF separadas
-            modal = Modal(f"📋 Detalhes do CTe {card.get('cte', 'Não informado')} - NF {card.get('nf', 'Não informado')}", key=f"modal_{card.get('cte')}_{card.get('nf')}", max_width=700)
-            open_modal = st.button(f"📋 Ver Detalhes [{card.get('cte', 'Não informado')}] - NF {card.get('nf', 'Não informado')}", key=f"open_modal_{card.get('cte')}_{card.get('nf')}")
+            botao_detalhe.button("📋 Detalhes", key=f"detalhe_{card.get('cte')}_{card.get('nf')}",
+                                 on_click=abrir_detalhe, args=(card.get("cte"), card.get("nf")))
+            # Seleção para mover vários cartões de uma vez
+            if status in status_progression and st.checkbox("Selecionar", key=f"sel_{status}_{card.get('cte')}_{card.get('nf')}"):
+                selecionados.append((card.get("cte"), card.get("nf")))
 
-            if open_modal:
-                modal.open()
+        if selecionados:
+            st.button(f"🔄 Mover {len(selecionados)} selecionados para '{status_progression[status]}'",
+                      key=f"mover_sel_{status}", on_click=mover_selecionados, args=(status, selecionados),
+                      disabled=usuario_atual() is None)
 
-            if modal.is_open():
-                with modal.container():
-                    st.markdown(f"### Detalhes do CTe: {card.get('cte', 'Não informado')} - NF {card.get('nf', 'Não informado')}")
-                    for key, value in card.items():
-                        st.write(f"**{key}:** {value}")
+        if len(cards) < total:
+            st.button(f"⬇️ Carregar mais ({total - len(cards)} restantes)", key=f"mais_{status}",
+                      on_click=carregar_mais, args=(status,))
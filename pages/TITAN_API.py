@@ -1,10 +1,9 @@
 import streamlit as st
 import pandas as pd
-import requests
-import json
-import urllib.request
 import plotly.express as px
 from datetime import date
+import api_cargarastreada
+import geodados
 
 st.set_page_config(page_title="Dashboard", layout="wide")
 
@@ -28,12 +27,11 @@ logos_fornecedor = {
     "Volkswagen": "https://th.bing.com/th/id/OIP.FPiS5vvV-gklhWyf95dUAwHaHZ?r=0&rs=1&pid=ImgDetMain"
 }
 
-# --- Construção da lista de fornecedores com URLs ---
+# --- Construção da lista de fornecedores com CNPJ ---
 todos_fornecedores = {}
 for cliente, fornecedores in fornecedores_por_cliente.items():
     for fornecedor, cnpj in fornecedores.items():
-        url = f"http://app.cargarastreada.com.br/glovis/dashboard-api/?di={{data_inicio}}&df={{data_fim}}&emissor={cnpj}"
-        todos_fornecedores[fornecedor] = (cliente, url)
+        todos_fornecedores[fornecedor] = (cliente, cnpj)
 todos_fornecedores = {"Todos": ("Todos", None), **todos_fornecedores}
 
 # --- Interface do usuário ---
@@ -64,49 +62,37 @@ st.markdown("---")
 st.title(f"{cliente_selecionado} | {pagina}")
 
 # --- Funções auxiliares ---
-def get_api_data(url):
-    response = requests.get(url)
-    response.raise_for_status()
-    return response.json()
+# Busca os dados do fornecedor selecionado (ou de todos, em paralelo).
+# As respostas ficam em cache, então Dashboard e Pedidos reaproveitam a mesma busca.
+def carregar_dados_fornecedor(fornecedor, data_inicio_str, data_fim_str):
+    if fornecedor == "Todos":
+        emissores = {f: cnpj for f, (_, cnpj) in todos_fornecedores.items() if cnpj}
+    else:
+        emissores = {fornecedor: todos_fornecedores[fornecedor][1]}
+    df, erros = api_cargarastreada.carregar_fornecedores(emissores, data_inicio_str, data_fim_str)
+    for f, e in erros.items():
+        st.warning(f"Erro ao buscar dados de {f}: {e}")
+    return df
 
 def carregar_geojson():
-    url = "https://raw.githubusercontent.com/codeforamerica/click_that_hood/master/public/data/brazil-states.geojson"
-    with urllib.request.urlopen(url) as response:
-        geojson = json.load(response)
-    return geojson
+    return geodados.carregar_geojson("medio")
 
 # --- Página Dashboard ---
 if pagina == "Dashboard":
     st.title("Mapa de Calor - Volume por Estado")
 
-    if fornecedor == "Todos":
-        dfs = []
-        volumes_por_fornecedor = {}
-        for f, (_, url_template) in todos_fornecedores.items():
-            if url_template:
-                url = url_template.format(data_inicio=data_inicio_str, data_fim=data_fim_str)
-                try:
-                    dados = get_api_data(url)
-                    if dados:
-                        df_temp = pd.DataFrame(dados)
-                        df_temp["fornecedor"] = f
-                        dfs.append(df_temp)
-                        volumes_por_fornecedor[f] = df_temp["qtd_volumes"].sum()
-                except Exception as e:
-                    st.warning(f"Erro ao buscar dados de {f}: {e}")
-        df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
-    else:
-        url = todos_fornecedores[fornecedor][1].format(data_inicio=data_inicio_str, data_fim=data_fim_str)
-        try:
-            dados = get_api_data(url)
-            df = pd.DataFrame(dados)
-        except Exception as e:
-            st.error(f"Erro ao buscar dados: {e}")
-            df = pd.DataFrame()
+    df = carregar_dados_fornecedor(fornecedor, data_inicio_str, data_fim_str)
+    volumes_por_fornecedor = {}
+    if fornecedor == "Todos" and not df.empty and "qtd_volumes" in df.columns:
+        volumes_por_fornecedor = df.groupby("fornecedor")["qtd_volumes"].sum().to_dict()
 
     # --- Processamento e visualização ---
     if not df.empty and "destinatario_uf" in df.columns and "qtd_volumes" in df.columns:
-        geojson = carregar_geojson()
+        try:
+            geojson = carregar_geojson()
+        except Exception as e:
+            st.error(f"Erro ao carregar o GeoJSON dos estados: {e}")
+            st.stop()
         sigla_to_estado = {f["properties"]["sigla"]: f["properties"]["name"] for f in geojson["features"]}
         estados_siglas = list(sigla_to_estado.keys())
 
@@ -188,28 +174,7 @@ if pagina == "Dashboard":
 elif pagina == "Pedidos":
     st.subheader("📄 Lista de Pedidos")
 
-    if fornecedor == "Todos":
-        dfs = []
-        for f, (_, url_template) in todos_fornecedores.items():
-            if url_template:
-                url = url_template.format(data_inicio=data_inicio_str, data_fim=data_fim_str)
-                try:
-                    dados = get_api_data(url)
-                    if dados:
-                        df_temp = pd.DataFrame(dados)
-                        df_temp["fornecedor"] = f
-                        dfs.append(df_temp)
-                except Exception as e:
-                    st.warning(f"Erro ao buscar dados de {f}: {e}")
-        df = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
-    else:
-        url = todos_fornecedores[fornecedor][1].format(data_inicio=data_inicio_str, data_fim=data_fim_str)
-        try:
-            dados = get_api_data(url)
-            df = pd.DataFrame(dados)
-        except Exception as e:
-            st.error(f"Erro ao buscar dados: {e}")
-            df = pd.DataFrame()
+    df = carregar_dados_fornecedor(fornecedor, data_inicio_str, data_fim_str)
 
     if not df.empty:
         # Aplica máscara na coluna cte_chave
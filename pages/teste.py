@@ -1,7 +1,11 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-from datetime import datetime
+import banco_dados
+import status_entrega
+import busca_ctes
+import cidades_hub
+import grade_sql
+import navegador_tabelas
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 
 # Configuração da página
@@ -9,17 +13,21 @@ st.set_page_config(page_title="Visualizar Tabela", layout="wide")
 st.title("📊 Visualizar Tabela do Banco de Dados SQLite")
 
 # Caminho do banco de dados
-db_path = "logistica_interna.db"
-conn = sqlite3.connect(db_path)
+db_path = banco_dados.DB_PATH
 
 # Carregar tabelas
-tabelas = pd.read_sql("SELECT name FROM sqlite_master WHERE type='table'", conn)
+tabelas = pd.DataFrame({"name": banco_dados.listar_tabelas(db_path)})
 if not tabelas.empty:
     tabela_site = "Site Carga Rastreada"
-    tabela_hub = "Hub_Mercedes_Benz"
+    tabela_hub = cidades_hub.TABELA_HUB
+    tabela_cidade_hub = cidades_hub.TABELA_DIMENSAO
 
     if tabela_site in tabelas["name"].values and tabela_hub in tabelas["name"].values:
-        datas_disponiveis = pd.read_sql(f'SELECT DISTINCT emissao_cte FROM "{tabela_site}" ORDER BY emissao_cte', conn)
+        # A dimensão cidade -> hub é mantida pelas migrações e pela ingestão; a página só lê
+        if tabela_cidade_hub not in tabelas["name"].values:
+            st.warning(f"A tabela {tabela_cidade_hub} ainda não existe: rode 'python migracoes.py'.")
+            st.stop()
+        datas_disponiveis = banco_dados.consultar(f'SELECT DISTINCT emissao_cte FROM "{tabela_site}" ORDER BY emissao_cte', tabelas=[tabela_site], db_path=db_path)
         datas_disponiveis['emissao_cte'] = pd.to_datetime(datas_disponiveis['emissao_cte'])
 
         data_inicio, data_fim = st.date_input(
@@ -33,62 +41,78 @@ if not tabelas.empty:
 
         nf_input = st.text_input("Digite o número da NF para buscar", "")
         cte_input = st.text_input("Digite o número do CTE para buscar", "")
+        modo_busca = st.radio("Tipo de busca de NF/CTE", busca_ctes.MODOS, index=1, horizontal=True)
 
-        hubs_disponiveis = pd.read_sql(f'SELECT DISTINCT hub FROM "{tabela_hub}"', conn)
+        hubs_disponiveis = banco_dados.consultar(f'SELECT DISTINCT hub FROM "{tabela_hub}"', tabelas=[tabela_hub], db_path=db_path)
         hub_selecionado = st.multiselect("Filtrar por Hub", hubs_disponiveis['hub'].tolist(), default=hubs_disponiveis['hub'].tolist())
 
-        query = f'''
-            SELECT 
-                s.*, 
-                h.hub, 
-                h.transportadora
-            FROM "{tabela_site}" s
-            LEFT JOIN "{tabela_hub}" h 
-                ON s.cidade = h.danfe_dest_cidade
-            WHERE s.emissao_cte BETWEEN "{data_inicio_str}" AND "{data_fim_str}"
-        '''
-        if nf_input:
-            query += f' AND s.nf LIKE "%{nf_input}%"'
-        if cte_input:
-            query += f' AND s.cte LIKE "%{cte_input}%"'
-
-        df_tabela = pd.read_sql(query, conn)
-
-        # Ajuste datas
-        df_tabela['emissao_cte'] = pd.to_datetime(df_tabela['emissao_cte'], errors='coerce')
-        df_tabela['prev.entrega'] = pd.to_datetime(df_tabela['prev.entrega'], errors='coerce')
-        df_tabela['dt.entrega'] = pd.to_datetime(df_tabela['dt.entrega'], errors='coerce')
-
-        df_tabela = df_tabela[df_tabela['hub'].isin(hub_selecionado)]
-
-        # Calcular status (igual ao seu código)
-        if 'prev.entrega' in df_tabela.columns and 'dt.entrega' in df_tabela.columns:
-            df_tabela['diferença_dias'] = (df_tabela['prev.entrega'] - df_tabela['dt.entrega']).dt.days
-
-            def calcular_status(row):
-                if pd.isna(row['prev.entrega']):
-                    return "Em Trânsito 🚚"
-                elif pd.isna(row['dt.entrega']):
-                    if datetime.now().date() > row['prev.entrega'].date():
-                        return "Em Trânsito (ATRASADO) 🚚❌"
-                    else:
-                        return "Em Trânsito 🚚"
-                elif row['diferença_dias'] < 0:
-                    return "Atrasado❌"
-                elif row['diferença_dias'] > 0:
-                    return "Antecipado ✅"
-                else:
-                    return "No Prazo ✅"
-            df_tabela['status_pedido'] = df_tabela.apply(calcular_status, axis=1)
-
-        # Filtros adicionais
-        emissores_disponiveis = df_tabela['emissor'].dropna().unique().tolist()
+        emissores_disponiveis = banco_dados.consultar(
+            f'SELECT DISTINCT emissor FROM "{tabela_site}" WHERE emissao_cte BETWEEN ? AND ? AND emissor IS NOT NULL ORDER BY emissor',
+            (data_inicio_str, data_fim_str), tabelas=[tabela_site], db_path=db_path,
+        )['emissor'].tolist()
         emissor_selecionado = st.multiselect("Filtrar por Emissor", emissores_disponiveis, default=emissores_disponiveis)
-        df_tabela = df_tabela[df_tabela['emissor'].isin(emissor_selecionado)]
 
-        status_options = ["Em Trânsito 🚚", "Em Trânsito (ATRASADO) 🚚❌", "No Prazo ✅", "Antecipado ✅", "Atrasado❌"]
+        status_options = status_entrega.STATUS_OPCOES
         status_selecionado = st.multiselect("Filtrar por Status do Pedido", status_options, default=status_options)
-        df_tabela = df_tabela[df_tabela['status_pedido'].isin(status_selecionado)]
+
+        # Consulta base: junção CTe x hub com status calculado no próprio SQLite.
+        # Ordenação, filtros de coluna e paginação da grade são aplicados por fora (grade_sql).
+        def lista_sql(valores, params):
+            params.extend(valores)
+            return ", ".join("?" * len(valores)) if valores else "NULL"
+
+        params_base = [data_inicio_str, data_fim_str]
+        condicoes = ["s.emissao_cte BETWEEN ? AND ?"]
+        # Busca de NF/CTe pelos índices (exata, prefixo ou trecho)
+        condicoes_busca, params_busca = busca_ctes.condicoes_busca(
+            tabela_site, {"nf": nf_input, "cte": cte_input}, modo_busca, alias="s", db_path=db_path
+        )
+        condicoes += condicoes_busca
+        params_base += params_busca
+        query = f'''
+            SELECT * FROM (
+                SELECT
+                    s.rowid AS {grade_sql.COLUNA_LINHA},
+                    s.*,
+                    h.hub,
+                    h.transportadora,
+                    {status_entrega.sql_diferenca_dias('s."prev.entrega"', 's."dt.entrega"')} AS "diferença_dias",
+                    {status_entrega.sql_status('s."prev.entrega"', 's."dt.entrega"', hoje=status_entrega.data_referencia())} AS status_pedido
+                FROM "{tabela_site}" s
+                LEFT JOIN "{tabela_cidade_hub}" h
+                    ON h.cidade = s.cidade
+                WHERE {" AND ".join(condicoes)}
+            )
+        '''
+        query += f" WHERE hub IN ({lista_sql(hub_selecionado, params_base)})"
+        query += f" AND emissor IN ({lista_sql(emissor_selecionado, params_base)})"
+        query += f" AND status_pedido IN ({lista_sql(status_selecionado, params_base)})"
+
+        colunas_site = [c for c in navegador_tabelas.colunas_tabela(tabela_site, db_path) if c not in ("hub", "transportadora")]
+        colunas_grade = colunas_site + ["hub", "transportadora", "diferença_dias", "status_pedido"]
+
+        # Estado de ordenação/filtro devolvido pela grade no último rerun
+        estado_grade = st.session_state.get("estado_grade_ctes", {})
+        try:
+            total_linhas = grade_sql.contar(query, params_base, colunas_grade, estado_grade,
+                                            tabelas=[tabela_site, tabela_cidade_hub], db_path=db_path)
+        except ValueError as e:
+            # Filtro que não dá para traduzir em SQL: volta a grade ao estado inicial
+            st.warning(f"Filtro da grade ignorado: {e}")
+            estado_grade = {}
+            st.session_state["estado_grade_ctes"] = estado_grade
+            total_linhas = grade_sql.contar(query, params_base, colunas_grade, estado_grade,
+                                            tabelas=[tabela_site, tabela_cidade_hub], db_path=db_path)
+
+        pag_col1, pag_col2 = st.columns([1, 3])
+        tamanho_bloco = pag_col1.selectbox("Linhas por página", grade_sql.TAMANHOS_BLOCO, index=0)
+        total_paginas = max((total_linhas + tamanho_bloco - 1) // tamanho_bloco, 1)
+        pagina = pag_col2.number_input(f"Página (de {total_paginas}) — {total_linhas} linhas", min_value=1, max_value=total_paginas, value=1)
+
+        # Desempate pela linha da tabela do site: blocos estáveis sem ordenar por todas as colunas
+        df_tabela = grade_sql.consultar_bloco(query, params_base, colunas_grade, estado_grade, pagina, tamanho_bloco,
+                                              tabelas=[tabela_site, tabela_cidade_hub], db_path=db_path,
+                                              desempate=(grade_sql.COLUNA_LINHA,))
 
         # Configurar AgGrid para melhor UX
         gb = GridOptionsBuilder.from_dataframe(df_tabela)
@@ -114,14 +138,22 @@ if not tabelas.empty:
 
         gb.configure_column("status_pedido", cellStyle=cellstyle_jscode)
 
-        # Permitir filtros, ordenação, busca global
+        # Permitir filtros e ordenação; a grade só recebe o bloco da página atual,
+        # e os filtros/ordenação escolhidos nela são refeitos no banco (grade_sql)
         gb.configure_default_column(filter=True, sortable=True, resizable=True)
-        gb.configure_grid_options(domLayout='normal', pagination=True, paginationPageSize=20)
+        gb.configure_grid_options(domLayout='normal', initialState=estado_grade)
 
         gridOptions = gb.build()
 
         st.markdown("### Resultado da Consulta")
-        AgGrid(df_tabela, gridOptions=gridOptions, enable_enterprise_modules=False, allow_unsafe_jscode=True, height=500, fit_columns_on_grid_load=True)
+        resposta = AgGrid(
+            df_tabela, gridOptions=gridOptions, enable_enterprise_modules=False, allow_unsafe_jscode=True,
+            height=500, fit_columns_on_grid_load=True, update_on=["sortChanged", "filterChanged"], key="grade_ctes",
+        )
+        novo_estado = grade_sql.estado_consulta(resposta.grid_state)
+        if resposta.grid_state is not None and novo_estado != grade_sql.estado_consulta(estado_grade):
+            st.session_state["estado_grade_ctes"] = novo_estado
+            st.rerun()
 
 else:
     st.warning("Nenhuma tabela encontrada no banco de dados.")
@@ -0,0 +1,211 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+import banco_dados
+
+# Consolidação de cargas dos pedidos After-Sales.
+# Os pedidos de cada hub e dia de faturamento são agrupados em caminhões respeitando, ao
+# mesmo tempo, a capacidade em volumes e em m³ do veículo (empacotamento em duas dimensões).
+# A heurística (first-fit decreasing) resolve o livro de pedidos de um dia em milissegundos;
+# grupos pequenos podem ser resolvidos de forma exata (busca com poda), que garante o
+# menor número de caminhões.
+
+TABELA_AFTER_SALES = "After Sales"
+COLUNA_M3 = "m³"
+
+# Veículo -> (capacidade em volumes, capacidade em m³), do menor para o maior
+VEICULOS = {
+    "Fiorino": (60, 3.0),
+    "VUC": (250, 16.0),
+    "3/4": (400, 25.0),
+    "Toco": (600, 40.0),
+    "Truck": (900, 55.0),
+    "Carreta": (1500, 90.0),
+}
+VEICULO_PADRAO = "Truck"
+
+SEM_HUB = "Sem hub"
+
+# Modo exato: só para grupos com até LIMITE_PEDIDOS_EXATO pedidos; a busca para depois
+# de LIMITE_NOS_EXATO tentativas e fica com a melhor solução encontrada até ali
+LIMITE_PEDIDOS_EXATO = 14
+LIMITE_NOS_EXATO = 200_000
+
+
+# 'AAAA-MM-DD' ou 'dd/mm/aaaa' -> dia (datetime64)
+def _datas(serie):
+    texto = serie.astype("string").str.strip().str.slice(0, 10)
+    iso = pd.to_datetime(texto, format="%Y-%m-%d", errors="coerce")
+    return iso.fillna(pd.to_datetime(texto, format="%d/%m/%Y", errors="coerce"))
+
+
+# Pedidos do After Sales (um por linha) com hub, dia de faturamento, volumes e m³.
+# Sem período, traz todos os pedidos da tabela.
+def pedidos(data_inicio=None, data_fim=None, hubs=None, db_path=banco_dados.DB_PATH):
+    df = banco_dados.consultar(
+        f'SELECT rowid AS id, rota, hub, data_fat, qtd_vols, "{COLUNA_M3}" AS m3 FROM "{TABELA_AFTER_SALES}"',
+        tabelas=[TABELA_AFTER_SALES], db_path=db_path,
+    )
+    df["hub"] = df["hub"].astype("string").str.strip().replace("", pd.NA).fillna(SEM_HUB)
+    df["data_fat"] = _datas(df["data_fat"])
+    df["qtd_vols"] = pd.to_numeric(df["qtd_vols"], errors="coerce").fillna(0).clip(lower=0)
+    df["m3"] = pd.to_numeric(df["m3"], errors="coerce").fillna(0.0).clip(lower=0)
+    if data_inicio is not None:
+        df = df[df["data_fat"] >= pd.Timestamp(data_inicio)]
+    if data_fim is not None:
+        df = df[df["data_fat"] <= pd.Timestamp(data_fim)]
+    if hubs:
+        df = df[df["hub"].isin(hubs)]
+    return df.reset_index(drop=True)
+
+
+# Pedido maior que o veículo vira k partes iguais que cabem nele (carga fracionada)
+def _fracionar(ids, vols, m3, cap_vols, cap_m3):
+    partes = np.maximum(np.ceil(np.maximum(vols / cap_vols, m3 / cap_m3)), 1).astype(int)
+    if (partes == 1).all():
+        return ids, vols, m3
+    repetir = np.repeat(np.arange(len(ids)), partes)
+    return ids[repetir], (vols / partes)[repetir], (m3 / partes)[repetir]
+
+
+# First-fit decreasing em duas dimensões: pedidos do maior para o menor (pela fração do
+# veículo que ocupam), cada um no primeiro caminhão aberto em que cabe.
+# Devolve o caminhão (0, 1, ...) de cada pedido, na ordem recebida.
+def _first_fit(vols, m3, cap_vols, cap_m3):
+    tamanho = np.maximum(vols / cap_vols, m3 / cap_m3)
+    ordem = np.argsort(-tamanho, kind="stable")
+    livre_vols = np.empty(len(vols))
+    livre_m3 = np.empty(len(vols))
+    abertos = 0
+    caminhao = np.empty(len(vols), dtype=int)
+    for i in ordem:
+        cabe = np.flatnonzero((livre_vols[:abertos] >= vols[i]) & (livre_m3[:abertos] >= m3[i]))
+        if len(cabe):
+            destino = cabe[0]
+        else:
+            destino = abertos
+            livre_vols[destino], livre_m3[destino] = cap_vols, cap_m3
+            abertos += 1
+        livre_vols[destino] -= vols[i]
+        livre_m3[destino] -= m3[i]
+        caminhao[i] = destino
+    return caminhao
+
+
+# Menor número de caminhões por busca em profundidade: cada pedido (do maior para o menor)
+# vai para um caminhão já aberto ou abre um novo; ramos que não podem melhorar a melhor
+# solução (pelo limite inferior de volumes e m³ restantes) são descartados.
+# Começa da solução da heurística. Devolve (caminhões, se a busca terminou = ótimo provado).
+def _exato(vols, m3, cap_vols, cap_m3):
+    inicial = _first_fit(vols, m3, cap_vols, cap_m3)
+    melhor = {"caminhao": inicial, "n": inicial.max() + 1 if len(inicial) else 0}
+    ordem = np.argsort(-np.maximum(vols / cap_vols, m3 / cap_m3), kind="stable")
+    v, m = vols[ordem].tolist(), m3[ordem].tolist()
+    resto_v = np.cumsum(v[::-1])[::-1].tolist() + [0.0]
+    resto_m = np.cumsum(m[::-1])[::-1].tolist() + [0.0]
+    livre_v, livre_m, atual = [], [], [0] * len(v)
+    nos = [0]
+
+    def buscar(i):
+        nos[0] += 1
+        if nos[0] > LIMITE_NOS_EXATO:
+            return
+        if i == len(v):
+            if len(livre_v) < melhor["n"]:
+                caminhao = np.empty(len(v), dtype=int)
+                caminhao[ordem] = atual
+                melhor["caminhao"], melhor["n"] = caminhao, len(livre_v)
+            return
+        faltam = max(math.ceil((resto_v[i] - sum(livre_v)) / cap_vols - 1e-9),
+                     math.ceil((resto_m[i] - sum(livre_m)) / cap_m3 - 1e-9), 0)
+        if len(livre_v) + faltam >= melhor["n"]:
+            return
+        tentados = set()
+        for j in range(len(livre_v)):
+            # caminhões com a mesma sobra são equivalentes: basta tentar um
+            if (livre_v[j], livre_m[j]) in tentados or livre_v[j] < v[i] or livre_m[j] < m[i]:
+                continue
+            tentados.add((livre_v[j], livre_m[j]))
+            livre_v[j] -= v[i]
+            livre_m[j] -= m[i]
+            atual[i] = j
+            buscar(i + 1)
+            livre_v[j] += v[i]
+            livre_m[j] += m[i]
+        if len(livre_v) + 1 < melhor["n"]:
+            livre_v.append(cap_vols - v[i])
+            livre_m.append(cap_m3 - m[i])
+            atual[i] = len(livre_v) - 1
+            buscar(i + 1)
+            livre_v.pop()
+            livre_m.pop()
+
+    buscar(0)
+    return melhor["caminhao"], nos[0] <= LIMITE_NOS_EXATO
+
+
+# Menor veículo em que a carga cabe (None se nem o maior comporta)
+def _menor_veiculo(vols, m3, veiculos):
+    for nome, (cap_vols, cap_m3) in veiculos.items():
+        if vols <= cap_vols + 1e-9 and m3 <= cap_m3 + 1e-9:
+            return nome
+    return None
+
+
+# Planos de carga: um registro por caminhão, com hub, dia de faturamento, veículo, pedidos
+# (ids do After Sales), rotas atendidas, carga e ocupação.
+# Os pedidos são empacotados no 'veiculo' escolhido; com ajustar_veiculo, cada caminhão
+# depois desce para o menor veículo em que sua carga cabe.
+# exato: resolve de forma exata os grupos com até LIMITE_PEDIDOS_EXATO pedidos.
+def planejar(df_pedidos, veiculo=VEICULO_PADRAO, exato=False, ajustar_veiculo=True, veiculos=None):
+    veiculos = veiculos or VEICULOS
+    if veiculo not in veiculos:
+        raise ValueError(f"Veículo desconhecido: {veiculo}")
+    cap_vols, cap_m3 = veiculos[veiculo]
+    planos = []
+    for (hub, data_fat), grupo in df_pedidos.groupby(["hub", "data_fat"], sort=True, dropna=False):
+        ids, vols, m3 = _fracionar(grupo["id"].to_numpy(), grupo["qtd_vols"].to_numpy(float),
+                                   grupo["m3"].to_numpy(float), cap_vols, cap_m3)
+        otimo = False
+        if exato and len(ids) <= LIMITE_PEDIDOS_EXATO:
+            caminhao, otimo = _exato(vols, m3, cap_vols, cap_m3)
+        else:
+            caminhao = _first_fit(vols, m3, cap_vols, cap_m3)
+        rotas = grupo.set_index("id")["rota"]
+        for numero in range(caminhao.max() + 1 if len(caminhao) else 0):
+            dentro = caminhao == numero
+            carga_vols, carga_m3 = vols[dentro].sum(), m3[dentro].sum()
+            nome = (_menor_veiculo(carga_vols, carga_m3, veiculos) if ajustar_veiculo else None) or veiculo
+            ids_caminhao = sorted(set(ids[dentro].tolist()))
+            planos.append({
+                "hub": hub,
+                "data_fat": data_fat,
+                "caminhao": numero + 1,
+                "veiculo": nome,
+                "pedidos": len(ids_caminhao),
+                "ids": ids_caminhao,
+                "rotas": ", ".join(sorted(rotas.loc[ids_caminhao].dropna().astype(str).unique())),
+                "qtd_vols": carga_vols,
+                "m3": carga_m3,
+                "ocupacao_vols": carga_vols / veiculos[nome][0] * 100,
+                "ocupacao_m3": carga_m3 / veiculos[nome][1] * 100,
+                "otimo": otimo,
+            })
+    colunas = ["hub", "data_fat", "caminhao", "veiculo", "pedidos", "ids", "rotas", "qtd_vols", "m3",
+               "ocupacao_vols", "ocupacao_m3", "otimo"]
+    return pd.DataFrame(planos, columns=colunas)
+
+
+# Caminhões por hub e dia (com a quantidade de cada veículo), para o resumo da página.
+# Pedido fracionado em vários caminhões conta uma vez só (ids distintos do grupo).
+def resumo_planos(planos):
+    if planos.empty:
+        return pd.DataFrame(columns=["hub", "data_fat", "caminhoes", "pedidos", "qtd_vols", "m3"])
+    grupos = ["hub", "data_fat"]
+    resumo = planos.groupby(grupos, dropna=False).agg(
+        caminhoes=("caminhao", "size"), qtd_vols=("qtd_vols", "sum"), m3=("m3", "sum"))
+    resumo.insert(1, "pedidos", planos.explode("ids").groupby(grupos, dropna=False)["ids"].nunique())
+    por_veiculo = planos.groupby(grupos, dropna=False)["veiculo"].value_counts().unstack(fill_value=0)
+    return resumo.join(por_veiculo).reset_index()
@@ -0,0 +1,246 @@
+import pandas as pd
+
+import banco_dados
+import cidades_hub
+import status_entrega
+
+# Tabelas de resumo diário mantidas por triggers do SQLite.
+# Qualquer INSERT/UPDATE/DELETE nas tabelas brutas (Painel de Controle, scripts, migrações)
+# atualiza o resumo na mesma transação; os painéis leem só o resumo.
+# Uso: python resumos.py  -> (re)cria tabelas e triggers e reconstrói os resumos a partir das tabelas brutas
+
+TABELA_CTES = "Relatorios_CTEs"
+TABELA_SITE = "Site Carga Rastreada"
+TABELA_HUB = cidades_hub.TABELA_HUB
+TABELA_CIDADE_HUB = cidades_hub.TABELA_DIMENSAO
+
+RESUMO_VOLUMES = "resumo_volume_dia"
+RESUMO_ENTREGAS = "resumo_entregas_dia"
+
+# --- Expressões por linha (NEW/OLD nas triggers, aliases na reconstrução) ---
+
+def _chaves_volume(r):
+    return {
+        "dia": f"COALESCE(date({r}.data_emissao), '')",
+        "uf": f"COALESCE({r}.uf_destinatario, '')",
+        "cidade": f"COALESCE({r}.cidade_destinatario, '')",
+        "emissor": f"COALESCE({r}.remetente, '')",
+    }
+
+
+def _medidas_volume(r):
+    return {
+        "volumes": f"COALESCE(CAST({r}.quantidade_de_volumes AS INTEGER), 0)",
+        "ctes": "1",
+        "peso_kg": f'COALESCE(CAST({r}."peso_real_(kg)" AS REAL), 0)',
+        "frete": f'COALESCE(CAST({r}."valor_frete_(r$)" AS REAL), 0)',
+    }
+
+
+def _linha_valida_cte(r):
+    return f"{r}.cte IS NOT NULL AND UPPER({r}.cte) <> 'CTE'"
+
+
+def _data_valida(expressao):
+    return f"date(NULLIF(NULLIF({expressao}, 'NaT'), ''))"
+
+
+def _previsao(r):
+    return _data_valida(f'{r}."prev.entrega"')
+
+
+def _entrega(r):
+    return _data_valida(f'{r}."dt.entrega"')
+
+
+# Situação estável da entrega; 'Em Trânsito' vira ATRASADO na leitura, comparando prev_entrega com hoje
+def _situacao(r):
+    return status_entrega.sql_status(f'{r}."prev.entrega"', f'{r}."dt.entrega"')
+
+
+def _chaves_entrega(r):
+    prev, entrega = _previsao(r), _entrega(r)
+    return {
+        "dia": f"COALESCE(date({r}.emissao_cte), '')",
+        "hub": f"COALESCE((SELECT d.hub FROM {TABELA_CIDADE_HUB} d WHERE d.cidade = {r}.cidade), '')",
+        "emissor": f"COALESCE({r}.emissor, '')",
+        "situacao": _situacao(r),
+        # só pedidos em trânsito guardam a previsão (necessária para saber se já atrasaram)
+        "prev_entrega": f"CASE WHEN {entrega} IS NULL THEN COALESCE({prev}, '') ELSE '' END",
+    }
+
+
+def _medidas_entrega(r):
+    return {
+        "pedidos": "1",
+        "volumes": f'COALESCE(CAST({r}."qtd.vols" AS INTEGER), 0)',
+    }
+
+
+RESUMOS = {
+    RESUMO_VOLUMES: {
+        "origem": TABELA_CTES,
+        "chaves": _chaves_volume,
+        "medidas": _medidas_volume,
+        "filtro": _linha_valida_cte,
+        "colunas_necessarias": {"cte", "data_emissao", "uf_destinatario", "cidade_destinatario",
+                                "remetente", "quantidade_de_volumes", "peso_real_(kg)", "valor_frete_(r$)"},
+        "tipos": {"volumes": "INTEGER", "ctes": "INTEGER", "peso_kg": "REAL", "frete": "REAL"},
+        "contagem": "ctes",
+    },
+    RESUMO_ENTREGAS: {
+        "origem": TABELA_SITE,
+        "chaves": _chaves_entrega,
+        "medidas": _medidas_entrega,
+        "filtro": lambda r: "1",
+        # o hub vem da dimensão cidade -> hub: alterações nela exigem reconstrução
+        "dependencias": {TABELA_HUB, TABELA_CIDADE_HUB},
+        "colunas_necessarias": {"emissao_cte", "cidade", "emissor", "prev.entrega", "dt.entrega", "qtd.vols"},
+        "tipos": {"pedidos": "INTEGER", "volumes": "INTEGER"},
+        "contagem": "pedidos",
+    },
+}
+
+
+def _colunas(conn, tabela):
+    return {linha[1] for linha in conn.execute(f'PRAGMA table_info("{tabela}")')}
+
+
+def _criar_tabela_resumo(conn, nome, definicao):
+    chaves = list(definicao["chaves"]("x"))
+    colunas = [f"{c} TEXT NOT NULL" for c in chaves] + [f"{m} {t} NOT NULL DEFAULT 0" for m, t in definicao["tipos"].items()]
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {nome} ({', '.join(colunas)}, PRIMARY KEY ({', '.join(chaves)}))")
+
+
+# Comando que soma (sinal=+1) ou subtrai (sinal=-1) a linha NEW/OLD do resumo
+def _upsert_linha(nome, definicao, r, sinal):
+    chaves = definicao["chaves"](r)
+    medidas = definicao["medidas"](r)
+    colunas = list(chaves) + list(medidas)
+    valores = list(chaves.values()) + [f"{sinal} * ({v})" for v in medidas.values()]
+    atualizacoes = ", ".join(f"{m} = {m} + excluded.{m}" for m in medidas)
+    return (
+        f"INSERT INTO {nome} ({', '.join(colunas)}) VALUES ({', '.join(valores)}) "
+        f"ON CONFLICT ({', '.join(chaves)}) DO UPDATE SET {atualizacoes};"
+    )
+
+
+# Remove o grupo da linha OLD quando a contagem dele chega a zero
+def _limpar_grupo(nome, definicao, r):
+    chaves = definicao["chaves"](r)
+    condicoes = " AND ".join(f"{c} = {v}" for c, v in chaves.items())
+    return f"DELETE FROM {nome} WHERE {condicoes} AND {definicao['contagem']} = 0;"
+
+
+def _criar_triggers(conn, nome, definicao):
+    origem = definicao["origem"]
+    filtro = definicao["filtro"]
+    limpeza = _limpar_grupo(nome, definicao, "OLD")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{nome}_ins AFTER INSERT ON "{origem}"
+        WHEN {filtro('NEW')}
+        BEGIN {_upsert_linha(nome, definicao, 'NEW', 1)} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{nome}_del AFTER DELETE ON "{origem}"
+        WHEN {filtro('OLD')}
+        BEGIN {_upsert_linha(nome, definicao, 'OLD', -1)} {limpeza} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{nome}_upd_old AFTER UPDATE ON "{origem}"
+        WHEN {filtro('OLD')}
+        BEGIN {_upsert_linha(nome, definicao, 'OLD', -1)} {limpeza} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{nome}_upd_new AFTER UPDATE ON "{origem}"
+        WHEN {filtro('NEW')}
+        BEGIN {_upsert_linha(nome, definicao, 'NEW', 1)} END
+    """)
+
+
+def _reconstruir(conn, nome, definicao):
+    chaves = definicao["chaves"]("r")
+    medidas = definicao["medidas"]("r")
+    conn.execute(f"DELETE FROM {nome}")
+    conn.execute(f"""
+        INSERT INTO {nome} ({', '.join(list(chaves) + list(medidas))})
+        SELECT {', '.join(f'{v} AS {k}' for k, v in chaves.items())},
+               {', '.join(f'SUM({v})' for v in medidas.values())}
+        FROM "{definicao['origem']}" r
+        WHERE {definicao['filtro']('r')}
+        GROUP BY {', '.join(str(i + 1) for i in range(len(chaves)))}
+    """)
+
+
+def resumo_disponivel(nome, db_path=banco_dados.DB_PATH):
+    return nome in banco_dados.listar_tabelas(db_path)
+
+
+# Cria os resumos que ainda não existem (ou cujas triggers sumiram porque a tabela
+# de origem foi recriada) e reconstrói só esses; com reconstruir=True refaz todos.
+# tabela_alterada: tabela que acabou de ser carregada/excluída fora das triggers (ex.: a de hubs).
+# A dimensão cidade -> hub é mantida por quem chama (ingestao.atualizar_derivados, migrações).
+# Resumos cuja origem não existe mais são removidos, e os painéis voltam a ler a tabela bruta.
+def garantir_resumos(conn, reconstruir=False, tabela_alterada=None):
+    refeitos = []
+    for nome, definicao in RESUMOS.items():
+        origem = definicao["origem"]
+        if not definicao["colunas_necessarias"] <= _colunas(conn, origem):
+            conn.execute(f"DROP TABLE IF EXISTS {nome}")
+            continue
+        tem_tabela = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (nome,)).fetchone()
+        tem_triggers = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND tbl_name=? AND name LIKE ?",
+            (origem, f"trg_{nome}_%"),
+        ).fetchone()[0] == 4
+        desatualizado = tabela_alterada in definicao.get("dependencias", ())
+        if tem_tabela and tem_triggers and not (reconstruir or desatualizado):
+            continue
+        if reconstruir:
+            # refaz também as triggers, caso a definição do resumo tenha mudado
+            for gatilho in ("ins", "del", "upd_old", "upd_new"):
+                conn.execute(f"DROP TRIGGER IF EXISTS trg_{nome}_{gatilho}")
+        _criar_tabela_resumo(conn, nome, definicao)
+        _criar_triggers(conn, nome, definicao)
+        _reconstruir(conn, nome, definicao)
+        refeitos.append(nome)
+    return refeitos
+
+
+def reconstruir_resumos(db_path=banco_dados.DB_PATH):
+    with banco_dados.conexao_escrita(db_path) as conn:
+        cidades_hub.garantir_cidades_hub(conn)
+        return garantir_resumos(conn, reconstruir=True)
+
+
+# Entregas por (dia, hub, emissor, status) a partir do resumo, com o status
+# 'Em Trânsito (ATRASADO)' calculado em relação à data de referência
+def entregas_por(dimensoes, data_inicio=None, data_fim=None, hoje=None, db_path=banco_dados.DB_PATH):
+    condicoes, params = ["1"], []
+    if data_inicio is not None:
+        condicoes.append("dia >= ?")
+        params.append(str(data_inicio))
+    if data_fim is not None:
+        condicoes.append("dia <= ?")
+        params.append(str(data_fim))
+    df = banco_dados.consultar(
+        f"SELECT dia, hub, emissor, situacao, prev_entrega, pedidos, volumes FROM {RESUMO_ENTREGAS} "
+        f"WHERE {' AND '.join(condicoes)}",
+        params,
+        tabelas=[RESUMO_ENTREGAS],
+        db_path=db_path,
+    )
+    hoje = status_entrega.data_referencia(hoje)
+    prev = pd.to_datetime(df["prev_entrega"].replace("", None), errors="coerce")
+    atrasado = (df["situacao"] == status_entrega.EM_TRANSITO) & (prev < hoje)
+    df["status"] = df["situacao"].mask(atrasado, status_entrega.EM_TRANSITO_ATRASADO).astype(status_entrega.STATUS_DTYPE)
+    resultado = df.groupby(list(dimensoes), observed=True, as_index=False)[["pedidos", "volumes"]].sum()
+    # As chaves do resumo guardam '' no lugar de NULL; volta a ser None, como na tabela bruta
+    for coluna in {"hub", "emissor"} & set(dimensoes):
+        resultado[coluna] = resultado[coluna].astype(object).where(resultado[coluna] != "", None)
+    return resultado
+
+
+if __name__ == "__main__":
+    refeitos = reconstruir_resumos()
+    print("Resumos reconstruídos: " + (", ".join(refeitos) if refeitos else "nenhum (tabelas de origem ausentes)"))
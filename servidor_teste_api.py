@@ -0,0 +1,76 @@
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Servidor local que imita a dashboard-api do cargarastreada para testes.
+# Uso: python servidor_teste_api.py [porta]
+# Depois rode o Streamlit com CARGARASTREADA_URL=http://localhost:8765/glovis/dashboard-api/
+
+UFS = ["SP", "RJ", "MG", "PR", "SC", "RS", "BA", "PE", "CE", "GO", "DF", "AL", "SE", "PB", "RN", "MA", "PI", "PA"]
+ATRASO_RESPOSTA = 0.0   # segundos de espera artificial por requisição
+
+
+# Gera registros determinísticos para um emissor em um dia
+def registros_do_dia(cnpj, dia):
+    gerador = random.Random(f"{cnpj}-{dia.isoformat()}")
+    registros = []
+    for i in range(gerador.randint(5, 40)):
+        chave = f"{gerador.randrange(10**43, 10**44):044d}"
+        registros.append({
+            "cte_chave": chave,
+            "emissor_cnpj": cnpj,
+            "data_emissao": dia.isoformat(),
+            "destinatario_uf": gerador.choice(UFS),
+            "qtd_volumes": gerador.randint(1, 60),
+        })
+    return registros
+
+
+def registros_periodo(cnpj, data_inicio, data_fim):
+    registros = []
+    dia = data_inicio
+    while dia <= data_fim:
+        registros.extend(registros_do_dia(cnpj, dia))
+        dia += timedelta(days=1)
+    return registros
+
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    contador_requisicoes = 0
+
+    def do_GET(self):
+        ManipuladorAPI.contador_requisicoes += 1
+        params = parse_qs(urlparse(self.path).query)
+        try:
+            data_inicio = date.fromisoformat(params["di"][0])
+            data_fim = date.fromisoformat(params["df"][0])
+            cnpj = params["emissor"][0]
+        except (KeyError, ValueError):
+            self.send_error(400, "Parâmetros di, df e emissor são obrigatórios")
+            return
+        if ATRASO_RESPOSTA:
+            time.sleep(ATRASO_RESPOSTA)
+        corpo = json.dumps(registros_periodo(cnpj, data_inicio, data_fim)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def iniciar_servidor(porta=8765):
+    return ThreadingHTTPServer(("127.0.0.1", porta), ManipuladorAPI)
+
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    servidor = iniciar_servidor(porta)
+    print(f"Servidor de teste em http://127.0.0.1:{porta}/glovis/dashboard-api/")
+    servidor.serve_forever()
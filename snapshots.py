@@ -0,0 +1,224 @@
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+import banco_dados
+
+# Cópias colunares (Parquet) das tabelas de logística, particionadas por mês de emissão.
+# Cada tabela vira um diretório dados/parquet/<tabela>/mes=AAAA-MM/*.parquet; a leitura
+# só abre as partições e colunas pedidas.
+# Uso: python snapshots.py [tabela ...]  -> gera (ou refaz) os snapshots
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados", "parquet")
+
+# Tabela -> coluna de data que define o mês da partição
+TABELAS = {
+    "Relatorios_CTEs": "data_emissao",
+    "Site Carga Rastreada": "emissao_cte",
+    "Milk_Run": "dtprvini_col",
+    "After Sales": "data_fat",
+}
+
+# Colunas numéricas que ficam como TEXT até as migrações 001/002 (ver migracoes.py);
+# no snapshot saem sempre com o tipo final, seja qual for o estado do banco
+TIPOS_NUMERICOS = {
+    "Relatorios_CTEs": {
+        "valor_total_das_notas": pa.float64(),
+        "quantidade_de_volumes": pa.int64(),
+        "peso_real_(kg)": pa.float64(),
+        "peso_cubado": pa.float64(),
+        "valor_frete_(r$)": pa.float64(),
+        "qtd._notas": pa.int64(),
+    },
+    "Site Carga Rastreada": {
+        "qtd.vols": pa.int64(),
+        "qtd_vols": pa.int64(),
+        "prazo": pa.int64(),
+    },
+}
+
+COLUNA_PARTICAO = "mes"
+SEM_DATA = "sem_data"
+LINHAS_POR_LOTE = 50_000
+METADADOS = "_snapshot.json"
+
+
+def _diretorio(tabela):
+    return os.path.join(SNAPSHOT_DIR, re.sub(r"\W+", "_", tabela).strip("_").lower())
+
+
+# Tipo Arrow a partir do tipo declarado no SQLite (regras de afinidade do SQLite)
+def _tipo_arrow(tipo_declarado):
+    tipo = (tipo_declarado or "").upper()
+    if "INT" in tipo:
+        return pa.int64()
+    if any(t in tipo for t in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    return pa.string()
+
+
+def _esquema(conn, tabela):
+    numericas = TIPOS_NUMERICOS.get(tabela, {})
+    campos = []
+    for _, nome, tipo, *_ in conn.execute(f'PRAGMA table_info("{tabela}")'):
+        tipo_arrow = _tipo_arrow(tipo)
+        if pa.types.is_string(tipo_arrow):
+            tipo_arrow = numericas.get(nome, tipo_arrow)
+        campos.append(pa.field(nome, tipo_arrow))
+    return pa.schema(campos + [pa.field(COLUNA_PARTICAO, pa.string())])
+
+
+# 'AAAA-MM' da data (ISO ou dd/mm/aaaa); sem data válida vai para a partição SEM_DATA
+def _mes(serie):
+    texto = serie.astype("string")
+    iso = pd.to_datetime(texto.str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    br = pd.to_datetime(texto.str.slice(0, 10), format="%d/%m/%Y", errors="coerce")
+    return iso.fillna(br).dt.strftime("%Y-%m").fillna(SEM_DATA)
+
+
+def _lote_arrow(df, esquema, coluna_data):
+    df[COLUNA_PARTICAO] = _mes(df[coluna_data]) if coluna_data in df else SEM_DATA
+    for campo in esquema:
+        if pa.types.is_string(campo.type):
+            df[campo.name] = df[campo.name].astype("string")
+        else:
+            # Texto que não é número numa coluna numérica vira nulo
+            valores = df[campo.name]
+            if valores.dtype == object:
+                valores = valores.astype("string").str.strip()
+            df[campo.name] = pd.to_numeric(valores, errors="coerce")
+            if pa.types.is_integer(campo.type):
+                df[campo.name] = df[campo.name].round().astype("Int64")
+    return pa.Table.from_pandas(df, schema=esquema, preserve_index=False)
+
+
+# Versão da tabela no banco (ver banco_dados.versao_tabela): muda a cada escrita na tabela,
+# inclusive UPDATEs do upsert da ingestão, que não mudam a quantidade de linhas
+def _versao(tabela, db_path=None, conn=None):
+    if conn is None:
+        with banco_dados.conexao_leitura(db_path) as conn:
+            return _versao(tabela, conn=conn)
+    versao = banco_dados.versao_tabela(conn, tabela)
+    return list(versao) if versao is not None else None
+
+
+# Gera o snapshot completo de uma tabela num diretório temporário e troca pelo anterior no final
+def exportar_tabela(tabela, db_path=banco_dados.DB_PATH):
+    coluna_data = TABELAS.get(tabela)
+    destino = _diretorio(tabela)
+    temporario = destino + ".tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    linhas = 0
+    # versão e linhas lidas no mesmo instantâneo do banco (uma transação de leitura)
+    with banco_dados.leitura_consistente(db_path) as conn:
+        versao = _versao(tabela, conn=conn)
+        esquema = _esquema(conn, tabela)
+        particionamento = ds.partitioning(pa.schema([esquema.field(COLUNA_PARTICAO)]), flavor="hive")
+        lotes = pd.read_sql_query(f'SELECT * FROM "{tabela}"', conn, chunksize=LINHAS_POR_LOTE)
+        for i, df in enumerate(lotes):
+            ds.write_dataset(
+                _lote_arrow(df, esquema, coluna_data),
+                temporario,
+                format="parquet",
+                partitioning=particionamento,
+                basename_template=f"parte-{i:05d}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            linhas += len(df)
+        if linhas == 0:
+            # Tabela vazia: grava só o esquema, para que a leitura devolva as colunas
+            vazio = os.path.join(temporario, f"{COLUNA_PARTICAO}={SEM_DATA}")
+            os.makedirs(vazio)
+            pq.write_table(esquema.remove(esquema.get_field_index(COLUNA_PARTICAO)).empty_table(),
+                           os.path.join(vazio, "parte-vazia.parquet"))
+
+    with open(os.path.join(temporario, METADADOS), "w", encoding="utf-8") as f:
+        json.dump({
+            "tabela": tabela,
+            "banco": os.path.abspath(db_path),
+            "versao": versao,
+            "linhas": linhas,
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        }, f)
+    antigo = destino + ".old"
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(destino):
+        os.replace(destino, antigo)
+    os.replace(temporario, destino)
+    shutil.rmtree(antigo, ignore_errors=True)
+    return linhas
+
+
+def exportar_todas(tabelas=None, db_path=banco_dados.DB_PATH):
+    existentes = set(banco_dados.listar_tabelas(db_path))
+    for tabela in tabelas or TABELAS:
+        if tabela in existentes:
+            yield tabela, exportar_tabela(tabela, db_path)
+
+
+def metadados(tabela):
+    caminho = os.path.join(_diretorio(tabela), METADADOS)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# O snapshot existe, foi gerado deste banco e corresponde à versão atual da tabela?
+def snapshot_em_dia(tabela, db_path=banco_dados.DB_PATH):
+    info = metadados(tabela)
+    return (info is not None and info.get("banco") == os.path.abspath(db_path)
+            and info["versao"] == _versao(tabela, db_path))
+
+
+def _dataset(tabela, memory_map=False):
+    return ds.dataset(
+        _diretorio(tabela),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([pa.field(COLUNA_PARTICAO, pa.string())]), flavor="hive"),
+        filesystem=pafs.LocalFileSystem(use_mmap=memory_map),
+    )
+
+
+# Filtro de partição para o intervalo de meses [mes_inicio, mes_fim] ('AAAA-MM')
+def _filtro_meses(mes_inicio, mes_fim):
+    campo = ds.field(COLUNA_PARTICAO)
+    expressao = campo != SEM_DATA
+    if mes_inicio is not None:
+        expressao &= campo >= str(mes_inicio)[:7]
+    if mes_fim is not None:
+        expressao &= campo <= str(mes_fim)[:7]
+    return expressao
+
+
+# Lê um snapshot levando para o disco só o necessário.
+#   colunas: lista de colunas (None = todas)
+#   filtros: expressão do pyarrow.dataset ou lista no formato do pyarrow.parquet,
+#            ex.: [("uf_destinatario", "in", ["SP", "RJ"]), ("quantidade_de_volumes", ">", 0)]
+#   mes_inicio / mes_fim: poda de partições por mês de emissão ('AAAA-MM' ou uma data)
+#   memory_map: abre os arquivos via mmap
+def ler(tabela, colunas=None, filtros=None, mes_inicio=None, mes_fim=None, memory_map=False):
+    expressao = None
+    if filtros is not None:
+        expressao = filtros if isinstance(filtros, ds.Expression) else pq.filters_to_expression(filtros)
+    if mes_inicio is not None or mes_fim is not None:
+        meses = _filtro_meses(mes_inicio, mes_fim)
+        expressao = meses if expressao is None else expressao & meses
+    tabela_arrow = _dataset(tabela, memory_map).to_table(columns=colunas, filter=expressao)
+    return tabela_arrow.to_pandas()
+
+
+if __name__ == "__main__":
+    for tabela, linhas in exportar_todas(sys.argv[1:] or None):
+        print(f"{tabela}: {linhas} linhas -> {_diretorio(tabela)}")
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+# Status possíveis de um pedido (na ordem usada nos filtros das páginas)
+EM_TRANSITO = "Em Trânsito 🚚"
+EM_TRANSITO_ATRASADO = "Em Trânsito (ATRASADO) 🚚❌"
+NO_PRAZO = "No Prazo ✅"
+ANTECIPADO = "Antecipado ✅"
+ATRASADO = "Atrasado❌"
+
+STATUS_OPCOES = [EM_TRANSITO, EM_TRANSITO_ATRASADO, NO_PRAZO, ANTECIPADO, ATRASADO]
+STATUS_DTYPE = pd.CategoricalDtype(STATUS_OPCOES)
+
+
+# Data de referência única para todos os cálculos de um rerun
+def data_referencia(hoje=None):
+    return pd.Timestamp.today().normalize() if hoje is None else pd.Timestamp(hoje).normalize()
+
+
+# Classifica todos os pedidos de uma vez com numpy.select.
+# Recebe as colunas de previsão e de entrega (datetime64) e devolve
+# uma Series categórica com o status de cada linha.
+def classificar_status(prev_entrega, dt_entrega, hoje=None):
+    hoje = data_referencia(hoje)
+    prev_entrega = pd.to_datetime(prev_entrega, errors="coerce")
+    dt_entrega = pd.to_datetime(dt_entrega, errors="coerce")
+
+    sem_previsao = prev_entrega.isna().to_numpy()
+    sem_entrega = dt_entrega.isna().to_numpy()
+    diferenca = (prev_entrega - dt_entrega).dt.days.to_numpy(dtype="float64", na_value=np.nan)
+    previsao_vencida = (prev_entrega.dt.normalize() < hoje).to_numpy()
+
+    codigos = np.select(
+        [
+            sem_previsao,
+            sem_entrega & previsao_vencida,
+            sem_entrega,
+            diferenca < 0,
+            diferenca > 0,
+        ],
+        [
+            STATUS_OPCOES.index(EM_TRANSITO),
+            STATUS_OPCOES.index(EM_TRANSITO_ATRASADO),
+            STATUS_OPCOES.index(EM_TRANSITO),
+            STATUS_OPCOES.index(ATRASADO),
+            STATUS_OPCOES.index(ANTECIPADO),
+        ],
+        default=STATUS_OPCOES.index(NO_PRAZO),
+    )
+    status = pd.Categorical.from_codes(codigos, dtype=STATUS_DTYPE)
+    return pd.Series(status, index=prev_entrega.index, name="status_pedido")
+
+
+# Dias em relação à previsão: negativos para atrasados, restantes para
+# pedidos em trânsito e a diferença previsão x entrega para os demais.
+def calcular_dias_restantes(prev_entrega, status, diferenca_dias, hoje=None):
+    hoje = data_referencia(hoje)
+    prev_entrega = pd.to_datetime(prev_entrega, errors="coerce")
+    dias_ate_previsao = (prev_entrega.dt.normalize() - hoje).dt.days
+    em_transito = status.isin([EM_TRANSITO, EM_TRANSITO_ATRASADO])
+    atrasado = status == ATRASADO
+
+    dias = diferenca_dias.astype("Float64")
+    dias = dias.mask(em_transito | atrasado, dias_ate_previsao)
+    return dias.astype("Int64")
+
+
+# Acrescenta 'diferença_dias' e 'status_pedido' ao DataFrame de CTes
+def aplicar_status(df, col_previsao="prev.entrega", col_entrega="dt.entrega", hoje=None):
+    hoje = data_referencia(hoje)
+    df = df.copy()
+    df[col_previsao] = pd.to_datetime(df[col_previsao], errors="coerce")
+    df[col_entrega] = pd.to_datetime(df[col_entrega], errors="coerce")
+    df["diferença_dias"] = (df[col_previsao] - df[col_entrega]).dt.days
+    df["status_pedido"] = classificar_status(df[col_previsao], df[col_entrega], hoje)
+    return df
+
+
+# Mesma regra de classificar_status como expressão SQL (SQLite), para filtrar e ordenar no banco.
+# Recebe as expressões SQL das datas de previsão e de entrega. Sem 'hoje', pedidos em trânsito
+# não são separados entre no prazo e atrasados (útil para valores gravados, como nos resumos).
+def sql_status(sql_previsao, sql_entrega, hoje=None):
+    prev = f"date(NULLIF(NULLIF({sql_previsao}, 'NaT'), ''))"
+    entrega = f"date(NULLIF(NULLIF({sql_entrega}, 'NaT'), ''))"
+    em_transito_atrasado = ""
+    if hoje is not None:
+        # data gerada aqui (AAAA-MM-DD), não vem do usuário
+        hoje = data_referencia(hoje).strftime("%Y-%m-%d")
+        em_transito_atrasado = f"WHEN {entrega} IS NULL AND {prev} < '{hoje}' THEN '{EM_TRANSITO_ATRASADO}' "
+    return (
+        f"CASE WHEN {prev} IS NULL THEN '{EM_TRANSITO}' "
+        f"{em_transito_atrasado}"
+        f"WHEN {entrega} IS NULL THEN '{EM_TRANSITO}' "
+        f"WHEN julianday({prev}) < julianday({entrega}) THEN '{ATRASADO}' "
+        f"WHEN julianday({prev}) > julianday({entrega}) THEN '{ANTECIPADO}' "
+        f"ELSE '{NO_PRAZO}' END"
+    )
+
+
+# 'diferença_dias' (previsão - entrega) como expressão SQL
+def sql_diferenca_dias(sql_previsao, sql_entrega):
+    prev = f"date(NULLIF(NULLIF({sql_previsao}, 'NaT'), ''))"
+    entrega = f"date(NULLIF(NULLIF({sql_entrega}, 'NaT'), ''))"
+    return f"CAST(julianday({prev}) - julianday({entrega}) AS INTEGER)"
+